@@ -0,0 +1,110 @@
+"""
+Serialization micro-benchmark: standard JSON responses vs AIDOS_FAST_JSON=1.
+
+Runs the ModelHub, DataForge and Analytics apps in-process (no Docker needed,
+just the service requirements and `pip install -e services/common`) once per
+mode in a fresh interpreter, and reports the average time per request.
+
+    python bench_serialization.py [requests_per_endpoint]
+"""
+
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_service(name):
+    directory = os.path.join(ROOT, "services", name)
+    # main.py imports its sibling modules (chunkstore, metric_store, ...) by name
+    sys.path.insert(0, directory)
+    spec = importlib.util.spec_from_file_location(f"{name}_main", os.path.join(directory, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.app
+
+
+def timed(client, path, n):
+    client.get(path)
+    start = time.perf_counter()
+    for _ in range(n):
+        client.get(path)
+    return (time.perf_counter() - start) / n * 1000
+
+
+def run(n):
+    from fastapi.testclient import TestClient
+
+    # DataForge keeps its catalog, blobs and exports on disk; start each mode empty
+    state = tempfile.mkdtemp(prefix="aidos-bench-")
+    for variable, directory in (("DATAFORGE_STATE_DIR", "state"), ("BLOB_ROOT", "blobs"),
+                                ("EXPORT_DIR", "exports"), ("SYNTHETIC_JOB_DIR", "jobs")):
+        os.environ[variable] = os.path.join(state, directory)
+
+    results = {}
+
+    modelhub = TestClient(load_service("modelhub"))
+    experiment = modelhub.post("/experiments", json={
+        "name": "bench", "description": "serialization benchmark", "project_id": "bench", "user_id": "bench"
+    }).json()
+    for i in range(200):
+        modelhub.post(f"/experiments/{experiment['id']}/runs", json={
+            "experiment_id": experiment["id"], "name": f"run-{i}",
+            "parameters": {"lr": 0.001, "batch_size": 32}
+        })
+    run_id = modelhub.get(f"/experiments/{experiment['id']}/runs").json()[0]["id"]
+    for step in range(2000):
+        modelhub.post(f"/runs/{run_id}/log-metrics", json={
+            "run_id": run_id, "step": step, "metrics": {"loss": 1.0 / (step + 1), "accuracy": step / 2000}
+        })
+    results["modelhub runs (200)"] = timed(modelhub, f"/experiments/{experiment['id']}/runs", n)
+    results["modelhub metrics (2000)"] = timed(modelhub, f"/runs/{run_id}/metrics", n)
+
+    dataforge = TestClient(load_service("dataforge"))
+    dataset = dataforge.post("/datasets", json={
+        "name": "bench", "description": "serialization benchmark", "owner_id": "bench", "data_type": "text"
+    }).json()
+    for i in range(500):
+        dataforge.post(f"/datasets/{dataset['id']}/versions", json={
+            "dataset_id": dataset["id"], "version": f"v{i}", "commit_hash": f"{i:040x}",
+            "commit_message": f"commit {i}", "changes": {"added": i}, "created_by": "bench"
+        })
+    results["dataforge versions (500)"] = timed(dataforge, f"/datasets/{dataset['id']}/versions", n)
+
+    analytics = TestClient(load_service("analytics"))
+    results["analytics api-calls"] = timed(analytics, "/analytics/usage/api-calls?time_range=week", n)
+    results["analytics business (year)"] = timed(analytics, "/analytics/business/overview?time_range=year", n)
+
+    print(json.dumps(results))
+    shutil.rmtree(state, ignore_errors=True)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    modes = {}
+    for flag in ("0", "1"):
+        env = dict(os.environ, AIDOS_FAST_JSON=flag)
+        output = subprocess.run(
+            [sys.executable, __file__, "--worker", str(n)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        modes[flag] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"=== SERIALIZATION BENCHMARK ({n} requests per endpoint) ===\n")
+    print(f"{'endpoint':<30}{'standard ms':>12}{'fast ms':>12}{'saved':>9}")
+    for endpoint, standard in modes["0"].items():
+        fast = modes["1"][endpoint]
+        print(f"{endpoint:<30}{standard:>12.3f}{fast:>12.3f}{(1 - fast / standard) * 100:>8.1f}%")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--worker":
+        run(int(sys.argv[2]))
+    else:
+        main()
@@ -5,7 +5,17 @@ Build ML models in seconds with plain English.
 
 import requests
 from typing import Dict, Optional, List
+import atexit
+import hashlib
 import json
+import logging
+import math
+import os
+import threading
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
 
 class AIDOS:
     """Main AI-DOS client"""
@@ -111,13 +121,64 @@ class DataForge:
             }
         )
         return response.json()
+    
+    def upload_file(self, dataset_id: str, path: str, filename: str = None) -> Dict:
+        """Upload a file, sending only the chunks the server doesn't already have"""
+        chunk_size = requests.get(f"{self.api_url}/storage/stats").json()["chunk_size"]
+        
+        hashes = []
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                hashes.append(hashlib.sha256(chunk).hexdigest())
+        
+        missing = set(requests.post(
+            f"{self.api_url}/storage/chunks/missing",
+            json={"hashes": hashes}
+        ).json()["missing"])
+        
+        with open(path, "rb") as f:
+            for chunk_hash in hashes:
+                chunk = f.read(chunk_size)
+                if chunk_hash in missing:
+                    requests.put(f"{self.api_url}/storage/chunks/{chunk_hash}", data=chunk).raise_for_status()
+                    missing.discard(chunk_hash)
+        
+        response = requests.post(
+            f"{self.api_url}/datasets/{dataset_id}/files",
+            json={"filename": filename or os.path.basename(path), "chunks": hashes}
+        )
+        return response.json()
 
 
 class ModelHub:
-    """Experiment tracking and model registry"""
-    
-    def __init__(self, api_url: str = "http://localhost:8002"):
+    """
+    Experiment tracking and model registry
+    
+    `log_metrics` only queues the step; queued steps are sent together,
+    as one NDJSON batch, every `flush_interval` seconds or once
+    `flush_size` steps are waiting, from a background thread. Call
+    `flush()` to send them now; `close()` (also run at exit) sends the rest.
+    A client dropped without `close()` can be garbage-collected, unsent
+    steps included.
+    """
+    
+    def __init__(self, api_url: str = "http://localhost:8002", flush_size: int = 1000,
+                 flush_interval: float = 1.0, max_pending: int = 100_000):
         self.api_url = api_url
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: List[bytes] = []
+        self._lock = threading.Lock()
+        self._sending = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._flusher = None
+        self._session = requests.Session()
+        _open_hubs.add(self)
     
     def create_experiment(self, name: str, description: str, project_id: str, user_id: str, tags: List[str] = None) -> Dict:
         """Create new experiment"""
@@ -151,16 +212,100 @@ class ModelHub:
         )
         return response.json()
     
-    def log_metrics(self, run_id: str, metrics: Dict, step: int = 0) -> Dict:
-        """Log metrics for a run"""
-        response = requests.post(
-            f"{self.api_url}/runs/{run_id}/metrics",
-            json={
-                "metrics": metrics,
-                "step": step
-            }
-        )
-        return response.json()
+    def log_metrics(self, run_id: str, metrics: Dict, step: int = 0) -> None:
+        """Queue metrics for a run; NaN and infinite values are skipped, as JSON can't carry them"""
+        line = json.dumps({
+            "run_id": run_id,
+            "step": step,
+            "metrics": {k: float(v) for k, v in metrics.items() if math.isfinite(v)},
+            "timestamp": time.time()
+        }).encode()
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=_flush_periodically, name="aidos-metrics", daemon=True,
+                                                 args=(weakref.ref(self), self._wakeup, self.flush_interval))
+                self._flusher.start()
+            self._pending.append(line)
+            if len(self._pending) >= self.flush_size:
+                self._wakeup.set()
+    
+    def get_metrics(self, run_id: str, names: List[str] = None, start_step: Optional[int] = None,
+                    end_step: Optional[int] = None, max_points: Optional[int] = None,
+                    downsample: str = "lttb") -> Dict[str, Dict]:
+        """
+        A run's metric series, {name: {steps, timestamps, values, count,
+        downsampled}}, with timestamps in epoch seconds. Sends queued steps
+        first, so they are included.
+        """
+        self.flush()
+        params = {"names": names or [], "start_step": start_step, "end_step": end_step,
+                  "max_points": max_points, "downsample": downsample}
+        response = self._session.get(f"{self.api_url}/runs/{run_id}/metrics",
+                                     params={k: v for k, v in params.items() if v is not None})
+        response.raise_for_status()
+        return response.json()["metrics"]
+    
+    def flush(self):
+        """Send every queued step now"""
+        with self._sending:
+            with self._lock:
+                lines, self._pending = self._pending, []
+            if not lines:
+                return
+            try:
+                response = self._session.post(
+                    f"{self.api_url}/runs/log-metrics",
+                    data=b"\n".join(lines),
+                    headers={"Content-Type": "application/x-ndjson"}
+                )
+                if response.status_code >= 500:
+                    response.raise_for_status()
+            except requests.RequestException:
+                # Keep the steps for the next attempt, dropping the oldest past max_pending
+                with self._lock:
+                    self._pending = (lines + self._pending)[-self.max_pending:]
+                raise
+            # A batch the server rejected would be rejected again; drop it
+            response.raise_for_status()
+    
+    def close(self):
+        """Stop the background sender and send what is still queued"""
+        _open_hubs.discard(self)
+        self._closed = True
+        self._wakeup.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+
+
+# Clients still to be closed at exit; held weakly, so they don't live for the whole process
+_open_hubs: "weakref.WeakSet[ModelHub]" = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_hubs():
+    for hub in list(_open_hubs):
+        try:
+            hub.close()
+        except requests.RequestException as e:
+            # No one is left to retry; say what was lost instead of a traceback
+            logger.warning("aidos: %d queued metric steps were not sent: %s", len(hub._pending), e)
+
+
+def _flush_periodically(ref: "weakref.ref[ModelHub]", wakeup: threading.Event, interval: float):
+    """A ModelHub's background sender; it stops once the client is closed or collected."""
+    while True:
+        wakeup.wait(interval)
+        wakeup.clear()
+        hub = ref()
+        if hub is None or hub._closed:
+            return
+        try:
+            hub.flush()
+        except requests.RequestException:
+            pass
+        # Don't keep the client alive while waiting
+        del hub
 
 
 class Deploy:
@@ -7,6 +7,7 @@ import sys
 import argparse
 import requests
 import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict
 
 API_URL = "http://localhost:8000"
@@ -143,15 +144,24 @@ def status(args):
         ("Analytics", f"{ANALYTICS_URL}/health"),
     ]
     
-    print("\nAI-DOS Status:\n")
-    for name, url in services:
+    def check(url):
         try:
             response = requests.get(url, timeout=2)
-            if response.status_code == 200:
-                print(f"  [OK] {name}: Running")
-            else:
-                print(f"  [ERROR] {name}: Error")
-        except:
+            return "ok" if response.status_code == 200 else "error"
+        except requests.RequestException:
+            return "down"
+    
+    # Probe everything at once so the worst case is one timeout, not nine
+    with ThreadPoolExecutor(max_workers=len(services)) as executor:
+        results = list(executor.map(check, [url for _, url in services]))
+    
+    print("\nAI-DOS Status:\n")
+    for (name, _), result in zip(services, results):
+        if result == "ok":
+            print(f"  [OK] {name}: Running")
+        elif result == "error":
+            print(f"  [ERROR] {name}: Error")
+        else:
             print(f"  [DOWN] {name}: Not running")
     print()
 
@@ -7,7 +7,10 @@ from enum import Enum
 import random
 import uuid
 
-app = FastAPI(title="AI-DOS Analytics Service", version="1.0.0")
+from aidos_common.metrics import MetricsMiddleware
+from aidos_common.responses import default_response_class, fast_json
+
+app = FastAPI(title="AI-DOS Analytics Service", version="1.0.0", default_response_class=default_response_class())
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,6 +20,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware, service="analytics")
+
 # Enums
 class ReportFormat(str, Enum):
     PDF = "pdf"
@@ -117,14 +122,14 @@ def get_model_performance(model_id: str, time_range: TimeRange = TimeRange.WEEK)
             "predictions": random.randint(100, 1000)
         })
     
-    return ModelPerformance(
+    return fast_json(ModelPerformance(
         model_id=model_id,
         accuracy_trend=accuracy_trend,
         predictions_per_day=predictions_per_day,
         avg_response_time=round(random.uniform(50, 200), 2),
         total_predictions=sum(p["predictions"] for p in predictions_per_day),
         error_rate=round(random.uniform(0.01, 0.05), 3)
-    )
+    ))
 
 @app.get("/analytics/model/{model_id}/confusion-matrix")
 def get_confusion_matrix(model_id: str):
@@ -182,11 +187,11 @@ def get_experiment_metrics_over_time(experiment_id: str):
             "val_accuracy": round((epoch / epochs) * 0.85 + random.uniform(-0.02, 0.02), 4)
         })
     
-    return {
+    return fast_json({
         "experiment_id": experiment_id,
         "metrics": metrics_over_time,
         "total_epochs": epochs
-    }
+    })
 
 # Usage Analytics
 @app.get("/analytics/usage/overview")
@@ -201,7 +206,7 @@ def get_usage_overview(time_range: TimeRange = TimeRange.WEEK):
             "users": 100 + i * 5 + random.randint(-2, 5)
         })
     
-    return UsageAnalytics(
+    return fast_json(UsageAnalytics(
         total_users=500 + random.randint(0, 100),
         active_users=250 + random.randint(0, 50),
         total_api_calls=50000 + random.randint(0, 10000),
@@ -212,7 +217,7 @@ def get_usage_overview(time_range: TimeRange = TimeRange.WEEK):
         ],
         peak_hours=[9, 10, 11, 14, 15, 16],
         user_growth=user_growth
-    )
+    ))
 
 @app.get("/analytics/usage/api-calls")
 def get_api_calls_analytics(time_range: TimeRange = TimeRange.DAY):
@@ -228,13 +233,13 @@ def get_api_calls_analytics(time_range: TimeRange = TimeRange.DAY):
             "avg_response_time": round(random.uniform(50, 200), 2)
         })
     
-    return {
+    return fast_json({
         "time_range": time_range,
         "data": api_calls,
         "total_calls": sum(c["calls"] for c in api_calls),
         "total_errors": sum(c["errors"] for c in api_calls),
         "avg_response_time": round(sum(c["avg_response_time"] for c in api_calls) / len(api_calls), 2)
-    }
+    })
 
 # Cost Analytics
 @app.get("/analytics/cost/overview")
@@ -249,7 +254,7 @@ def get_cost_overview(time_range: TimeRange = TimeRange.MONTH):
             "cost": round(random.uniform(10, 50), 2)
         })
     
-    return CostAnalytics(
+    return fast_json(CostAnalytics(
         total_cost=round(sum(c["cost"] for c in cost_trend), 2),
         cost_by_service={
             "compute": round(random.uniform(200, 400), 2),
@@ -260,7 +265,7 @@ def get_cost_overview(time_range: TimeRange = TimeRange.MONTH):
         cost_trend=cost_trend,
         cost_per_prediction=round(random.uniform(0.001, 0.01), 4),
         savings_from_autoscale=round(random.uniform(100, 300), 2)
-    )
+    ))
 
 @app.get("/analytics/cost/predictions")
 def get_cost_predictions(months: int = 3):
@@ -291,7 +296,7 @@ def get_business_overview(time_range: TimeRange = TimeRange.MONTH):
             "revenue": round(random.uniform(50, 200), 2)
         })
     
-    return BusinessMetrics(
+    return fast_json(BusinessMetrics(
         marketplace_revenue=round(sum(r["revenue"] for r in revenue_trend), 2),
         total_deployments=random.randint(50, 200),
         total_experiments=random.randint(200, 500),
@@ -302,7 +307,7 @@ def get_business_overview(time_range: TimeRange = TimeRange.MONTH):
             {"user_id": "user_2", "revenue": 1200.30, "models_sold": 20},
             {"user_id": "user_3", "revenue": 980.75, "models_sold": 18}
         ]
-    )
+    ))
 
 @app.get("/analytics/business/roi")
 def calculate_roi():
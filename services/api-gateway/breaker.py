@@ -0,0 +1,212 @@
+"""
+Per-upstream circuit breakers and adaptive concurrency limits.
+
+Each upstream gets an UpstreamGuard that every proxied call passes through:
+
+- The circuit breaker tracks error rate and slow-call rate over a rolling
+  window. When either crosses its threshold the circuit opens and calls are
+  rejected immediately. After a cool-down it goes half-open and lets a few
+  probe calls through; if they all succeed it closes, otherwise it re-opens.
+- The concurrency limiter (AIMD) caps calls in flight to the upstream. Fast
+  successes grow the limit by roughly one per round trip; errors and slow
+  calls shrink it multiplicatively. Calls over the limit are shed with 503
+  instead of piling up behind a struggling backend.
+
+Everything runs on the event loop, so there is no locking.
+"""
+
+import math
+import os
+import time
+from collections import deque
+from typing import Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class BreakerConfig(BaseModel):
+    window_seconds: int = 30
+    min_requests: int = 20
+    error_rate_threshold: float = 0.5
+    slow_call_seconds: float = 5.0
+    slow_call_rate_threshold: float = 0.8
+    open_seconds: float = 15.0
+    half_open_probes: int = 3
+    initial_limit: int = 50
+    min_limit: int = 2
+    max_limit: int = 500
+    backoff_ratio: float = 0.7
+
+    @classmethod
+    def from_env(cls) -> "BreakerConfig":
+        return cls(
+            window_seconds=int(os.getenv("BREAKER_WINDOW_SECONDS", 30)),
+            min_requests=int(os.getenv("BREAKER_MIN_REQUESTS", 20)),
+            error_rate_threshold=float(os.getenv("BREAKER_ERROR_RATE", 0.5)),
+            slow_call_seconds=float(os.getenv("BREAKER_SLOW_CALL_SECONDS", 5.0)),
+            slow_call_rate_threshold=float(os.getenv("BREAKER_SLOW_CALL_RATE", 0.8)),
+            open_seconds=float(os.getenv("BREAKER_OPEN_SECONDS", 15.0)),
+            half_open_probes=int(os.getenv("BREAKER_HALF_OPEN_PROBES", 3)),
+            initial_limit=int(os.getenv("CONCURRENCY_INITIAL_LIMIT", 50)),
+            min_limit=int(os.getenv("CONCURRENCY_MIN_LIMIT", 2)),
+            max_limit=int(os.getenv("CONCURRENCY_MAX_LIMIT", 500)),
+            backoff_ratio=float(os.getenv("CONCURRENCY_BACKOFF_RATIO", 0.7)),
+        )
+
+
+class CircuitBreaker:
+    def __init__(self, config: BreakerConfig):
+        self.config = config
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+        # One [second, calls, errors, slow] bucket per second of the window
+        self._buckets: deque = deque()
+
+    def _bucket(self, now: float) -> list:
+        second = int(now)
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0, 0])
+        while self._buckets[0][0] <= second - self.config.window_seconds:
+            self._buckets.popleft()
+        return self._buckets[-1]
+
+    def window(self, now: Optional[float] = None) -> tuple:
+        self._bucket(now or time.monotonic())
+        calls = sum(b[1] for b in self._buckets)
+        errors = sum(b[2] for b in self._buckets)
+        slow = sum(b[3] for b in self._buckets)
+        return calls, errors, slow
+
+    def allow(self, now: float) -> bool:
+        if self.state == OPEN:
+            if now - self.opened_at < self.config.open_seconds:
+                return False
+            self.state = HALF_OPEN
+            self.probes_in_flight = 0
+            self.probe_successes = 0
+        if self.state == HALF_OPEN:
+            if self.probes_in_flight >= self.config.half_open_probes:
+                return False
+            self.probes_in_flight += 1
+        return True
+
+    def record(self, now: float, failed: bool, slow: bool, probe: bool = False):
+        if probe:
+            self.probes_in_flight = max(0, self.probes_in_flight - 1)
+            if self.state != HALF_OPEN:
+                return
+            if failed or slow:
+                self._trip(now)
+            else:
+                self.probe_successes += 1
+                if self.probe_successes >= self.config.half_open_probes:
+                    self.state = CLOSED
+                    self._buckets.clear()
+            return
+
+        bucket = self._bucket(now)
+        bucket[1] += 1
+        bucket[2] += failed
+        bucket[3] += slow
+        if self.state != CLOSED:
+            return
+
+        calls, errors, slow_calls = self.window(now)
+        if calls < self.config.min_requests:
+            return
+        if (errors / calls >= self.config.error_rate_threshold
+                or slow_calls / calls >= self.config.slow_call_rate_threshold):
+            self._trip(now)
+
+    def _trip(self, now: float):
+        self.state = OPEN
+        self.opened_at = now
+        self._buckets.clear()
+
+    def retry_after(self, now: float) -> int:
+        return max(1, math.ceil(self.config.open_seconds - (now - self.opened_at)))
+
+
+class AdaptiveLimiter:
+    """Additive-increase / multiplicative-decrease cap on calls in flight."""
+
+    def __init__(self, config: BreakerConfig):
+        self.config = config
+        self.limit = float(config.initial_limit)
+        self.in_flight = 0
+        self._last_backoff = 0.0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= int(self.limit):
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, now: float, failed: bool, slow: bool):
+        self.in_flight -= 1
+        if failed or slow:
+            # A burst of failures from one bad moment backs off once, not per call
+            if now - self._last_backoff >= 1.0:
+                self.limit = max(self.config.min_limit, self.limit * self.config.backoff_ratio)
+                self._last_backoff = now
+        elif self.in_flight + 1 >= int(self.limit):
+            # Only grow while the limit is actually being used
+            self.limit = min(self.config.max_limit, self.limit + 1 / self.limit)
+
+
+class UpstreamGuard:
+    def __init__(self, display_name: str, config: BreakerConfig):
+        self.display_name = display_name
+        self.config = config
+        self.breaker = CircuitBreaker(config)
+        self.limiter = AdaptiveLimiter(config)
+        self.rejected_open = 0
+        self.rejected_overload = 0
+
+    def acquire(self) -> tuple:
+        """Admit a call or raise 503. Returns the ticket to pass to `release`."""
+        now = time.monotonic()
+        if not self.breaker.allow(now):
+            self.rejected_open += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f"{self.display_name} circuit open",
+                headers={"Retry-After": str(self.breaker.retry_after(now))},
+            )
+        probe = self.breaker.state == HALF_OPEN
+        if not self.limiter.try_acquire():
+            if probe:
+                self.breaker.probes_in_flight -= 1
+            self.rejected_overload += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f"{self.display_name} overloaded",
+                headers={"Retry-After": "1"},
+            )
+        return now, probe
+
+    def release(self, ticket: tuple, failed: bool):
+        started, probe = ticket
+        now = time.monotonic()
+        slow = now - started >= self.config.slow_call_seconds
+        self.limiter.release(now, failed, slow)
+        self.breaker.record(now, failed, slow, probe)
+
+    def snapshot(self) -> dict:
+        calls, errors, slow = self.breaker.window()
+        return {
+            "breaker": self.breaker.state,
+            "concurrency_limit": int(self.limiter.limit),
+            "in_flight": self.limiter.in_flight,
+            "error_rate": round(errors / calls, 3) if calls else 0.0,
+            "slow_call_rate": round(slow / calls, 3) if calls else 0.0,
+            "rejected_open": self.rejected_open,
+            "rejected_overload": self.rejected_overload,
+        }
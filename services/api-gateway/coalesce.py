@@ -0,0 +1,164 @@
+"""
+Request coalescing (single-flight) for proxied reads.
+
+When many clients poll the same resource at once (e.g. GET /deploy/{id}
+right after a rollout), identical in-flight GETs are collapsed into one
+upstream call and the buffered response is handed to every waiter.
+
+Only routes matching a configured pattern are coalesced. Patterns are
+globs over "<service>/<path>" matched segment by segment, so `*` never
+crosses a "/": "dataforge/datasets/*" matches a dataset but not its file
+downloads. Requests are identical when method, service, path, query
+string, the `vary_headers` and the caller's credentials all match, so
+different users never share a response. Range requests are never
+coalesced, and a response larger than COALESCE_MAX_BODY_BYTES isn't
+shared: every waiter then streams its own upstream call instead of the
+gateway buffering a large body. That resource (service, path and query)
+is then forwarded without coalescing for COALESCE_OVERSIZE_TTL seconds,
+so a large list isn't fetched twice on every request.
+"""
+
+import asyncio
+import fnmatch
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import Request, Response
+
+from proxy import UpstreamPool
+
+DEFAULT_COALESCE_ROUTES = ",".join([
+    "deploy/*",
+    "modelhub/experiments", "modelhub/experiments/*",
+    "modelhub/models", "modelhub/models/*",
+    "dataforge/datasets", "dataforge/datasets/*",
+])
+DEFAULT_VARY_HEADERS = "accept,accept-encoding"
+COALESCE_MAX_BODY_BYTES = int(os.getenv("COALESCE_MAX_BODY_BYTES", 1024 * 1024))
+COALESCE_OVERSIZE_TTL = float(os.getenv("COALESCE_OVERSIZE_TTL", 60))
+
+# Part of the key, so only requests made with the same credentials share a response
+CREDENTIAL_HEADERS = ("authorization", "cookie", "x-api-key")
+# Each caller needs its own partial response
+UNSHARED_HEADERS = ("range", "if-range")
+
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+class RequestCoalescer:
+    def __init__(self, pool: UpstreamPool, routes: Iterable[str], vary_headers: Iterable[str] = ("accept", "accept-encoding"),
+                 max_body_bytes: int = COALESCE_MAX_BODY_BYTES, oversize_ttl: float = COALESCE_OVERSIZE_TTL):
+        self.pool = pool
+        self.routes = list(routes)
+        self.vary_headers = tuple(h.lower() for h in vary_headers) + CREDENTIAL_HEADERS
+        self.max_body_bytes = max_body_bytes
+        self.oversize_ttl = oversize_ttl
+        self._in_flight: Dict[tuple, asyncio.Task] = {}
+        # (service, path, query) -> when its last response was found too large, oldest first
+        self._oversize: "OrderedDict[tuple, float]" = OrderedDict()
+        self.upstream_calls: Dict[str, int] = {route: 0 for route in self.routes}
+        self.coalesced: Dict[str, int] = {route: 0 for route in self.routes}
+        self.oversize: Dict[str, int] = {route: 0 for route in self.routes}
+
+    @classmethod
+    def from_env(cls, pool: UpstreamPool) -> "RequestCoalescer":
+        return cls(
+            pool,
+            routes=_split(os.getenv("COALESCE_ROUTES", DEFAULT_COALESCE_ROUTES)),
+            vary_headers=_split(os.getenv("COALESCE_VARY_HEADERS", DEFAULT_VARY_HEADERS)),
+            max_body_bytes=COALESCE_MAX_BODY_BYTES,
+            oversize_ttl=COALESCE_OVERSIZE_TTL,
+        )
+
+    def match(self, service: str, path: str) -> Optional[str]:
+        segments = f"{service}/{path}".rstrip("/").split("/")
+        for route in self.routes:
+            pattern = route.split("/")
+            if len(pattern) == len(segments) and all(map(fnmatch.fnmatchcase, segments, pattern)):
+                return route
+        return None
+
+    def _key(self, service: str, path: str, request: Request) -> tuple:
+        query = tuple(sorted(request.query_params.multi_items()))
+        vary = tuple(request.headers.get(name, "") for name in self.vary_headers)
+        return (service, path, query, vary)
+
+    def _is_oversize(self, resource: tuple) -> bool:
+        cutoff = time.monotonic() - self.oversize_ttl
+        while self._oversize and next(iter(self._oversize.values())) <= cutoff:
+            self._oversize.popitem(last=False)
+        return resource in self._oversize
+
+    def _mark_oversize(self, resource: tuple):
+        self._oversize.pop(resource, None)
+        self._oversize[resource] = time.monotonic()
+
+    async def forward(self, service: str, path: str, request: Request) -> Response:
+        route = self.match(service, path) if request.method == "GET" else None
+        if route is None or any(name in request.headers for name in UNSHARED_HEADERS):
+            return await self.pool.forward(service, path, request)
+
+        key = self._key(service, path, request)
+        resource = key[:3]
+        if self._is_oversize(resource):
+            self.upstream_calls[route] += 1
+            return await self.pool.forward(service, path, request)
+
+        task = self._in_flight.get(key)
+        leader = task is None
+        if leader:
+            # The upstream call runs in its own task so a leader that
+            # disconnects doesn't cancel it for everyone else
+            task = asyncio.ensure_future(self.pool.fetch(service, path, request, self.max_body_bytes))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+            self.upstream_calls[route] += 1
+        else:
+            self.coalesced[route] += 1
+
+        result = await asyncio.shield(task)
+        if result is None:
+            # Too large to buffer and share; stream a call of our own, and
+            # don't try sharing this resource again for a while
+            self._mark_oversize(resource)
+            self.oversize[route] += 1
+            self.upstream_calls[route] += 1
+            if not leader:
+                self.coalesced[route] -= 1
+            return await self.pool.forward(service, path, request)
+        status_code, headers, body = result
+        response = Response(content=body, status_code=status_code)
+        response.raw_headers = list(headers)
+        return response
+
+    def _finished(self, key: tuple, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter went away
+            task.exception()
+
+    def stats(self) -> dict:
+        upstream_calls = sum(self.upstream_calls.values())
+        coalesced = sum(self.coalesced.values())
+        total = upstream_calls + coalesced
+        return {
+            "upstream_calls": upstream_calls,
+            "coalesced_requests": coalesced,
+            "coalesce_rate": coalesced / total if total else 0.0,
+            "in_flight": len(self._in_flight),
+            "oversize_responses": sum(self.oversize.values()),
+            "routes": [
+                {
+                    "route": route,
+                    "upstream_calls": self.upstream_calls[route],
+                    "coalesced_requests": self.coalesced[route],
+                    "oversize_responses": self.oversize[route],
+                }
+                for route in self.routes
+            ],
+        }
@@ -0,0 +1,76 @@
+"""
+Concurrent upstream health probing for the API Gateway.
+
+All upstreams are probed at once over the proxy's pooled clients, each
+with a hard deadline, so a full status check takes at most one timeout.
+Results are cached for a short TTL and concurrent callers share a single
+refresh, so dashboards polling /services/status don't multiply traffic.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from proxy import Upstream, UpstreamPool
+
+
+class HealthChecker:
+    def __init__(self, pool: UpstreamPool, timeout: float = 2.0, ttl: float = 5.0):
+        self.pool = pool
+        self.timeout = timeout
+        self.ttl = ttl
+        self._results: Optional[List[dict]] = None
+        self._checked_at = 0.0
+        self.checked_at: Optional[datetime] = None
+        self._lock = asyncio.Lock()
+
+    async def _probe(self, upstream: Upstream) -> dict:
+        result = {
+            "name": upstream.display_name,
+            "url": upstream.url,
+            "status": "down",
+            "version": "unknown",
+            "latency_ms": None,
+            "error": None,
+        }
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                self.pool.client(upstream.name).get("/health", timeout=self.timeout),
+                timeout=self.timeout,
+            )
+        except asyncio.TimeoutError:
+            result["error"] = "timeout"
+            return result
+        except Exception as e:
+            result["error"] = type(e).__name__
+            return result
+
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        if response.status_code == 200:
+            result["status"] = "operational"
+            try:
+                result["version"] = response.json().get("version", "unknown")
+            except ValueError:
+                pass
+        else:
+            result["status"] = "degraded"
+            result["error"] = f"HTTP {response.status_code}"
+        return result
+
+    async def check_all(self) -> List[dict]:
+        if self._results is not None and time.monotonic() - self._checked_at < self.ttl:
+            return self._results
+
+        async with self._lock:
+            # Another caller may have refreshed while we waited for the lock
+            if self._results is not None and time.monotonic() - self._checked_at < self.ttl:
+                return self._results
+
+            self._results = await asyncio.gather(
+                *(self._probe(upstream) for upstream in self.pool.upstreams.values())
+            )
+            self._checked_at = time.monotonic()
+            self.checked_at = datetime.utcnow()
+            return self._results
@@ -1,21 +1,47 @@
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, Dict
 from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
 import jwt
 import hashlib
+import os
+import time
 
-app = FastAPI(title="AI-DOS API Gateway", version="1.0.0")
+from aidos_common.metrics import MetricsMiddleware, MetricsRegistry
+from aidos_common.responses import default_response_class
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+from breaker import BreakerConfig
+from coalesce import RequestCoalescer
+from health import HealthChecker
+from passwords import PasswordHasher
+from proxy import ProxyConfig, UpstreamPool, default_upstreams
+from rate_limit import limiter_from_env
+from storage import DuplicateUserError, UserStore, hash_api_key
+from token_cache import TokenCache
+
+upstream_pool = UpstreamPool(default_upstreams(), ProxyConfig.from_env(), BreakerConfig.from_env())
+health_checker = HealthChecker(
+    upstream_pool,
+    timeout=float(os.getenv("HEALTH_CHECK_TIMEOUT", 2.0)),
+    ttl=float(os.getenv("HEALTH_CHECK_TTL", 5.0)),
 )
+coalescer = RequestCoalescer.from_env(upstream_pool)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await upstream_pool.start()
+    yield
+    await upstream_pool.close()
+    await rate_limiter.close()
+    password_hasher.shutdown()
+    user_store.close()
+
+app = FastAPI(title="AI-DOS API Gateway", version="1.0.0", lifespan=lifespan, default_response_class=default_response_class())
 
 # Configuration
 SECRET_KEY = "your-secret-key-change-in-production"
@@ -23,6 +49,17 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
 security = HTTPBearer()
+token_cache = TokenCache(
+    max_size=int(os.getenv("TOKEN_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("TOKEN_CACHE_TTL", 300)),
+)
+rate_limiter = limiter_from_env()
+password_hasher = PasswordHasher.from_env()
+user_store = UserStore.from_env()
+# Seconds a cached user record is trusted before it is re-read from user_store
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 30))
+RATE_LIMIT_EXEMPT_PATHS = {"/health", "/metrics", "/docs", "/redoc", "/openapi.json"}
+metrics = MetricsRegistry("api-gateway")
 
 # Models
 class User(BaseModel):
@@ -54,17 +91,57 @@ class ServiceStatus(BaseModel):
     url: str
     status: str
     version: str
+    latency_ms: Optional[float] = None
+    error: Optional[str] = None
+    breaker: str = "closed"
+    concurrency_limit: Optional[int] = None
+    in_flight: int = 0
+    error_rate: float = 0.0
+    slow_call_rate: float = 0.0
+    rejected_open: int = 0
+    rejected_overload: int = 0
 
-# In-memory storage
+# Read-through caches in front of user_store. Other workers deactivate
+# users and rehash passwords too, so user records expire after
+# USER_CACHE_TTL and login always reads the store.
 users_db: Dict[str, Dict] = {}
-api_keys_db: Dict[str, str] = {}
+api_keys_db: Dict[str, str] = {}  # hashed API key -> username
 
 # Helper functions
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+def get_user_record(username: str, max_age: float = USER_CACHE_TTL) -> Optional[Dict]:
+    record = users_db.get(username)
+    if record is not None and time.monotonic() - record["loaded_at"] < max_age:
+        return record
+    
+    row = user_store.get_user(username)
+    if row is None:
+        users_db.pop(username, None)
+        return None
+    
+    record = {
+        "user": User(
+            id=row["id"],
+            username=row["username"],
+            email=row["email"],
+            full_name=row["full_name"],
+            disabled=row["disabled"],
+            created_at=row["created_at"]
+        ),
+        "password": row["password_hash"],
+        "loaded_at": time.monotonic()
+    }
+    users_db[username] = record
+    return record
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return hash_password(plain_password) == hashed_password
+def get_api_key_owner(api_key: str) -> Optional[str]:
+    key_hash = hash_api_key(api_key)
+    if key_hash in api_keys_db:
+        return api_keys_db[key_hash]
+    
+    username = user_store.get_api_key_owner(key_hash)
+    if username is not None:
+        api_keys_db[key_hash] = username
+    return username
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
@@ -74,11 +151,76 @@ def create_access_token(data: dict) -> str:
     return encoded_jwt
 
 def verify_token(token: str) -> Optional[dict]:
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except jwt.PyJWTError:
         return None
+    token_cache.put(token, payload)
+    return payload
+
+def authenticate(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    payload = verify_token(credentials.credentials)
+    
+    if not payload:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    username = payload.get("sub")
+    record = get_user_record(username)
+    if record is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    if record["user"].disabled:
+        raise HTTPException(status_code=401, detail="User is disabled")
+    
+    return username
+
+async def rate_limit_identities(request: Request) -> list:
+    identities = []
+    api_key = request.headers.get("x-api-key")
+    if api_key:
+        key_hash = hash_api_key(api_key)
+        owner = api_keys_db.get(key_hash) or await run_in_threadpool(get_api_key_owner, api_key)
+        if owner is not None:
+            identities.append(f"apikey:{key_hash[:16]}")
+            identities.append(f"user:{owner}")
+
+    authorization = request.headers.get("authorization", "")
+    if not identities and authorization.lower().startswith("bearer "):
+        payload = verify_token(authorization[7:])
+        if payload and payload.get("sub"):
+            identities.append(f"user:{payload['sub']}")
+
+    if not identities:
+        identities.append(f"ip:{request.client.host if request.client else 'unknown'}")
+    return identities
+
+@app.middleware("http")
+async def enforce_rate_limit(request: Request, call_next):
+    if request.method == "OPTIONS" or request.url.path in RATE_LIMIT_EXEMPT_PATHS:
+        return await call_next(request)
+    
+    result = await rate_limiter.hit(await rate_limit_identities(request))
+    if not result.allowed:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Rate limit exceeded"},
+            headers={"Retry-After": result.retry_after_header},
+        )
+    return await call_next(request)
+
+# Outside the rate limiter, so 429 responses carry CORS headers too
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Added last so it is outermost and also counts rate-limited requests
+app.add_middleware(MetricsMiddleware, registry=metrics, expand_params=("service",))
 
 # Endpoints
 
@@ -90,19 +232,9 @@ def root():
         "status": "operational",
         "documentation": "/docs",
         "services": {
-            "dataforge": "http://dataforge:8000",
-            "modelhub": "http://modelhub:8000",
-            "trainos": "http://trainos:8000",
-            "deployengine": "http://deployengine:8000",
-            "evalkit": "http://evalkit:8000",
-            "promptstudio": "http://promptstudio:8000",
-            "marketplace": "http://marketplace:8000",
-            "collabspace": "http://collabspace:8000",
-            "costoptimizer": "http://costoptimizer:8000",
-            "automl": "http://automl:8000",
-            "security": "http://security:8000",
-            "edgesync": "http://edgesync:8000"
-        }
+            name: upstream.url for name, upstream in upstream_pool.upstreams.items()
+        },
+        "routes": [f"/{name}/*" for name in upstream_pool.upstreams]
     }
 
 @app.get("/health")
@@ -114,28 +246,29 @@ def health_check():
     }
 
 @app.get("/services/status")
-def get_services_status():
+async def get_services_status():
+    results = await health_checker.check_all()
+    # Health results are cached briefly; breaker state is always live
     services = [
-        ServiceStatus(name="DataForge", url="http://dataforge:8000", status="operational", version="1.0.0"),
-        ServiceStatus(name="ModelHub", url="http://modelhub:8000", status="operational", version="1.0.0"),
-        ServiceStatus(name="TrainOS", url="http://trainos:8000", status="operational", version="1.0.0"),
-        ServiceStatus(name="DeployEngine", url="http://deployengine:8000", status="operational", version="1.0.0"),
-        ServiceStatus(name="EvalKit", url="http://evalkit:8000", status="operational", version="1.0.0"),
-        ServiceStatus(name="PromptStudio", url="http://promptstudio:8000", status="operational", version="1.0.0"),
-        ServiceStatus(name="AIMarketplace", url="http://marketplace:8000", status="operational", version="1.0.0"),
-        ServiceStatus(name="CollabSpace", url="http://collabspace:8000", status="operational", version="1.0.0"),
-        ServiceStatus(name="CostOptimizer", url="http://costoptimizer:8000", status="operational", version="1.0.0"),
-        ServiceStatus(name="AutoML Studio", url="http://automl:8000", status="operational", version="1.0.0"),
-        ServiceStatus(name="SecurityVault", url="http://security:8000", status="operational", version="1.0.0"),
-        ServiceStatus(name="EdgeSync", url="http://edgesync:8000", status="operational", version="1.0.0"),
+        ServiceStatus(**result, **upstream_pool.guards[name].snapshot())
+        for name, result in zip(upstream_pool.upstreams, results)
     ]
-    return {"services": services, "total": len(services), "healthy": len(services)}
+    return {
+        "services": services,
+        "total": len(services),
+        "healthy": len([s for s in services if s.status == "operational"]),
+        "checked_at": health_checker.checked_at
+    }
 
 # Authentication
 @app.post("/auth/register", response_model=User)
-def register(user_create: UserCreate):
-    if user_create.username in users_db:
+async def register(user_create: UserCreate):
+    if await run_in_threadpool(get_user_record, user_create.username) is not None:
         raise HTTPException(status_code=400, detail="Username already exists")
+    if await run_in_threadpool(user_store.email_exists, user_create.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    password = await password_hasher.hash(user_create.password)
     
     user_id = hashlib.md5(f"{user_create.username}{datetime.utcnow()}".encode()).hexdigest()
     user = User(
@@ -146,21 +279,38 @@ def register(user_create: UserCreate):
         created_at=datetime.utcnow()
     )
     
+    try:
+        # The unique constraints catch a registration that raced us while hashing
+        await run_in_threadpool(
+            user_store.add_user,
+            user.id, user.username, user.email, user.full_name, password, user.created_at
+        )
+    except DuplicateUserError:
+        raise HTTPException(status_code=400, detail="Username or email already exists")
+    
     users_db[user_create.username] = {
         "user": user,
-        "password": hash_password(user_create.password)
+        "password": password,
+        "loaded_at": time.monotonic()
     }
     
     return user
 
 @app.post("/auth/login", response_model=Token)
-def login(user_login: UserLogin):
-    if user_login.username not in users_db:
+async def login(user_login: UserLogin):
+    # Always fresh: another worker may have deactivated the user or changed the hash
+    user_data = await run_in_threadpool(get_user_record, user_login.username, 0)
+    if user_data is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    user_data = users_db[user_login.username]
-    if not verify_password(user_login.password, user_data["password"]):
+    if not await password_hasher.verify(user_login.password, user_data["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if user_data["user"].disabled:
+        raise HTTPException(status_code=401, detail="User is disabled")
+    
+    if password_hasher.needs_rehash(user_data["password"]):
+        user_data["password"] = await password_hasher.hash(user_login.password)
+        await run_in_threadpool(user_store.update_password, user_login.username, user_data["password"])
     
     access_token = create_access_token({"sub": user_login.username})
     
@@ -172,31 +322,19 @@ def login(user_login: UserLogin):
     )
 
 @app.get("/auth/me", response_model=User)
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = verify_token(token)
-    
-    if not payload:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    username = payload.get("sub")
-    if username not in users_db:
-        raise HTTPException(status_code=401, detail="User not found")
-    
+def get_current_user(username: str = Depends(authenticate)):
     return users_db[username]["user"]
 
+@app.post("/auth/deactivate", response_model=User)
+def deactivate_user(username: str = Depends(authenticate)):
+    user = users_db[username]["user"]
+    user_store.set_disabled(username, True)
+    user.disabled = True
+    token_cache.invalidate_user(username)
+    return user
+
 @app.post("/auth/refresh", response_model=Token)
-def refresh_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = verify_token(token)
-    
-    if not payload:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    username = payload.get("sub")
-    if username not in users_db:
-        raise HTTPException(status_code=401, detail="User not found")
-    
+def refresh_token(username: str = Depends(authenticate)):
     new_token = create_access_token({"sub": username})
     
     return Token(
@@ -208,16 +346,11 @@ def refresh_token(credentials: HTTPAuthorizationCredentials = Depends(security))
 
 # API Key Management
 @app.post("/api-keys/generate")
-def generate_api_key(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = verify_token(token)
-    
-    if not payload:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    username = payload.get("sub")
-    api_key = hashlib.sha256(f"{username}{datetime.utcnow()}".encode()).hexdigest()
-    api_keys_db[api_key] = username
+def generate_api_key(username: str = Depends(authenticate)):
+    api_key = hashlib.sha256(f"{username}{datetime.utcnow()}{os.urandom(16).hex()}".encode()).hexdigest()
+    key_hash = hash_api_key(api_key)
+    user_store.add_api_key(key_hash, username, datetime.utcnow())
+    api_keys_db[key_hash] = username
     
     return {
         "api_key": api_key,
@@ -227,10 +360,10 @@ def generate_api_key(credentials: HTTPAuthorizationCredentials = Depends(securit
 
 @app.get("/api-keys/validate")
 def validate_api_key(api_key: str = Header(..., alias="X-API-Key")):
-    if api_key not in api_keys_db:
+    username = get_api_key_owner(api_key)
+    if username is None:
         raise HTTPException(status_code=401, detail="Invalid API key")
     
-    username = api_keys_db[api_key]
     return {
         "valid": True,
         "username": username,
@@ -239,30 +372,41 @@ def validate_api_key(api_key: str = Header(..., alias="X-API-Key")):
 
 # Rate Limiting Info
 @app.get("/rate-limits")
-def get_rate_limits(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_rate_limits(username: str = Depends(authenticate)):
+    usage = await rate_limiter.usage(f"user:{username}")
     return {
-        "requests_per_minute": 60,
-        "requests_per_hour": 1000,
-        "requests_per_day": 10000,
-        "current_usage": {
-            "minute": 5,
-            "hour": 120,
-            "day": 850
-        }
+        "requests_per_minute": usage["minute"]["limit"],
+        "requests_per_hour": usage["hour"]["limit"],
+        "requests_per_day": usage["day"]["limit"],
+        "current_usage": {window: counts["used"] for window, counts in usage.items()},
+        "remaining": {window: counts["remaining"] for window, counts in usage.items()}
     }
 
 # System Stats
 @app.get("/stats")
-def get_system_stats():
+async def get_system_stats():
+    services = await health_checker.check_all()
     return {
-        "total_users": len(users_db),
-        "total_api_keys": len(api_keys_db),
-        "services_online": 12,
-        "uptime_percentage": 99.9,
-        "total_requests_today": 15420,
-        "average_response_time_ms": 45
+        "total_users": await run_in_threadpool(user_store.count_users),
+        "total_api_keys": await run_in_threadpool(user_store.count_api_keys),
+        "services_online": len([s for s in services if s["status"] == "operational"]),
+        **metrics.summary(),
+        "top_routes": metrics.top_routes(),
+        "token_cache": token_cache.stats(),
+        "rate_limited_requests": rate_limiter.rejected,
+        "password_hashing": password_hasher.stats(),
+        "request_coalescing": coalescer.stats()
     }
 
+# Reverse proxy - must stay last so gateway routes take precedence
+@app.api_route(
+    "/{service}/{path:path}",
+    methods=["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"],
+    include_in_schema=False,
+)
+async def proxy(service: str, path: str, request: Request):
+    return await coalescer.forward(service, path, request)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
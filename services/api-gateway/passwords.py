@@ -0,0 +1,150 @@
+"""
+Password hashing for the API Gateway.
+
+Passwords are hashed with scrypt (salted, memory-hard) in a bounded thread
+pool so a burst of logins cannot block the event loop. At most `workers`
+hashes run at once and at most `max_queue` more may wait; anything beyond
+that is turned away with 503 instead of piling up behind the KDF.
+
+Stored hashes carry their own parameters
+(`scrypt$<n>$<r>$<p>$<salt>$<hash>`), so changing the parameters - or
+finding a legacy unsalted SHA-256 hex digest - makes `needs_rehash` true
+and the caller can upgrade the hash on the next successful login.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+
+class ScryptParams(BaseModel):
+    n: int = 2 ** 14
+    r: int = 8
+    p: int = 1
+    salt_bytes: int = 16
+    key_bytes: int = 32
+
+    @classmethod
+    def from_env(cls) -> "ScryptParams":
+        return cls(
+            n=int(os.getenv("PASSWORD_SCRYPT_N", 2 ** 14)),
+            r=int(os.getenv("PASSWORD_SCRYPT_R", 8)),
+            p=int(os.getenv("PASSWORD_SCRYPT_P", 1)),
+        )
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int, key_bytes: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p,
+        maxmem=256 * n * r + 1024 * 1024, dklen=key_bytes,
+    )
+
+
+def _hash(password: str, params: ScryptParams) -> str:
+    salt = os.urandom(params.salt_bytes)
+    key = _scrypt(password, salt, params.n, params.r, params.p, params.key_bytes)
+    return f"scrypt${params.n}${params.r}${params.p}${_b64encode(salt)}${_b64encode(key)}"
+
+
+def _verify(password: str, stored: str) -> bool:
+    if not stored.startswith("scrypt$"):
+        # Legacy unsalted SHA-256 hex digest
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored)
+
+    _, n, r, p, salt, expected = stored.split("$")
+    expected = base64.b64decode(expected)
+    key = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p), len(expected))
+    return hmac.compare_digest(key, expected)
+
+
+class PasswordHasher:
+    def __init__(self, params: Optional[ScryptParams] = None, workers: int = 4, max_queue: int = 64,
+                 retry_after: int = 1):
+        self.params = params or ScryptParams()
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._semaphore = asyncio.Semaphore(workers)
+        self._pending = 0
+        self._latencies_ms = deque(maxlen=1000)
+        self.completed = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls) -> "PasswordHasher":
+        return cls(
+            params=ScryptParams.from_env(),
+            workers=int(os.getenv("PASSWORD_HASH_WORKERS", 4)),
+            max_queue=int(os.getenv("PASSWORD_HASH_QUEUE", 64)),
+        )
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Authentication is busy, please retry",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        self._pending += 1
+        try:
+            async with self._semaphore:
+                started = time.perf_counter()
+                result = await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+                self._latencies_ms.append((time.perf_counter() - started) * 1000)
+                self.completed += 1
+                return result
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password, self.params)
+
+    async def verify(self, password: str, stored: str) -> bool:
+        return await self._run(_verify, password, stored)
+
+    def needs_rehash(self, stored: str) -> bool:
+        if not stored.startswith("scrypt$"):
+            return True
+        _, n, r, p, _, _ = stored.split("$")
+        return (int(n), int(r), int(p)) != (self.params.n, self.params.r, self.params.p)
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies_ms)
+
+        def percentile(q: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 2)
+
+        return {
+            "workers": self.workers,
+            "in_flight": min(self._pending, self.workers),
+            "queued": max(0, self._pending - self.workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "latency_ms": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "max": round(latencies[-1], 2) if latencies else 0.0,
+            },
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
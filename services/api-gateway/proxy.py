@@ -0,0 +1,262 @@
+"""
+Reverse-proxy data plane for the API Gateway.
+
+Each upstream service gets its own long-lived httpx.AsyncClient so that
+connections are kept alive and reused across requests, with per-upstream
+connection limits. Request and response bodies are streamed through the
+gateway instead of being buffered in memory. Calls pass through the
+upstream's UpstreamGuard (see breaker.py), which sheds load with 503 when
+the upstream is failing or saturated. A call holds its guard until the
+response body has been streamed (or the client went away), so long
+downloads count towards concurrency and slow-call detection.
+"""
+
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+
+from breaker import BreakerConfig, UpstreamGuard
+
+# Headers that apply to a single connection and must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+}
+
+# Recomputed by httpx for the outgoing request
+REQUEST_EXCLUDED_HEADERS = HOP_BY_HOP_HEADERS | {"host", "content-length"}
+
+
+class Upstream(BaseModel):
+    name: str
+    display_name: str
+    url: str
+    # Services whose routes don't already carry the service name (e.g.
+    # DataForge serves /datasets) get the gateway prefix stripped.
+    strip_prefix: bool = True
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+
+
+class ProxyConfig(BaseModel):
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    write_timeout: float = 30.0
+    pool_timeout: float = 5.0
+    keepalive_expiry: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "ProxyConfig":
+        return cls(
+            connect_timeout=float(os.getenv("PROXY_CONNECT_TIMEOUT", 5.0)),
+            read_timeout=float(os.getenv("PROXY_READ_TIMEOUT", 30.0)),
+            write_timeout=float(os.getenv("PROXY_WRITE_TIMEOUT", 30.0)),
+            pool_timeout=float(os.getenv("PROXY_POOL_TIMEOUT", 5.0)),
+            keepalive_expiry=float(os.getenv("PROXY_KEEPALIVE_EXPIRY", 30.0)),
+        )
+
+
+def default_upstreams() -> List[Upstream]:
+    return [
+        Upstream(name="dataforge", display_name="DataForge",
+                 url=os.getenv("DATAFORGE_URL", "http://dataforge:8000")),
+        Upstream(name="modelhub", display_name="ModelHub",
+                 url=os.getenv("MODELHUB_URL", "http://modelhub:8000")),
+        Upstream(name="magic", display_name="Magic Mode",
+                 url=os.getenv("MAGIC_URL", "http://magic:8003"), strip_prefix=False),
+        Upstream(name="marketplace", display_name="AIMarketplace",
+                 url=os.getenv("MARKETPLACE_URL", "http://marketplace:8004"), strip_prefix=False),
+        Upstream(name="deploy", display_name="DeployEngine",
+                 url=os.getenv("DEPLOY_URL", "http://deploy:8000"), strip_prefix=False),
+        Upstream(name="collab", display_name="CollabSpace",
+                 url=os.getenv("COLLAB_URL", "http://collab:8000")),
+        Upstream(name="autoscale", display_name="AutoScale",
+                 url=os.getenv("AUTOSCALE_URL", "http://autoscale:8000")),
+        Upstream(name="analytics", display_name="Analytics",
+                 url=os.getenv("ANALYTICS_URL", "http://analytics:8000"), strip_prefix=False),
+    ]
+
+
+class UpstreamPool:
+    """Keeps one pooled keep-alive client per upstream service."""
+
+    def __init__(self, upstreams: List[Upstream], config: Optional[ProxyConfig] = None,
+                 breaker_config: Optional[BreakerConfig] = None):
+        self.upstreams: Dict[str, Upstream] = {u.name: u for u in upstreams}
+        self.config = config or ProxyConfig()
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        breaker_config = breaker_config or BreakerConfig()
+        self.guards: Dict[str, UpstreamGuard] = {
+            u.name: UpstreamGuard(u.display_name, breaker_config) for u in upstreams
+        }
+
+    def _build_client(self, upstream: Upstream) -> httpx.AsyncClient:
+        timeout = httpx.Timeout(
+            connect=self.config.connect_timeout,
+            read=self.config.read_timeout,
+            write=self.config.write_timeout,
+            pool=self.config.pool_timeout,
+        )
+        limits = httpx.Limits(
+            max_connections=upstream.max_connections,
+            max_keepalive_connections=upstream.max_keepalive_connections,
+            keepalive_expiry=self.config.keepalive_expiry,
+        )
+        return httpx.AsyncClient(base_url=upstream.url, timeout=timeout, limits=limits)
+
+    async def start(self):
+        for upstream in self.upstreams.values():
+            self.clients[upstream.name] = self._build_client(upstream)
+
+    async def close(self):
+        for client in self.clients.values():
+            await client.aclose()
+        self.clients.clear()
+
+    def client(self, name: str) -> httpx.AsyncClient:
+        if name not in self.clients:
+            self.clients[name] = self._build_client(self.upstreams[name])
+        return self.clients[name]
+
+    def upstream_path(self, upstream: Upstream, path: str) -> str:
+        if upstream.strip_prefix:
+            return f"/{path}"
+        return f"/{upstream.name}/{path}" if path else f"/{upstream.name}"
+
+    async def send(self, name: str, path: str, request: Request) -> Tuple[httpx.Response, Callable[[bool], None]]:
+        """
+        Send `request` upstream and return the response with its body
+        unread, and `release(failed)`, which must be called once the body
+        has been consumed or abandoned. Calls after the first are ignored.
+        """
+        if name not in self.upstreams:
+            raise HTTPException(status_code=404, detail="Unknown service")
+
+        upstream = self.upstreams[name]
+        client = self.client(name)
+
+        headers = [
+            (k, v) for k, v in request.headers.items()
+            if k.lower() not in REQUEST_EXCLUDED_HEADERS
+        ]
+        if request.client:
+            headers.append(("x-forwarded-for", request.client.host))
+        headers.append(("x-forwarded-prefix", f"/{upstream.name}"))
+
+        has_body = request.method not in ("GET", "HEAD", "OPTIONS", "DELETE")
+        upstream_request = client.build_request(
+            request.method,
+            self.upstream_path(upstream, path),
+            params=request.query_params.multi_items(),
+            headers=headers,
+            content=request.stream() if has_body else None,
+        )
+
+        guard = self.guards[name]
+        ticket = guard.acquire()
+        try:
+            upstream_response = await client.send(upstream_request, stream=True)
+        except httpx.TimeoutException:
+            guard.release(ticket, failed=True)
+            raise HTTPException(status_code=504, detail=f"{upstream.display_name} timed out")
+        except httpx.HTTPError:
+            guard.release(ticket, failed=True)
+            raise HTTPException(status_code=502, detail=f"{upstream.display_name} unavailable")
+        except BaseException:
+            # Cancelled by the client, not the upstream's fault
+            guard.release(ticket, failed=False)
+            raise
+
+        released = False
+
+        def release(failed: bool):
+            nonlocal released
+            if not released:
+                released = True
+                guard.release(ticket, failed=failed or upstream_response.status_code >= 500)
+
+        return upstream_response, release
+
+    async def forward(self, name: str, path: str, request: Request) -> StreamingResponse:
+        upstream_response, release = await self.send(name, path, request)
+
+        async def body():
+            failed = False
+            try:
+                async for chunk in upstream_response.aiter_raw():
+                    yield chunk
+            except httpx.HTTPError:
+                failed = True
+                raise
+            finally:
+                release(failed)
+
+        async def close():
+            # Also runs when the client disconnected before the body was done
+            try:
+                await upstream_response.aclose()
+            finally:
+                release(False)
+
+        response = StreamingResponse(
+            body(),
+            status_code=upstream_response.status_code,
+            background=BackgroundTask(close),
+        )
+        # Raw pairs keep repeated headers such as Set-Cookie intact
+        response.raw_headers = [
+            (k, v) for k, v in upstream_response.headers.raw
+            if k.decode("latin-1").lower() not in HOP_BY_HOP_HEADERS
+        ]
+        return response
+
+    async def fetch(self, name: str, path: str, request: Request,
+                    max_body_bytes: int) -> Optional[Tuple[int, List[Tuple[bytes, bytes]], bytes]]:
+        """
+        Like `forward`, but reads the whole body so the result can be
+        shared. Returns None, having read at most `max_body_bytes`, when the
+        body is larger than that.
+        """
+        upstream_response, release = await self.send(name, path, request)
+        display_name = self.upstreams[name].display_name
+        failed = False
+        try:
+            declared = upstream_response.headers.get("content-length")
+            if declared is not None and declared.isdigit() and int(declared) > max_body_bytes:
+                return None
+            chunks, size = [], 0
+            async for chunk in upstream_response.aiter_raw():
+                size += len(chunk)
+                if size > max_body_bytes:
+                    return None
+                chunks.append(chunk)
+            body = b"".join(chunks)
+        except httpx.TimeoutException:
+            failed = True
+            raise HTTPException(status_code=504, detail=f"{display_name} timed out")
+        except httpx.HTTPError:
+            failed = True
+            raise HTTPException(status_code=502, detail=f"{display_name} unavailable")
+        finally:
+            try:
+                await upstream_response.aclose()
+            finally:
+                release(failed)
+
+        headers = [
+            (k, v) for k, v in upstream_response.headers.raw
+            if k.decode("latin-1").lower() not in HOP_BY_HOP_HEADERS | {"content-length"}
+        ]
+        headers.append((b"content-length", str(len(body)).encode()))
+        return upstream_response.status_code, headers, body
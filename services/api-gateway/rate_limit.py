@@ -0,0 +1,221 @@
+"""
+Multi-window token-bucket rate limiting for the API Gateway.
+
+Every identity (user, API key or client IP) gets one token bucket per
+window. A bucket holds up to `limit` tokens and refills continuously at
+`limit / seconds` tokens per second, so each check is O(1). A request is
+admitted only if every bucket of every identity it is charged to has a
+token left; otherwise nothing is consumed and the caller is told how long
+to wait.
+
+Two backends are provided: an in-process one for single-worker setups and
+tests, and a Redis one (atomic Lua script) shared by all gateway workers.
+"""
+
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class RateLimitWindow(BaseModel):
+    name: str
+    limit: int
+    seconds: int
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.seconds
+
+
+class RateLimitResult(BaseModel):
+    allowed: bool
+    retry_after: float = 0.0
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def default_windows() -> List[RateLimitWindow]:
+    return [
+        RateLimitWindow(name="minute", limit=int(os.getenv("RATE_LIMIT_PER_MINUTE", 60)), seconds=60),
+        RateLimitWindow(name="hour", limit=int(os.getenv("RATE_LIMIT_PER_HOUR", 1000)), seconds=3600),
+        RateLimitWindow(name="day", limit=int(os.getenv("RATE_LIMIT_PER_DAY", 10000)), seconds=86400),
+    ]
+
+
+class InMemoryBackend:
+    """Token buckets kept in a process-local dict."""
+
+    SWEEP_EVERY = 10000
+
+    def __init__(self):
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def _level(self, key: str, window: RateLimitWindow, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return float(window.limit)
+        tokens, updated_at = bucket
+        return min(float(window.limit), tokens + (now - updated_at) * window.rate)
+
+    async def hit(self, keys: List[str], windows: List[RateLimitWindow], cost: float = 1.0) -> RateLimitResult:
+        now = time.time()
+        with self._lock:
+            levels = [self._level(key, window, now) for key, window in zip(keys, windows)]
+            retry_after = max(
+                ((cost - level) / window.rate for level, window in zip(levels, windows) if level < cost),
+                default=0.0,
+            )
+            if retry_after > 0:
+                return RateLimitResult(allowed=False, retry_after=retry_after)
+
+            for key, level in zip(keys, levels):
+                self._buckets[key] = [level - cost, now]
+
+            self._calls += 1
+            if self._calls % self.SWEEP_EVERY == 0:
+                self._sweep(windows, now)
+        return RateLimitResult(allowed=True)
+
+    async def levels(self, keys: List[str], windows: List[RateLimitWindow]) -> List[float]:
+        now = time.time()
+        with self._lock:
+            return [self._level(key, window, now) for key, window in zip(keys, windows)]
+
+    async def close(self):
+        pass
+
+    def _sweep(self, windows: List[RateLimitWindow], now: float):
+        # Buckets that have been idle long enough to refill completely carry
+        # no state worth keeping.
+        longest = max(window.seconds for window in windows)
+        stale = [key for key, (_, updated_at) in self._buckets.items() if now - updated_at > longest]
+        for key in stale:
+            del self._buckets[key]
+
+
+# Checks every bucket first and only consumes if all of them have capacity,
+# so a denied request leaves the state untouched.
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local levels = {}
+local retry = 0
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[1 + i * 2])
+    local rate = tonumber(ARGV[2 + i * 2])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < cost then
+        retry = math.max(retry, (cost - tokens) / rate)
+    end
+end
+if retry > 0 then
+    return {0, tostring(retry)}
+end
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[1 + i * 2])
+    local rate = tonumber(ARGV[2 + i * 2])
+    redis.call('HSET', KEYS[i], 'tokens', tostring(levels[i] - cost), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[i], math.ceil(capacity / rate))
+end
+return {1, '0'}
+"""
+
+
+class RedisBackend:
+    """Token buckets shared by every gateway worker through Redis."""
+
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    @classmethod
+    def from_env(cls) -> "RedisBackend":
+        import redis.asyncio as redis
+
+        client = redis.Redis(
+            host=os.getenv("REDIS_HOST", "localhost"),
+            port=int(os.getenv("REDIS_PORT", 6379)),
+        )
+        return cls(client)
+
+    async def hit(self, keys: List[str], windows: List[RateLimitWindow], cost: float = 1.0) -> RateLimitResult:
+        args = [time.time(), cost]
+        for window in windows:
+            args.extend([window.limit, window.rate])
+        allowed, retry_after = await self._script(keys=[self.prefix + k for k in keys], args=args)
+        return RateLimitResult(allowed=bool(allowed), retry_after=float(retry_after))
+
+    async def levels(self, keys: List[str], windows: List[RateLimitWindow]) -> List[float]:
+        now = time.time()
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hmget(self.prefix + key, "tokens", "ts")
+        states = await pipe.execute()
+
+        levels = []
+        for (tokens, updated_at), window in zip(states, windows):
+            if tokens is None:
+                levels.append(float(window.limit))
+            else:
+                refill = max(0.0, now - float(updated_at)) * window.rate
+                levels.append(min(float(window.limit), float(tokens) + refill))
+        return levels
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class RateLimiter:
+    def __init__(self, backend, windows: Optional[List[RateLimitWindow]] = None):
+        self.backend = backend
+        self.windows = windows or default_windows()
+        self.rejected = 0
+
+    def _keys(self, identities: List[str]):
+        keys, windows = [], []
+        for identity in identities:
+            for window in self.windows:
+                keys.append(f"{identity}:{window.name}")
+                windows.append(window)
+        return keys, windows
+
+    async def hit(self, identities: List[str]) -> RateLimitResult:
+        keys, windows = self._keys(identities)
+        result = await self.backend.hit(keys, windows)
+        if not result.allowed:
+            self.rejected += 1
+        return result
+
+    async def usage(self, identity: str) -> Dict[str, dict]:
+        keys, windows = self._keys([identity])
+        levels = await self.backend.levels(keys, windows)
+        return {
+            window.name: {
+                "limit": window.limit,
+                "used": window.limit - int(level),
+                "remaining": int(level),
+            }
+            for window, level in zip(windows, levels)
+        }
+
+    async def close(self):
+        await self.backend.close()
+
+
+def limiter_from_env() -> RateLimiter:
+    if os.getenv("RATE_LIMIT_BACKEND", "memory") == "redis":
+        return RateLimiter(RedisBackend.from_env())
+    return RateLimiter(InMemoryBackend())
@@ -0,0 +1,129 @@
+"""
+Persistent user and API-key storage for the API Gateway.
+
+Backed by any SQLAlchemy URL - SQLite for local development, Postgres in
+docker-compose - so every gateway worker sees the same users. Users are
+indexed by username and email; API keys are stored only as SHA-256
+digests, indexed by that digest.
+"""
+
+import hashlib
+import os
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import (
+    Boolean, Column, DateTime, MetaData, String, Table, create_engine, func, select, update,
+)
+from sqlalchemy.exc import IntegrityError
+
+metadata = MetaData()
+
+users_table = Table(
+    "gateway_users",
+    metadata,
+    Column("id", String(64), nullable=False),
+    Column("username", String(255), primary_key=True),
+    Column("email", String(255), nullable=False, unique=True, index=True),
+    Column("full_name", String(255), nullable=False),
+    Column("password_hash", String(255), nullable=False),
+    Column("disabled", Boolean, nullable=False, default=False),
+    Column("created_at", DateTime, nullable=False),
+)
+
+api_keys_table = Table(
+    "gateway_api_keys",
+    metadata,
+    Column("key_hash", String(64), primary_key=True),
+    Column("username", String(255), nullable=False, index=True),
+    Column("created_at", DateTime, nullable=False),
+)
+
+
+class DuplicateUserError(Exception):
+    pass
+
+
+def hash_api_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+class UserStore:
+    def __init__(self, url: str):
+        connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+        self.engine = create_engine(url, pool_pre_ping=True, connect_args=connect_args)
+        metadata.create_all(self.engine)
+
+    @classmethod
+    def from_env(cls) -> "UserStore":
+        return cls(os.getenv("DATABASE_URL", "sqlite:///./gateway.db"))
+
+    def get_user(self, username: str) -> Optional[dict]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(users_table).where(users_table.c.username == username)
+            ).mappings().first()
+        return dict(row) if row else None
+
+    def email_exists(self, email: str) -> bool:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(users_table.c.username).where(users_table.c.email == email)
+            ).first()
+        return row is not None
+
+    def add_user(self, id: str, username: str, email: str, full_name: str,
+                 password_hash: str, created_at: datetime):
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(users_table.insert().values(
+                    id=id,
+                    username=username,
+                    email=email,
+                    full_name=full_name,
+                    password_hash=password_hash,
+                    disabled=False,
+                    created_at=created_at,
+                ))
+        except IntegrityError:
+            raise DuplicateUserError(username)
+
+    def update_password(self, username: str, password_hash: str):
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(users_table)
+                .where(users_table.c.username == username)
+                .values(password_hash=password_hash)
+            )
+
+    def set_disabled(self, username: str, disabled: bool):
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(users_table)
+                .where(users_table.c.username == username)
+                .values(disabled=disabled)
+            )
+
+    def add_api_key(self, key_hash: str, username: str, created_at: datetime):
+        with self.engine.begin() as conn:
+            conn.execute(api_keys_table.insert().values(
+                key_hash=key_hash, username=username, created_at=created_at
+            ))
+
+    def get_api_key_owner(self, key_hash: str) -> Optional[str]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(api_keys_table.c.username).where(api_keys_table.c.key_hash == key_hash)
+            ).first()
+        return row[0] if row else None
+
+    def count_users(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(users_table)).scalar_one()
+
+    def count_api_keys(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(api_keys_table)).scalar_one()
+
+    def close(self):
+        self.engine.dispose()
@@ -0,0 +1,144 @@
+"""Circuit breaker state machine and AIMD concurrency limits, on an injected clock."""
+
+import pytest
+from fastapi import HTTPException
+
+import breaker
+from breaker import CLOSED, HALF_OPEN, OPEN, AdaptiveLimiter, BreakerConfig, CircuitBreaker, UpstreamGuard
+
+CONFIG = BreakerConfig(window_seconds=10, min_requests=4, error_rate_threshold=0.5, slow_call_seconds=1.0,
+                       slow_call_rate_threshold=0.8, open_seconds=5.0, half_open_probes=2,
+                       initial_limit=4, min_limit=2, max_limit=6, backoff_ratio=0.5)
+T0 = 1000.0
+
+
+def tripped(now: float = T0) -> CircuitBreaker:
+    circuit = CircuitBreaker(CONFIG)
+    for failed in (False, True, False, True):
+        circuit.record(now, failed=failed, slow=False)
+    assert circuit.state == OPEN
+    return circuit
+
+
+def test_stays_closed_below_min_requests_and_thresholds():
+    circuit = CircuitBreaker(CONFIG)
+    for _ in range(3):
+        circuit.record(T0, failed=True, slow=False)
+    assert circuit.state == CLOSED  # only 3 calls, below min_requests
+    circuit = CircuitBreaker(CONFIG)
+    for failed, slow in [(True, False), (False, False), (False, True), (False, False), (True, False)]:
+        circuit.record(T0, failed=failed, slow=slow)
+    assert circuit.state == CLOSED  # at most 2/5 errors and 1/5 slow
+    assert circuit.window(T0) == (5, 2, 1)
+
+
+def test_trips_on_error_rate_and_rejects_until_cool_down():
+    circuit = tripped()
+    assert not circuit.allow(T0 + 4.9)
+    assert circuit.retry_after(T0 + 4.2) == 1
+    assert circuit.retry_after(T0) == 5
+
+
+def test_trips_on_slow_call_rate():
+    circuit = CircuitBreaker(CONFIG)
+    for _ in range(4):
+        circuit.record(T0, failed=False, slow=True)
+    assert circuit.state == OPEN
+
+
+def test_old_failures_leave_the_window():
+    circuit = CircuitBreaker(CONFIG)
+    for _ in range(3):
+        circuit.record(T0, failed=True, slow=False)
+    # Ten seconds later the window holds only the new, successful calls
+    for _ in range(4):
+        circuit.record(T0 + 10, failed=False, slow=False)
+    assert circuit.state == CLOSED
+    assert circuit.window(T0 + 10) == (4, 0, 0)
+
+
+def test_half_open_closes_after_enough_successful_probes():
+    circuit = tripped()
+    now = T0 + 5
+    assert circuit.allow(now) and circuit.state == HALF_OPEN
+    assert circuit.allow(now)
+    assert not circuit.allow(now)  # only half_open_probes at once
+    circuit.record(now, failed=False, slow=False, probe=True)
+    assert circuit.state == HALF_OPEN
+    circuit.record(now, failed=False, slow=False, probe=True)
+    assert circuit.state == CLOSED
+    assert circuit.window(now) == (0, 0, 0)
+
+
+@pytest.mark.parametrize("failed, slow", [(True, False), (False, True)])
+def test_half_open_reopens_on_a_failed_or_slow_probe(failed, slow):
+    circuit = tripped()
+    now = T0 + 5
+    assert circuit.allow(now)
+    circuit.record(now, failed=failed, slow=slow, probe=True)
+    assert circuit.state == OPEN
+    assert circuit.opened_at == now
+    assert not circuit.allow(now + 1)
+
+
+def test_limiter_sheds_over_the_limit():
+    limiter = AdaptiveLimiter(CONFIG)
+    assert all(limiter.try_acquire() for _ in range(4))
+    assert not limiter.try_acquire()
+    limiter.release(T0, failed=False, slow=False)
+    assert limiter.try_acquire()
+
+
+def test_limiter_grows_additively_only_when_saturated():
+    limiter = AdaptiveLimiter(CONFIG)
+    # One call in flight out of four: the limit isn't the constraint
+    limiter.try_acquire()
+    limiter.release(T0, failed=False, slow=False)
+    assert limiter.limit == 4
+    # Saturated: each success adds 1 / limit, so about one per round trip
+    for _ in range(4):
+        limiter.try_acquire()
+    for _ in range(4):
+        limiter.release(T0, failed=False, slow=False)
+    assert limiter.limit == pytest.approx(4.25)
+    for _ in range(100):
+        while limiter.try_acquire():
+            pass
+        while limiter.in_flight:
+            limiter.release(T0, failed=False, slow=False)
+    assert limiter.limit == CONFIG.max_limit
+
+
+def test_limiter_backs_off_multiplicatively_once_per_second():
+    limiter = AdaptiveLimiter(CONFIG)
+    for _ in range(4):
+        limiter.try_acquire()
+    for _ in range(3):
+        limiter.release(T0, failed=True, slow=False)
+    assert limiter.limit == 2  # 4 * 0.5, once for the whole burst
+    limiter.release(T0 + 1, failed=False, slow=True)
+    assert limiter.limit == CONFIG.min_limit  # floored
+
+
+def test_guard_releases_probe_slot_when_limiter_sheds(monkeypatch):
+    now = [T0]
+    monkeypatch.setattr(breaker.time, "monotonic", lambda: now[0])
+    guard = UpstreamGuard("upstream", CONFIG)
+    guard.breaker = tripped()
+    guard.limiter.in_flight = 4
+    now[0] = T0 + 5
+    with pytest.raises(HTTPException) as shed:
+        guard.acquire()
+    assert shed.value.detail == "upstream overloaded"
+    assert guard.breaker.probes_in_flight == 0
+
+    guard.limiter.in_flight = 0
+    ticket = guard.acquire()
+    assert ticket == (T0 + 5, True)
+    now[0] += 2  # slow_call_seconds is 1
+    guard.release(ticket, failed=False)
+    assert guard.breaker.state == OPEN
+    with pytest.raises(HTTPException) as rejected:
+        guard.acquire()
+    assert rejected.value.headers["Retry-After"] == "5"
+    assert guard.snapshot()["rejected_open"] == 1
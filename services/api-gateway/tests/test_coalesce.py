@@ -0,0 +1,73 @@
+"""Request coalescing against a fake upstream pool."""
+
+import asyncio
+
+from fastapi import Request, Response
+
+from coalesce import RequestCoalescer
+
+
+class FakePool:
+    def __init__(self, body: bytes):
+        self.body = body
+        self.fetches = 0
+        self.forwards = 0
+
+    async def fetch(self, name, path, request, max_body_bytes):
+        self.fetches += 1
+        await asyncio.sleep(0.01)
+        if len(self.body) > max_body_bytes:
+            return None
+        return 200, [(b"content-type", b"application/json")], self.body
+
+    async def forward(self, name, path, request):
+        self.forwards += 1
+        return Response(content=self.body)
+
+
+def get(path: str, query: str = "") -> Request:
+    return Request({"type": "http", "method": "GET", "path": f"/{path}", "query_string": query.encode(),
+                    "headers": [(b"authorization", b"Bearer a")]})
+
+
+def burst(coalescer: RequestCoalescer, n: int, query: str = ""):
+    async def main():
+        return await asyncio.gather(*(coalescer.forward("modelhub", "experiments", get("experiments", query))
+                                      for _ in range(n)))
+
+    return asyncio.run(main())
+
+
+def test_identical_requests_share_one_call():
+    pool = FakePool(b"[]")
+    coalescer = RequestCoalescer(pool, ["modelhub/experiments"], max_body_bytes=1024)
+    responses = burst(coalescer, 5)
+    assert [r.body for r in responses] == [b"[]"] * 5
+    assert (pool.fetches, pool.forwards) == (1, 0)
+    stats = coalescer.stats()
+    assert (stats["upstream_calls"], stats["coalesced_requests"]) == (1, 4)
+
+
+def test_oversize_resource_is_not_fetched_twice_again():
+    pool = FakePool(b"x" * 2048)
+    coalescer = RequestCoalescer(pool, ["modelhub/experiments"], max_body_bytes=1024, oversize_ttl=60)
+    burst(coalescer, 3)
+    # One discarded shared fetch, then each caller streams its own response
+    assert (pool.fetches, pool.forwards) == (1, 3)
+    burst(coalescer, 3)
+    assert (pool.fetches, pool.forwards) == (1, 6)
+    # Other queries are a different resource and still try to share
+    burst(coalescer, 1, query="limit=1")
+    assert pool.fetches == 2
+    stats = coalescer.stats()
+    assert stats["upstream_calls"] == pool.fetches + pool.forwards
+    assert stats["coalesced_requests"] == 0
+    assert stats["oversize_responses"] == 4
+
+
+def test_oversize_marks_expire():
+    pool = FakePool(b"x" * 2048)
+    coalescer = RequestCoalescer(pool, ["modelhub/experiments"], max_body_bytes=1024, oversize_ttl=0)
+    burst(coalescer, 1)
+    burst(coalescer, 1)
+    assert pool.fetches == 2
@@ -0,0 +1,89 @@
+"""
+Token-bucket rate limiting against the Redis backend's Lua script.
+
+Runs on fakeredis (with lupa for Lua) when it is installed, or against a
+real server when REDIS_URL is set; skipped otherwise.
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from rate_limit import RateLimiter, RateLimitWindow, RedisBackend
+
+
+def redis_client():
+    if os.getenv("REDIS_URL"):
+        import redis.asyncio as redis
+
+        return redis.Redis.from_url(os.environ["REDIS_URL"])
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return fakeredis.aioredis.FakeRedis()
+
+
+def run(scenario):
+    """Run `scenario(limiter)` on one event loop, with a fresh key prefix, and clean up after."""
+    client = redis_client()
+    prefix = f"test-ratelimit:{os.getpid()}:{id(client)}:"
+    windows = [
+        RateLimitWindow(name="minute", limit=3, seconds=60),
+        RateLimitWindow(name="hour", limit=5, seconds=3600),
+    ]
+    limiter = RateLimiter(RedisBackend(client, prefix=prefix), windows)
+
+    async def main():
+        try:
+            return await scenario(limiter)
+        finally:
+            keys = [key async for key in client.scan_iter(f"{prefix}*")]
+            if keys:
+                await client.delete(*keys)
+            await limiter.close()
+
+    return asyncio.run(main())
+
+
+def test_admits_up_to_the_limit_then_denies():
+    async def scenario(limiter):
+        results = [await limiter.hit(["user:a"]) for _ in range(4)]
+        return results, await limiter.usage("user:a")
+
+    results, usage = run(scenario)
+    assert [r.allowed for r in results] == [True, True, True, False]
+    # A minute bucket refills at 3 tokens / 60 s, so the next token is ~20 s away
+    assert 15 < results[-1].retry_after <= 20
+    assert results[-1].retry_after_header == "20"
+    assert usage["minute"]["remaining"] == 0
+    assert usage["hour"]["remaining"] == 2
+
+
+def test_denied_request_consumes_nothing():
+    async def scenario(limiter):
+        for _ in range(3):
+            await limiter.hit(["user:a"])
+        # user:a is exhausted, so charging both identities must fail and leave user:b untouched
+        denied = await limiter.hit(["user:b", "user:a"])
+        return denied, await limiter.usage("user:b")
+
+    denied, usage = run(scenario)
+    assert not denied.allowed
+    assert usage["minute"]["remaining"] == 3
+    assert usage["hour"]["remaining"] == 5
+
+
+def test_buckets_refill_over_time(monkeypatch):
+    import rate_limit
+
+    now = [1_000_000.0]
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now[0])
+
+    async def scenario(limiter):
+        for _ in range(3):
+            assert (await limiter.hit(["user:a"])).allowed
+        assert not (await limiter.hit(["user:a"])).allowed
+        now[0] += 20
+        return await limiter.hit(["user:a"])
+
+    assert run(scenario).allowed
@@ -0,0 +1,89 @@
+"""
+Verified-token cache for the API Gateway.
+
+Bounded LRU of bearer token -> decoded JWT claims. Entries expire at the
+token's own `exp` (or after `ttl` seconds, whichever is sooner), so a cached
+token is never accepted past its expiry. All entries for a user can be
+dropped at once when the user is disabled.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+
+class TokenCache:
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._by_user: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            claims, expires_at = entry
+            if now >= expires_at:
+                self._remove(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return claims
+
+    def put(self, token: str, claims: dict):
+        expires_at = time.time() + self.ttl
+        if "exp" in claims:
+            expires_at = min(expires_at, float(claims["exp"]))
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (claims, expires_at)
+            username = claims.get("sub")
+            if username is not None:
+                self._by_user.setdefault(username, set()).add(token)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_user(self, username: str) -> int:
+        with self._lock:
+            tokens = self._by_user.pop(username, set())
+            for token in tokens:
+                self._entries.pop(token, None)
+            return len(tokens)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _remove(self, token: str):
+        claims, _ = self._entries.pop(token)
+        username = claims.get("sub")
+        tokens = self._by_user.get(username)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._by_user[username]
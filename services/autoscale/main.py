@@ -7,7 +7,10 @@ from enum import Enum
 import uuid
 import random
 
-app = FastAPI(title="AI-DOS AutoScale Service", version="1.0.0")
+from aidos_common.metrics import MetricsMiddleware
+from aidos_common.responses import default_response_class
+
+app = FastAPI(title="AI-DOS AutoScale Service", version="1.0.0", default_response_class=default_response_class())
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,6 +20,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware, service="autoscale")
+
 # Enums
 class ScalingMetric(str, Enum):
     CPU = "cpu"
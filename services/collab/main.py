@@ -6,7 +6,10 @@ from datetime import datetime
 from enum import Enum
 import uuid
 
-app = FastAPI(title="AI-DOS Collaboration Service", version="1.0.0")
+from aidos_common.metrics import MetricsMiddleware
+from aidos_common.responses import default_response_class
+
+app = FastAPI(title="AI-DOS Collaboration Service", version="1.0.0", default_response_class=default_response_class())
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,6 +19,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware, service="collab")
+
 # Enums
 class Role(str, Enum):
     OWNER = "owner"
@@ -0,0 +1,5 @@
+"""
+Shared building blocks for AI-DOS services.
+"""
+
+__version__ = "1.0.0"
@@ -0,0 +1,154 @@
+"""
+Response caching with strong ETags for read-heavy list endpoints.
+
+Each cached route belongs to a namespace (e.g. "datasets") with a version
+counter. Write endpoints call `cache.invalidate(namespace)` after mutating
+the data, which bumps the counter. A response is identified by namespace
+version + path + canonical query string, so:
+
+- the ETag is known before the endpoint runs, and a matching
+  If-None-Match gets 304 without touching the data or serializing anything;
+- a cached body is served as-is while its namespace version is current;
+- otherwise the endpoint runs once and its encoded body is stored.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        # Distinguishes processes, which each hold their own data
+        self.nonce = os.urandom(4).hex()
+        self.versions: Dict[str, int] = {}
+        self._entries: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def invalidate(self, namespace: str):
+        with self._lock:
+            self.versions[namespace] = self.versions.get(namespace, 0) + 1
+
+    def etag(self, namespace: str, version: int, key: str) -> str:
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        return f'"{self.nonce}-{namespace}-{version}-{digest}"'
+
+    def get(self, namespace: str, key: str, version: int) -> Optional[tuple]:
+        entry = self._entries.get((namespace, key))
+        if entry is None or entry[0] != version:
+            return None
+        self._entries.move_to_end((namespace, key))
+        return entry
+
+    def put(self, namespace: str, key: str, version: int, headers: list, body: bytes):
+        with self._lock:
+            # Don't store a body that was computed against an older version
+            if self.versions.get(namespace, 0) != version:
+                return
+            self._entries[(namespace, key)] = (version, headers, body)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+
+def _if_none_match(headers: list) -> Optional[str]:
+    for name, value in headers:
+        if name == b"if-none-match":
+            return value.decode("latin-1")
+    return None
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+class ResponseCacheMiddleware:
+    """
+    Serves GET requests for the configured paths from a ResponseCache.
+
+    `routes` maps an exact request path to its cache namespace, e.g.
+    {"/datasets": "datasets"}.
+    """
+
+    def __init__(self, app, cache: ResponseCache, routes: Dict[str, str]):
+        self.app = app
+        self.cache = cache
+        self.routes = routes
+        self._route_objects: Dict[str, object] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] not in self.routes:
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        namespace = self.routes[path]
+        query = urlencode(sorted(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)))
+        key = f"{path}?{query}"
+        version = self.cache.versions.get(namespace, 0)
+        etag = self.cache.etag(namespace, version, key)
+
+        if path in self._route_objects:
+            # Lets outer middleware (metrics) label requests we answer directly
+            scope["route"] = self._route_objects[path]
+
+        if_none_match = _if_none_match(scope["headers"])
+        if if_none_match is not None and _etag_matches(if_none_match, etag):
+            self.cache.not_modified += 1
+            await self._send(send, 304, [(b"etag", etag.encode()), (b"cache-control", b"no-cache")], b"")
+            return
+
+        entry = self.cache.get(namespace, key, version)
+        if entry is not None:
+            self.cache.hits += 1
+            _, headers, body = entry
+            await self._send(send, 200, headers, body)
+            return
+
+        self.cache.misses += 1
+        start_message = {}
+        chunks = []
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                start_message.update(message)
+                if message["status"] == 200:
+                    headers = [
+                        (k, v) for k, v in message.get("headers", [])
+                        if k not in (b"etag", b"cache-control")
+                    ]
+                    headers += [(b"etag", etag.encode()), (b"cache-control", b"no-cache")]
+                    message = {**message, "headers": headers}
+                    start_message["headers"] = headers
+            elif message["type"] == "http.response.body" and start_message.get("status") == 200:
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+        if scope.get("route") is not None:
+            self._route_objects[path] = scope["route"]
+        if start_message.get("status") == 200:
+            self.cache.put(namespace, key, version, start_message["headers"], b"".join(chunks))
+
+    async def _send(self, send, status: int, headers: list, body: bytes):
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
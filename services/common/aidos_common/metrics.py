@@ -0,0 +1,181 @@
+"""
+Request metrics for AI-DOS services.
+
+MetricsMiddleware is a plain ASGI middleware that records, per route
+template, request counts by status, latency histograms and the number of
+requests in flight, and serves them at /metrics in Prometheus text format.
+
+Every update happens on the event loop thread (sync endpoints run in the
+threadpool, but this middleware does not), so the counters are plain
+integers and floats with no locking on the request path.
+"""
+
+import bisect
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RouteStats:
+    __slots__ = ("statuses", "bucket_counts", "count", "total_seconds")
+
+    def __init__(self, num_buckets: int):
+        self.statuses: Dict[int, int] = {}
+        self.bucket_counts = [0] * (num_buckets + 1)
+        self.count = 0
+        self.total_seconds = 0.0
+
+
+class MetricsRegistry:
+    def __init__(self, service: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.service = service
+        self.buckets = tuple(buckets)
+        self.routes: Dict[Tuple[str, str], RouteStats] = {}
+        self.in_flight = 0
+        self.started_at = time.time()
+
+    def observe(self, method: str, route: str, status: int, seconds: float):
+        key = (method, route)
+        stats = self.routes.get(key)
+        if stats is None:
+            stats = self.routes[key] = RouteStats(len(self.buckets))
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        stats.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        stats.count += 1
+        stats.total_seconds += seconds
+
+    def summary(self) -> dict:
+        total = sum(s.count for s in self.routes.values())
+        total_seconds = sum(s.total_seconds for s in self.routes.values())
+        errors = sum(
+            n for s in self.routes.values() for status, n in s.statuses.items() if status >= 500
+        )
+        return {
+            "total_requests": total,
+            "in_flight_requests": self.in_flight,
+            "error_requests": errors,
+            "error_rate": errors / total if total else 0.0,
+            "average_response_time_ms": round(total_seconds / total * 1000, 2) if total else 0.0,
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+        }
+
+    def top_routes(self, limit: int = 10) -> List[dict]:
+        ranked = sorted(self.routes.items(), key=lambda item: item[1].count, reverse=True)
+        return [
+            {
+                "method": method,
+                "route": route,
+                "requests": stats.count,
+                "average_response_time_ms": round(stats.total_seconds / stats.count * 1000, 2),
+            }
+            for (method, route), stats in ranked[:limit]
+        ]
+
+    def render_prometheus(self) -> str:
+        service = _escape(self.service)
+        lines = [
+            "# HELP aidos_http_requests_total Total HTTP requests by route and status.",
+            "# TYPE aidos_http_requests_total counter",
+        ]
+        for (method, route), stats in self.routes.items():
+            labels = f'service="{service}",method="{method}",route="{_escape(route)}"'
+            for status, count in stats.statuses.items():
+                lines.append(f'aidos_http_requests_total{{{labels},status="{status}"}} {count}')
+
+        lines += [
+            "# HELP aidos_http_requests_in_progress HTTP requests currently being served.",
+            "# TYPE aidos_http_requests_in_progress gauge",
+            f'aidos_http_requests_in_progress{{service="{service}"}} {self.in_flight}',
+            "# HELP aidos_http_request_duration_seconds HTTP request latency.",
+            "# TYPE aidos_http_request_duration_seconds histogram",
+        ]
+        for (method, route), stats in self.routes.items():
+            labels = f'service="{service}",method="{method}",route="{_escape(route)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, stats.bucket_counts):
+                cumulative += count
+                lines.append(f'aidos_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'aidos_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+            lines.append(f"aidos_http_request_duration_seconds_sum{{{labels}}} {stats.total_seconds}")
+            lines.append(f"aidos_http_request_duration_seconds_count{{{labels}}} {stats.count}")
+
+        lines += [
+            "# HELP aidos_process_start_time_seconds Start time of the service process.",
+            "# TYPE aidos_process_start_time_seconds gauge",
+            f'aidos_process_start_time_seconds{{service="{service}"}} {self.started_at}',
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsMiddleware:
+    """
+    Records request metrics and answers GET /metrics.
+
+    Routes are labelled by their template (`/datasets/{dataset_id}`) so label
+    cardinality stays bounded; path parameters listed in `expand_params` are
+    substituted back in (the gateway uses this to split proxied traffic by
+    service).
+    """
+
+    def __init__(self, app, service: Optional[str] = None, registry: Optional[MetricsRegistry] = None,
+                 metrics_path: str = "/metrics", expand_params: Iterable[str] = ()):
+        self.app = app
+        self.registry = registry or MetricsRegistry(service or "unknown")
+        self.metrics_path = metrics_path
+        self.expand_params = tuple(expand_params)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if scope["path"] == self.metrics_path:
+            await self._send_metrics(send)
+            return
+
+        registry = self.registry
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        registry.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            registry.in_flight -= 1
+            registry.observe(scope["method"], self._route_label(scope, status_code),
+                             status_code, time.perf_counter() - started)
+
+    def _route_label(self, scope, status_code: int) -> str:
+        route = scope.get("route")
+        if route is None:
+            return "unmatched"
+        label = route.path
+        if self.expand_params and status_code != 404:
+            params = scope.get("path_params", {})
+            for name in self.expand_params:
+                if name in params:
+                    label = label.replace("{" + name + "}", str(params[name]))
+        return label
+
+    async def _send_metrics(self, send):
+        body = self.registry.render_prometheus().encode()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; version=0.0.4; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
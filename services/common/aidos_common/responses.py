@@ -0,0 +1,99 @@
+"""
+Fast JSON responses for AI-DOS services.
+
+FastAPI's default path runs every return value through `jsonable_encoder`
+(or re-validates it against `response_model`) and then `json.dumps`.
+With AIDOS_FAST_JSON=1:
+
+- `default_response_class()` returns FastJSONResponse, which renders with
+  orjson (Pydantic models are dumped natively, datetimes/enums/numpy
+  arrays handled by orjson);
+- `fast_json(content)` lets an endpoint skip `jsonable_encoder` and
+  response-model re-validation entirely for data that is already
+  validated;
+- `SerializedList` keeps the encoded form of append-only, immutable items
+  so listing them is a byte join rather than a re-serialization.
+
+With the flag off, `fast_json` falls back to the standard encoder so the
+output is unchanged.
+"""
+
+import os
+from typing import Any, Iterable, List
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+FAST_JSON = os.getenv("AIDOS_FAST_JSON", "0").lower() in ("1", "true", "yes")
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+def json_array(fragments: Iterable[bytes]) -> bytes:
+    """Join already-serialized JSON values into a JSON array."""
+    return b"[" + b",".join(fragments) + b"]"
+
+
+class SerializedList:
+    """
+    Append-only list of immutable items. With FAST_JSON on, each item is
+    encoded once when appended and `response()` just joins the bytes.
+    """
+
+    def __init__(self, items: Iterable[Any] = ()):
+        self.items: List[Any] = []
+        self._encoded: List[bytes] = []
+        for item in items:
+            self.append(item)
+
+    def append(self, item: Any):
+        self.items.append(item)
+        if FAST_JSON:
+            self._encoded.append(dumps(item))
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def response(self):
+        if FAST_JSON:
+            return FastJSONResponse(json_array(self._encoded))
+        return self.items
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson; bytes content is sent as-is."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray)):
+            return bytes(content)
+        return dumps(content)
+
+
+def default_response_class():
+    return FastJSONResponse if FAST_JSON else JSONResponse
+
+
+def fast_json(content: Any, status_code: int = 200) -> JSONResponse:
+    if FAST_JSON:
+        return FastJSONResponse(content, status_code=status_code)
+    return JSONResponse(jsonable_encoder(content), status_code=status_code)
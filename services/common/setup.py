@@ -0,0 +1,14 @@
+from setuptools import setup, find_packages
+
+setup(
+    name="aidos-common",
+    version="1.0.0",
+    description="Shared middleware and helpers for AI-DOS services",
+    packages=find_packages(),
+    python_requires=">=3.9",
+    install_requires=[
+        "fastapi",
+        "pydantic>=2.0",
+        "orjson>=3.9",
+    ],
+)
@@ -0,0 +1,166 @@
+"""
+Blob storage for DataForge.
+
+The chunk store (chunkstore.py) keeps every piece of file content here as
+an immutable, content-addressed object of at most CAS_CHUNK_SIZE bytes, so
+the store only needs whole-object put/get (and listing, to find objects
+the catalog has lost track of). Two backends share the
+interface:
+
+- LocalBlobStore keeps objects on the local filesystem (the default).
+- S3BlobStore talks to S3 or MinIO (docker-compose runs MinIO).
+
+All methods are blocking; async callers run them in the threadpool.
+"""
+
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Iterator, Tuple
+
+
+class BlobNotFound(Exception):
+    pass
+
+
+class BlobStore(ABC):
+    @abstractmethod
+    def put(self, key: str, data: bytes):
+        ...
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def list(self, prefix: str) -> Iterator[Tuple[str, int]]:
+        """(key, size) of every object whose key starts with `prefix`."""
+        ...
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.objects_dir = os.path.join(self.root, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    def _object_path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.objects_dir, key))
+        if not path.startswith(self.objects_dir + os.sep):
+            raise ValueError(f"Invalid blob key: {key}")
+        return path
+
+    def put(self, key: str, data: bytes):
+        path = self._object_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial object
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def open(self, key: str) -> BinaryIO:
+        try:
+            return open(self._object_path(key), "rb")
+        except FileNotFoundError:
+            raise BlobNotFound(key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._object_path(key))
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._object_path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self, prefix: str) -> Iterator[Tuple[str, int]]:
+        for directory, _, names in os.walk(self.objects_dir):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(directory, name)
+                key = os.path.relpath(path, self.objects_dir).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    try:
+                        yield key, os.path.getsize(path)
+                    except FileNotFoundError:
+                        pass
+
+
+class S3BlobStore(BlobStore):
+    def __init__(self, bucket: str, endpoint_url: str = None, access_key: str = None,
+                 secret_key: str = None):
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            config=Config(signature_version="s3v4"),
+            region_name="us-east-1",
+        )
+        self._bucket_ready = False
+
+    def _ensure_bucket(self):
+        if self._bucket_ready:
+            return
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_bucket(Bucket=self.bucket)
+        except ClientError:
+            self.client.create_bucket(Bucket=self.bucket)
+        self._bucket_ready = True
+
+    def put(self, key: str, data: bytes):
+        self._ensure_bucket()
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+    def open(self, key: str) -> BinaryIO:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+        except ClientError:
+            raise BlobNotFound(key)
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError:
+            return False
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def list(self, prefix: str) -> Iterator[Tuple[str, int]]:
+        self._ensure_bucket()
+        for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=prefix):
+            for item in page.get("Contents", []):
+                yield item["Key"], item["Size"]
+
+
+def blob_store_from_env() -> BlobStore:
+    backend = os.getenv("BLOB_BACKEND", "local").lower()
+    if backend == "s3":
+        minio_host = os.getenv("MINIO_HOST")
+        default_endpoint = f"http://{minio_host}:{os.getenv('MINIO_PORT', '9000')}" if minio_host else None
+        return S3BlobStore(
+            bucket=os.getenv("BLOB_BUCKET", "dataforge"),
+            endpoint_url=os.getenv("S3_ENDPOINT_URL", default_endpoint),
+            access_key=os.getenv("S3_ACCESS_KEY", os.getenv("MINIO_ROOT_USER")),
+            secret_key=os.getenv("S3_SECRET_KEY", os.getenv("MINIO_ROOT_PASSWORD")),
+        )
+    return LocalBlobStore(os.getenv("BLOB_ROOT", "./data/blobs"))
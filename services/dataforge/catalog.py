@@ -0,0 +1,155 @@
+"""
+Secondary indexes over the dataset catalog for filtered, paginated listing.
+
+Every dataset gets a sequence number when it is created; listings are in
+that order, which never changes, so a cursor (the last sequence number a
+page returned) stays valid while datasets are added and deleted around
+it. Each index keeps a sorted list of sequence numbers:
+
+- all datasets
+- per owner_id and per data_type (hash indexes)
+- per tag (an inverted index)
+
+A page bisects to the cursor in the smallest index that applies to the
+query and walks forward from there, checking any other filters on the
+way, so it costs O(log n + page size) rather than a scan of the catalog
+(plus whatever the other filters reject).
+"""
+
+import base64
+import threading
+from bisect import bisect_right, insort
+from itertools import count
+from typing import Dict, List, Optional, Tuple
+
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(seq: int) -> str:
+    return base64.urlsafe_b64encode(str(seq).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Raises ValueError for a cursor this index didn't issue."""
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class DatasetIndex:
+    def __init__(self):
+        self._next_seq = count()
+        self._seqs: Dict[str, int] = {}  # dataset id -> sequence number
+        self._ids: Dict[int, str] = {}
+        self._keys: Dict[int, Tuple[str, str, frozenset]] = {}  # owner_id, data_type, tags
+        self._all: List[int] = []
+        self._by_owner: Dict[str, List[int]] = {}
+        self._by_type: Dict[str, List[int]] = {}
+        self._by_tag: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._all)
+
+    def add(self, dataset):
+        with self._lock:
+            seq = next(self._next_seq)
+            self._seqs[dataset.id] = seq
+            self._ids[seq] = dataset.id
+            self._all.append(seq)
+            self._link(seq, dataset)
+
+    def update(self, dataset):
+        """Re-index a dataset whose owner, data type or tags may have changed."""
+        with self._lock:
+            seq = self._seqs[dataset.id]
+            if self._keys[seq] != (dataset.owner_id, dataset.data_type, frozenset(dataset.tags)):
+                self._unlink(seq)
+                self._link(seq, dataset)
+
+    def remove(self, dataset_id: str):
+        with self._lock:
+            seq = self._seqs.pop(dataset_id, None)
+            if seq is None:
+                return
+            self._unlink(seq)
+            del self._ids[seq]
+            _discard(self._all, seq)
+
+    def _link(self, seq: int, dataset):
+        tags = frozenset(dataset.tags)
+        self._keys[seq] = (dataset.owner_id, dataset.data_type, tags)
+        insort(self._by_owner.setdefault(dataset.owner_id, []), seq)
+        insort(self._by_type.setdefault(dataset.data_type, []), seq)
+        for tag in tags:
+            insort(self._by_tag.setdefault(tag, []), seq)
+
+    def _unlink(self, seq: int):
+        owner_id, data_type, tags = self._keys.pop(seq)
+        _discard_key(self._by_owner, owner_id, seq)
+        _discard_key(self._by_type, data_type, seq)
+        for tag in tags:
+            _discard_key(self._by_tag, tag, seq)
+
+    def page(self, owner_id: Optional[str] = None, data_type: Optional[str] = None,
+             tags: Optional[List[str]] = None, cursor: Optional[str] = None,
+             skip: int = 0, limit: int = 100) -> Tuple[List[str], Optional[str]]:
+        """
+        Ids of up to `limit` datasets matching every given filter (all of
+        `tags`), after `cursor` and then `skip` matches. Returns the ids and
+        the cursor of the next page, or None on the last page.
+        """
+        after = decode_cursor(cursor) if cursor else -1
+        with self._lock:
+            candidates = [self._all]
+            if owner_id is not None:
+                candidates.append(self._by_owner.get(owner_id, []))
+            if data_type is not None:
+                candidates.append(self._by_type.get(data_type, []))
+            for tag in tags or ():
+                candidates.append(self._by_tag.get(tag, []))
+            # Walk the most selective index; it alone enforces its own filter
+            seqs = min(candidates, key=len)
+            required = set(tags or ())
+            start = bisect_right(seqs, after)
+
+            def matches(seq: int) -> bool:
+                key_owner, key_type, key_tags = self._keys[seq]
+                return ((owner_id is None or key_owner == owner_id)
+                        and (data_type is None or key_type == data_type)
+                        and required <= key_tags)
+
+            if len(candidates) == 1 or (len(candidates) == 2 and seqs is not self._all):
+                # Every entry of the index matches, so skip is a slice
+                start += skip
+                skip = 0
+            ids = []
+            last = None
+            for i in range(start, len(seqs)):
+                seq = seqs[i]
+                if not matches(seq):
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                if len(ids) == limit:
+                    return ids, encode_cursor(last)
+                ids.append(self._ids[seq])
+                last = seq
+            return ids, None
+
+
+def _discard(seqs: List[int], seq: int):
+    i = bisect_right(seqs, seq) - 1
+    if i >= 0 and seqs[i] == seq:
+        del seqs[i]
+
+
+def _discard_key(index: Dict[str, List[int]], key: str, seq: int):
+    seqs = index.get(key)
+    if seqs is None:
+        return
+    _discard(seqs, seq)
+    if not seqs:
+        del index[key]
@@ -0,0 +1,214 @@
+"""
+Content-addressed, deduplicating chunk storage for DataForge.
+
+Files are split into fixed-size chunks (CAS_CHUNK_SIZE) and each chunk is
+stored once in the blob store under its sha256, however many files,
+versions or datasets contain it. Every reference to a chunk holds a
+refcount; a chunk whose count drops to zero becomes an orphan and is only
+deleted by `collect()` once it has been unreferenced for a grace period, so
+a chunk a client uploaded moments ago (or a file being re-added) is never
+pulled out from under it.
+
+A file's content hash is the Merkle root over its chunk hashes, and a
+version's commit hash is the Merkle root over its files, so identical
+content always hashes identically however it was uploaded.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from blobstore import BlobStore
+
+CAS_CHUNK_SIZE = int(os.getenv("CAS_CHUNK_SIZE", 4 * 1024 * 1024))
+ORPHAN_GRACE_SECONDS = float(os.getenv("CAS_ORPHAN_GRACE_SECONDS", 3600))
+
+EMPTY_ROOT = hashlib.sha256(b"").hexdigest()
+
+
+def merkle_root(hashes: Iterable[str]) -> str:
+    """Binary Merkle root over hex digests; an odd node is carried up unchanged."""
+    level = [bytes.fromhex(h) for h in hashes]
+    if not level:
+        return EMPTY_ROOT
+    while len(level) > 1:
+        paired = [
+            hashlib.sha256(b"\x01" + level[i] + level[i + 1]).digest()
+            for i in range(0, len(level) - 1, 2)
+        ]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0].hex()
+
+
+def file_leaf(path: str, content_hash: str) -> str:
+    """Leaf hash binding a file path to its content, for version roots."""
+    return hashlib.sha256(b"\x00" + path.encode() + b"\x00" + bytes.fromhex(content_hash)).hexdigest()
+
+
+class ChunkInfo:
+    __slots__ = ("size", "refs", "orphaned_at")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.refs = 0
+        self.orphaned_at: Optional[float] = None
+
+
+class ChunkStore:
+    def __init__(self, blobs: BlobStore, chunk_size: int = CAS_CHUNK_SIZE,
+                 orphan_grace: float = ORPHAN_GRACE_SECONDS):
+        self.blobs = blobs
+        self.chunk_size = chunk_size
+        self.orphan_grace = orphan_grace
+        self._chunks: Dict[str, ChunkInfo] = {}
+        self._lock = threading.Lock()
+        self.bytes_written = 0
+        self.bytes_deduplicated = 0
+
+    @staticmethod
+    def key(chunk_hash: str) -> str:
+        return f"chunks/{chunk_hash[:2]}/{chunk_hash}"
+
+    def _ref(self, chunk_hash: str) -> bool:
+        info = self._chunks.get(chunk_hash)
+        if info is None:
+            return False
+        info.refs += 1
+        info.orphaned_at = None
+        return True
+
+    def put(self, data: bytes, ref: bool = True) -> Tuple[str, bool]:
+        """
+        Store one chunk, taking a reference to it unless `ref` is False.
+        Returns (chunk_hash, stored); `stored` is False when the chunk was
+        already present and nothing was written.
+        """
+        chunk_hash = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if chunk_hash in self._chunks:
+                if ref:
+                    self._ref(chunk_hash)
+                self.bytes_deduplicated += len(data)
+                return chunk_hash, False
+
+        # Same key always means the same bytes, so racing writers are harmless
+        self.blobs.put(self.key(chunk_hash), data)
+
+        with self._lock:
+            if chunk_hash not in self._chunks:
+                info = self._chunks[chunk_hash] = ChunkInfo(len(data))
+                info.orphaned_at = time.monotonic()
+                self.bytes_written += len(data)
+            else:
+                self.bytes_deduplicated += len(data)
+            if ref:
+                self._ref(chunk_hash)
+        return chunk_hash, True
+
+    def incref(self, hashes: Iterable[str]):
+        """Take a reference to each chunk. Raises KeyError naming the first unknown one."""
+        hashes = list(hashes)
+        with self._lock:
+            for chunk_hash in hashes:
+                if chunk_hash not in self._chunks:
+                    raise KeyError(chunk_hash)
+            for chunk_hash in hashes:
+                self._ref(chunk_hash)
+
+    def restore(self, hashes: Iterable[str], sizes: Dict[str, int]):
+        """
+        Take a reference to each chunk of a file recovered at startup,
+        re-registering chunks this process hasn't seen (sizes come from the
+        catalog's log). Call `reconcile()` afterwards for the chunks no file
+        refers to.
+        """
+        with self._lock:
+            for chunk_hash in hashes:
+                if chunk_hash not in self._chunks:
+                    self._chunks[chunk_hash] = ChunkInfo(sizes.get(chunk_hash, 0))
+                self._ref(chunk_hash)
+
+    def reconcile(self) -> int:
+        """
+        Register chunks the blob store holds but the catalog doesn't know
+        of (e.g. uploaded for a session that didn't survive a restart) as
+        orphans with a fresh grace period, so `collect()` can reclaim them.
+        Returns how many were found.
+        """
+        found = 0
+        for key, size in self.blobs.list("chunks/"):
+            chunk_hash = key.rsplit("/", 1)[-1]
+            with self._lock:
+                info = self._chunks.get(chunk_hash)
+                if info is None:
+                    info = self._chunks[chunk_hash] = ChunkInfo(size)
+                    info.orphaned_at = time.monotonic()
+                    found += 1
+                elif not info.size:
+                    info.size = size
+        return found
+
+    def decref(self, hashes: Iterable[str]):
+        now = time.monotonic()
+        with self._lock:
+            for chunk_hash in hashes:
+                info = self._chunks.get(chunk_hash)
+                if info is None or info.refs == 0:
+                    continue
+                info.refs -= 1
+                if info.refs == 0:
+                    info.orphaned_at = now
+
+    def size(self, chunk_hash: str) -> Optional[int]:
+        info = self._chunks.get(chunk_hash)
+        return info.size if info else None
+
+    def missing(self, hashes: Iterable[str]) -> List[str]:
+        return [h for h in hashes if h not in self._chunks]
+
+    def read(self, chunk_hash: str) -> bytes:
+        with self.blobs.open(self.key(chunk_hash)) as f:
+            return f.read()
+
+    def collect(self, grace: Optional[float] = None, limit: Optional[int] = None) -> int:
+        """
+        Delete orphaned chunks unreferenced for longer than the grace period,
+        at most `limit` of them per call.
+        """
+        grace = self.orphan_grace if grace is None else grace
+        cutoff = time.monotonic() - grace
+        collected = 0
+        with self._lock:
+            doomed = list(islice((
+                h for h, info in self._chunks.items()
+                if info.refs == 0 and info.orphaned_at is not None and info.orphaned_at <= cutoff
+            ), limit))
+            # Deleting under the lock keeps a concurrent put() from
+            # re-referencing a chunk whose blob is about to disappear
+            for chunk_hash in doomed:
+                self.blobs.delete(self.key(chunk_hash))
+                del self._chunks[chunk_hash]
+                collected += 1
+        return collected
+
+    def stats(self) -> dict:
+        with self._lock:
+            stored = sum(info.size for info in self._chunks.values())
+            logical = sum(info.size * info.refs for info in self._chunks.values())
+            orphans = sum(1 for info in self._chunks.values() if info.refs == 0)
+            chunks = len(self._chunks)
+        return {
+            "chunk_size": self.chunk_size,
+            "chunks": chunks,
+            "orphaned_chunks": orphans,
+            "stored_bytes": stored,
+            "referenced_bytes": logical,
+            "dedup_ratio": round(logical / stored, 3) if stored else 1.0,
+            "bytes_written": self.bytes_written,
+            "bytes_deduplicated": self.bytes_deduplicated,
+        }
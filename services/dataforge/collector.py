@@ -0,0 +1,144 @@
+"""
+Background reclamation of deleted datasets.
+
+Deleting a dataset only detaches it from the catalog and writes a
+tombstone; everything it held (labels, version manifests, file chunk
+references, exports, upload sessions) is handed to the collector, which
+reclaims it on its own thread in batches of GC_BATCH_SIZE items, at most
+GC_ITEMS_PER_SECOND items a second, so the delete request returns at once
+and a mass cleanup doesn't compete with ingest for locks or I/O. Chunks
+left unreferenced are swept afterwards in the same rate-limited batches,
+still honoring the chunk store's orphan grace period. A step's items can
+be given as a function that lists them, which the collector calls when it
+reaches the step, so the delete doesn't enumerate them under the catalog
+lock.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, List, Optional, Tuple, Union
+
+from chunkstore import ChunkStore
+
+GC_BATCH_SIZE = int(os.getenv("GC_BATCH_SIZE", 1000))
+GC_ITEMS_PER_SECOND = float(os.getenv("GC_ITEMS_PER_SECOND", 50_000))
+
+logger = logging.getLogger(__name__)
+
+
+class Tombstone:
+    """
+    A deleted dataset's remaining state, as named steps of items, each
+    reclaimed by calling `reclaim(batch)` on a batch of the items. Steps
+    whose items are still a function to list them report None remaining.
+    """
+
+    def __init__(self, dataset_id: str, deleted_at: Optional[datetime] = None):
+        self.dataset_id = dataset_id
+        self.deleted_at = deleted_at or datetime.utcnow()
+        self.steps: List[Tuple[str, Union[list, Callable[[], list]], Callable[[list], None]]] = []
+        self.reclaimed = 0
+
+    def add_step(self, name: str, items: Union[list, Callable[[], list]], reclaim: Callable[[list], None]):
+        self.steps.append((name, items, reclaim))
+
+    @property
+    def remaining(self) -> int:
+        return sum(len(items) for _, items, _ in self.steps if not callable(items))
+
+    def status(self) -> dict:
+        return {
+            "dataset_id": self.dataset_id,
+            "deleted_at": self.deleted_at,
+            "reclaimed": self.reclaimed,
+            "remaining": {name: None if callable(items) else len(items) for name, items, _ in self.steps if items},
+        }
+
+
+class Collector:
+    def __init__(self, chunks: ChunkStore, batch_size: int = GC_BATCH_SIZE,
+                 items_per_second: float = GC_ITEMS_PER_SECOND):
+        self.chunks = chunks
+        self.batch_size = batch_size
+        self.items_per_second = items_per_second
+        self.tombstones: Deque[Tombstone] = deque()
+        self.datasets_collected = 0
+        self.items_reclaimed = 0
+        self.chunks_collected = 0
+        self.errors = 0
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, tombstone: Tombstone):
+        self.tombstones.append(tombstone)
+        self._wakeup.set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="dataset-collector", daemon=True)
+        self._thread.start()
+
+    def _throttle(self, started: float, items: int):
+        # Spread batches out so the collector never exceeds its item rate
+        delay = items / self.items_per_second - (time.monotonic() - started)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while self.tombstones:
+                tombstone = self.tombstones[0]
+                self._collect(tombstone)
+                self.tombstones.popleft()
+                self.datasets_collected += 1
+            self._sweep_chunks()
+
+    def _collect(self, tombstone: Tombstone):
+        for i, (name, items, reclaim) in enumerate(tombstone.steps):
+            if callable(items):
+                try:
+                    items = items()
+                except Exception:
+                    logger.exception("Failed to list %s of dataset %s", name, tombstone.dataset_id)
+                    self.errors += 1
+                    items = []
+                tombstone.steps[i] = (name, items, reclaim)
+            while items:
+                started = time.monotonic()
+                batch = items[-self.batch_size:]
+                del items[-self.batch_size:]
+                try:
+                    reclaim(batch)
+                except Exception:
+                    # Skip what can't be reclaimed rather than wedging the queue
+                    logger.exception("Failed to reclaim %d %s of dataset %s", len(batch), name, tombstone.dataset_id)
+                    self.errors += 1
+                tombstone.reclaimed += len(batch)
+                self.items_reclaimed += len(batch)
+                self._throttle(started, len(batch))
+
+    def _sweep_chunks(self):
+        while True:
+            started = time.monotonic()
+            collected = self.chunks.collect(limit=self.batch_size)
+            self.chunks_collected += collected
+            self._throttle(started, collected)
+            if collected < self.batch_size:
+                return
+
+    def stats(self) -> dict:
+        return {
+            "pending_datasets": len(self.tombstones),
+            "datasets_collected": self.datasets_collected,
+            "items_reclaimed": self.items_reclaimed,
+            "chunks_collected": self.chunks_collected,
+            "errors": self.errors,
+        }
+
+    def pending(self) -> List[dict]:
+        return [tombstone.status() for tombstone in list(self.tombstones)]
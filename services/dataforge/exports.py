@@ -0,0 +1,255 @@
+"""
+Sharded exports of dataset versions for training consumers.
+
+An export writes a version's files, as records, into POSIX tar shards of
+about EXPORT_SHARD_SIZE bytes each, the layout WebDataset-style loaders
+read directly. Next to the shards it writes index.json, which gives every
+record's shard, byte offset and size, so a trainer can fetch any record
+(or a whole shard) with one HTTP range request. Trainers shuffle by
+shard and by record, and pull shards in parallel.
+
+Shards live on local disk under EXPORT_DIR and are served from read-only
+memory maps, so serving a range is a slice of the page cache rather than
+a read through the chunk store. Versions never change, so an export is
+built once per (version, shard size, seed) and reused.
+"""
+
+import hashlib
+import io
+import json
+import mmap
+import os
+import random
+import shutil
+import tarfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from chunkstore import ChunkStore
+
+EXPORT_SHARD_SIZE = int(os.getenv("EXPORT_SHARD_SIZE", 256 * 1024 * 1024))
+
+
+class Shard(BaseModel):
+    name: str
+    size_bytes: int
+    num_records: int
+
+
+class Export(BaseModel):
+    id: str
+    dataset_id: str
+    version_id: str
+    format: str = "tar"
+    shard_size_bytes: int
+    seed: Optional[int] = None  # shuffles record order across shards when set
+    status: str = "queued"  # queued, running, completed, failed
+    bytes_total: int = 0
+    bytes_written: int = 0
+    progress: float = 0.0
+    num_records: int = 0
+    shards: List[Shard] = []
+    error: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+
+
+class _ChunkReader(io.RawIOBase):
+    """Raw file-like view of a sequence of chunks; wrap in a BufferedReader."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buffer = memoryview(chunk)
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range: bytes=...` header into an inclusive
+    (start, end). Returns None for headers that should be ignored (other
+    units, multiple ranges); raises ValueError when the range can't be
+    satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
+
+
+class SharedMap:
+    """A shard's read-only memory map and the number of responses reading it."""
+
+    __slots__ = ("data", "readers", "retired")
+
+    def __init__(self, data: mmap.mmap):
+        self.data = data
+        self.readers = 0
+        # Set once the export is deleted; the last reader closes the map
+        self.retired = False
+
+
+class ExportStore:
+    def __init__(self, root: str, chunks: ChunkStore, workers: int = 2):
+        self.root = os.path.abspath(root)
+        self.chunks = chunks
+        self.exports: Dict[str, Export] = {}
+        self._maps: Dict[str, SharedMap] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        os.makedirs(self.root, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, chunks: ChunkStore) -> "ExportStore":
+        return cls(
+            os.getenv("EXPORT_DIR", "./data/exports"),
+            chunks,
+            workers=int(os.getenv("EXPORT_WORKERS", 2)),
+        )
+
+    @staticmethod
+    def export_id(version_id: str, shard_size: int, seed: Optional[int]) -> str:
+        return hashlib.md5(f"{version_id}:tar:{shard_size}:{seed}".encode()).hexdigest()
+
+    def directory(self, export_id: str) -> str:
+        return os.path.join(self.root, export_id)
+
+    def index_path(self, export_id: str) -> str:
+        return os.path.join(self.directory(export_id), "index.json")
+
+    def start(self, export: Export, files: List[Tuple[str, object]]) -> Export:
+        """
+        Build `export` in the background from (path, DatasetFile) pairs.
+        Returns the export already registered under the same id instead,
+        unless that one failed, so concurrent requests share one build.
+        """
+        with self._lock:
+            existing = self.exports.get(export.id)
+            if existing is not None and existing.status != "failed":
+                return existing
+            self.exports[export.id] = export
+        self._executor.submit(self._build, export, files)
+        return export
+
+    def _build(self, export: Export, files: List[Tuple[str, object]]):
+        export.status = "running"
+        directory = self.directory(export.id)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        files = sorted(files, key=lambda item: item[0])
+        if export.seed is not None:
+            random.Random(export.seed).shuffle(files)
+        index = []
+        tar = None
+        try:
+            for path, dataset_file in files:
+                if tar is not None and records and tar.offset + dataset_file.size_bytes > export.shard_size_bytes:
+                    self._close_shard(export, tar, records, index)
+                    tar = None
+                if tar is None:
+                    name = f"shard-{len(export.shards):05d}.tar"
+                    tar = tarfile.open(os.path.join(directory, name), "w", format=tarfile.PAX_FORMAT)
+                    records = []
+                info = tarfile.TarInfo(path)
+                info.size = dataset_file.size_bytes
+                info.mode = 0o644
+                info.mtime = int(dataset_file.created_at.timestamp())
+                tar.addfile(info, io.BufferedReader(_ChunkReader(self.chunks.read(h) for h in dataset_file.chunks)))
+                # tar.offset is now past the record's data and its padding
+                padded = -(-info.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+                records.append({"path": path, "offset": tar.offset - padded, "size": info.size})
+                export.bytes_written += info.size
+                export.progress = round(export.bytes_written / export.bytes_total, 4) if export.bytes_total else 0.0
+            if tar is not None:
+                self._close_shard(export, tar, records, index)
+            tmp_path = f"{self.index_path(export.id)}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"export_id": export.id, "version_id": export.version_id, "shards": index}, f)
+            os.replace(tmp_path, self.index_path(export.id))
+            export.progress = 1.0
+            export.status = "completed"
+        except Exception as e:
+            if tar is not None:
+                tar.close()
+            shutil.rmtree(directory, ignore_errors=True)
+            export.status = "failed"
+            export.error = str(e)
+        finally:
+            export.completed_at = datetime.utcnow()
+
+    def _close_shard(self, export: Export, tar: tarfile.TarFile, records: list, index: list):
+        tar.close()
+        name = os.path.basename(tar.name)
+        shard = Shard(name=name, size_bytes=os.path.getsize(tar.name), num_records=len(records))
+        index.append({**shard.model_dump(), "records": records})
+        export.shards.append(shard)
+        export.num_records += len(records)
+
+    def open_shard(self, export: Export, shard: int) -> SharedMap:
+        """
+        Read-only memory map of a shard, shared by all requests for it.
+        Every call must be paired with `release(shared)` once the caller
+        is done reading.
+        """
+        key = f"{export.id}/{shard}"
+        with self._lock:
+            shared = self._maps.get(key)
+            if shared is None:
+                path = os.path.join(self.directory(export.id), export.shards[shard].name)
+                with open(path, "rb") as f:
+                    shared = self._maps[key] = SharedMap(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            shared.readers += 1
+        return shared
+
+    def release(self, shared: SharedMap):
+        with self._lock:
+            shared.readers -= 1
+            if shared.retired and not shared.readers:
+                shared.data.close()
+
+    def delete(self, export_id: str):
+        with self._lock:
+            self.exports.pop(export_id, None)
+            for key in [k for k in self._maps if k.startswith(f"{export_id}/")]:
+                shared = self._maps.pop(key)
+                shared.retired = True
+                # Responses still streaming from the map close it when they finish
+                if not shared.readers:
+                    shared.data.close()
+        # Unlinking is safe under open maps; their pages stay valid until closed
+        shutil.rmtree(self.directory(export_id), ignore_errors=True)
+
+
+def iter_range(data: mmap.mmap, start: int, end: int, block_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """Inclusive byte range of a memory map, in blocks."""
+    for offset in range(start, end + 1, block_size):
+        yield data[offset:min(offset + block_size, end + 1)]
@@ -0,0 +1,141 @@
+"""
+Indexed label storage for DataForge.
+
+A LabelStore holds one dataset's labels keyed by id, with secondary
+indexes by file path, by labeler and by verification status, and keeps
+the verified/unverified counts up to date as labels are added and
+verified. Lookups, verification and counts are O(1); filtered listings
+only touch the labels that match the most selective filter.
+
+Bulk loads arrive as NDJSON (one label per line) and are inserted in
+batches of LABEL_BATCH_SIZE, each under a single lock acquisition.
+"""
+
+import os
+import threading
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+LABEL_BATCH_SIZE = int(os.getenv("LABEL_BATCH_SIZE", 1000))
+MAX_NDJSON_LINE_BYTES = int(os.getenv("MAX_NDJSON_LINE_BYTES", 1024 * 1024))
+
+
+class LineTooLong(ValueError):
+    def __init__(self, line_number: int):
+        super().__init__(f"Line {line_number} exceeds {MAX_NDJSON_LINE_BYTES} bytes")
+        self.line_number = line_number
+
+
+class LabelStore:
+    def __init__(self):
+        self._labels: Dict[str, object] = {}
+        # Index values are dicts used as insertion-ordered sets of label ids
+        self._by_file: Dict[str, Dict[str, None]] = {}
+        self._by_labeler: Dict[str, Dict[str, None]] = {}
+        self._by_verified: Dict[bool, Dict[str, None]] = {True: {}, False: {}}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    @property
+    def verified_count(self) -> int:
+        return len(self._by_verified[True])
+
+    @property
+    def unverified_count(self) -> int:
+        return len(self._by_verified[False])
+
+    def _insert(self, label):
+        self._labels[label.id] = label
+        self._by_file.setdefault(label.file_path, {})[label.id] = None
+        self._by_labeler.setdefault(label.labeler_id, {})[label.id] = None
+        self._by_verified[label.verified][label.id] = None
+
+    def add(self, label):
+        with self._lock:
+            self._insert(label)
+
+    def add_many(self, labels: Iterable):
+        with self._lock:
+            for label in labels:
+                self._insert(label)
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._labels)
+
+    def all(self) -> List:
+        with self._lock:
+            return list(self._labels.values())
+
+    def remove_many(self, label_ids: Iterable[str]):
+        with self._lock:
+            for label_id in label_ids:
+                label = self._labels.pop(label_id, None)
+                if label is None:
+                    continue
+                for index, key in ((self._by_file, label.file_path), (self._by_labeler, label.labeler_id)):
+                    ids = index[key]
+                    del ids[label_id]
+                    if not ids:
+                        del index[key]
+                del self._by_verified[label.verified][label_id]
+
+    def get(self, label_id: str):
+        return self._labels.get(label_id)
+
+    def verify(self, label_id: str) -> bool:
+        """Mark a label verified. Returns False if there is no such label."""
+        with self._lock:
+            label = self._labels.get(label_id)
+            if label is None:
+                return False
+            if not label.verified:
+                label.verified = True
+                del self._by_verified[False][label_id]
+                self._by_verified[True][label_id] = None
+            return True
+
+    def find(self, verified: Optional[bool] = None, file_path: Optional[str] = None,
+             labeler_id: Optional[str] = None) -> List:
+        with self._lock:
+            candidates = [self._labels]
+            if file_path is not None:
+                candidates.append(self._by_file.get(file_path, {}))
+            if labeler_id is not None:
+                candidates.append(self._by_labeler.get(labeler_id, {}))
+            if verified is not None:
+                candidates.append(self._by_verified[verified])
+            # Walk the smallest index and check the other filters per label
+            ids = min(candidates, key=len)
+            labels = [self._labels[label_id] for label_id in ids]
+        return [
+            label for label in labels
+            if (file_path is None or label.file_path == file_path)
+            and (labeler_id is None or label.labeler_id == labeler_id)
+            and (verified is None or label.verified == verified)
+        ]
+
+
+async def ndjson_lines(source: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """Split a byte stream into (line_number, line) pairs, skipping blank lines."""
+    buffer = bytearray()
+    line_number = 0
+    async for data in source:
+        buffer += data
+        while True:
+            end = buffer.find(b"\n")
+            if end < 0:
+                break
+            line_number += 1
+            if end > MAX_NDJSON_LINE_BYTES:
+                raise LineTooLong(line_number)
+            line = bytes(buffer[:end]).strip()
+            del buffer[:end + 1]
+            if line:
+                yield line_number, line
+        if len(buffer) > MAX_NDJSON_LINE_BYTES:
+            raise LineTooLong(line_number + 1)
+    line = bytes(buffer).strip()
+    if line:
+        yield line_number + 1, line
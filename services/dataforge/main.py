@@ -1,12 +1,51 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Tuple
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
 import hashlib
 import json
+import os
+import threading
+import uuid
 
-app = FastAPI(title="DataForge", version="1.0.0")
+from aidos_common.cache import ResponseCache, ResponseCacheMiddleware
+from aidos_common.metrics import MetricsMiddleware
+from aidos_common.responses import SerializedList, default_response_class, fast_json
+
+from blobstore import blob_store_from_env
+from catalog import MAX_PAGE_SIZE, DatasetIndex
+from chunkstore import ChunkStore, merkle_root
+from collector import GC_BATCH_SIZE, Collector, Tombstone
+from exports import EXPORT_SHARD_SIZE, Export, ExportStore, iter_range, parse_range
+from labels import LABEL_BATCH_SIZE, LabelStore, LineTooLong, ndjson_lines
+from manifest import Manifest, ManifestEntry
+from profiler import PROFILE_BATCH_ROWS, TableProfiler, is_tabular, read_batches
+from storage import Storage
+from synthetic import METHODS as SYNTHETIC_METHODS, SyntheticJob, SyntheticJobRunner
+from uploads import PART_SIZE, UploadPart, UploadSession, ingest, upload_file_chunks
+
+# Every catalog change is logged here before it is acknowledged; the dicts
+# below are rebuilt from it at startup (see Persistence at the end)
+storage = Storage.from_env()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    synthetic_jobs.close()
+    storage.close()
+
+app = FastAPI(title="DataForge", version="1.0.0", lifespan=lifespan, default_response_class=default_response_class())
+
+# GET /datasets is served from cache until a dataset changes
+response_cache = ResponseCache()
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache, routes={"/datasets": "datasets"})
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,6 +55,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware, service="dataforge")
+
 # Models
 class Dataset(BaseModel):
     id: Optional[str] = None
@@ -33,10 +74,13 @@ class DatasetVersion(BaseModel):
     id: Optional[str] = None
     dataset_id: str
     version: str
-    commit_hash: str
+    commit_hash: Optional[str] = None  # Merkle root of the version's manifest, set by the server
     commit_message: str
-    changes: Dict[str, Any]
+    changes: Dict[str, Any] = {}
     created_by: str
+    parent_id: Optional[str] = None
+    num_files: int = 0
+    size_bytes: int = 0
     created_at: Optional[datetime] = None
 
 class Label(BaseModel):
@@ -57,17 +101,82 @@ class QualityMetric(BaseModel):
     details: Dict[str, Any] = {}
     timestamp: Optional[datetime] = None
 
+class AnalysisJob(BaseModel):
+    id: str
+    dataset_id: str
+    version_id: Optional[str] = None  # None analyzes the current files
+    status: str = "queued"  # queued, running, completed, failed
+    files_total: int = 0
+    files_profiled: int = 0
+    files_skipped: int = 0  # files that aren't CSV/TSV/JSON Lines
+    bytes_total: int = 0
+    bytes_processed: int = 0
+    rows_processed: int = 0
+    progress: float = 0.0
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+class DatasetFile(BaseModel):
+    id: str
+    dataset_id: str
+    filename: str
+    size_bytes: int
+    content_hash: str  # Merkle root over chunks
+    chunks: List[str]
+    created_at: datetime
+
+class FileCreate(BaseModel):
+    filename: str
+    chunks: List[str]
+
+class UploadCreate(BaseModel):
+    filename: str
+
+class ChunkQuery(BaseModel):
+    hashes: List[str]
+
 class SyntheticDataRequest(BaseModel):
     dataset_id: str
     num_samples: int
-    generation_method: str  # augmentation, gan, diffusion, llm
+    generation_method: str  # augmentation, llm
     parameters: Dict[str, Any] = {}
 
-# In-memory storage (replace with actual database)
+# In-memory catalog, backed by `storage`
 datasets_db: Dict[str, Dataset] = {}
-versions_db: Dict[str, List[DatasetVersion]] = {}
-labels_db: Dict[str, List[Label]] = {}
+dataset_index = DatasetIndex()  # owner, data type and tag indexes for listing
+versions_db: Dict[str, SerializedList] = {}
+labels_db: Dict[str, LabelStore] = {}
 metrics_db: Dict[str, List[QualityMetric]] = {}
+files_db: Dict[str, Dict[str, DatasetFile]] = {}  # every file a dataset's head or versions reference
+uploads_db: Dict[str, UploadSession] = {}
+
+# Versioning: each dataset has a working manifest (head); a version is a
+# snapshot of it, sharing all unchanged structure with its parent
+heads: Dict[str, Manifest] = {}
+version_index: Dict[str, DatasetVersion] = {}
+version_manifests: Dict[str, Manifest] = {}
+# Files added to a head since its last version; nothing else references them
+unversioned_files: Dict[str, set] = {}
+
+chunk_store = ChunkStore(blob_store_from_env())
+analysis_jobs: Dict[str, AnalysisJob] = {}
+# Profiling is long-running and CPU-bound; keep it off the request threadpool
+analysis_executor = ThreadPoolExecutor(max_workers=int(os.getenv("ANALYSIS_WORKERS", 2)))
+# Column sketches of tabular datasets, one build per version, in version
+# order. Only each dataset's latest sketch is kept whole (the next version
+# merges into it); every version keeps its summarized statistics.
+latest_sketches: Dict[str, tuple] = {}  # dataset_id -> (version_id, TableProfiler)
+version_statistics: Dict[str, dict] = {}
+sketch_executor = ThreadPoolExecutor(max_workers=1)
+synthetic_jobs = SyntheticJobRunner.from_env(chunk_store)
+exports = ExportStore.from_env(chunk_store)
+# Deleted datasets' files, until the collector has released their chunks
+deleted_files: Dict[str, Dict[str, DatasetFile]] = {}
+collector = Collector(chunk_store)
+# Guards dataset size/sample counters, which concurrent uploads update
+stats_lock = threading.Lock()
 
 # Endpoints
 
@@ -96,20 +205,39 @@ def create_dataset(dataset: Dataset):
     dataset.id = hashlib.md5(f"{dataset.name}{datetime.utcnow()}".encode()).hexdigest()
     dataset.created_at = datetime.utcnow()
     dataset.updated_at = datetime.utcnow()
+    with stats_lock:
+        init_dataset(dataset)
+        lsn = storage.append({"op": "dataset.put", "dataset": dataset.model_dump(mode="json")})
+    storage.wait(lsn)
+    response_cache.invalidate("datasets")
+    return dataset
+
+def init_dataset(dataset: Dataset):
     datasets_db[dataset.id] = dataset
-    versions_db[dataset.id] = []
-    labels_db[dataset.id] = []
+    dataset_index.add(dataset)
+    versions_db[dataset.id] = SerializedList()
+    labels_db[dataset.id] = LabelStore()
     metrics_db[dataset.id] = []
-    return dataset
+    files_db[dataset.id] = {}
+    heads[dataset.id] = Manifest()
+    unversioned_files[dataset.id] = set()
 
 @app.get("/datasets", response_model=List[Dataset])
-def list_datasets(owner_id: Optional[str] = None, data_type: Optional[str] = None):
-    results = list(datasets_db.values())
-    if owner_id:
-        results = [d for d in results if d.owner_id == owner_id]
-    if data_type:
-        results = [d for d in results if d.data_type == data_type]
-    return results
+def list_datasets(response: Response, owner_id: Optional[str] = None, data_type: Optional[str] = None,
+                  tags: Optional[List[str]] = Query(None), cursor: Optional[str] = None,
+                  skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)):
+    """
+    Datasets in creation order, filtered by owner, data type and tags (a
+    dataset must have all of them). When there are more, the X-Next-Cursor
+    header holds the cursor for the next page.
+    """
+    try:
+        ids, next_cursor = dataset_index.page(owner_id or None, data_type or None, tags, cursor, skip, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [datasets_db[dataset_id] for dataset_id in ids if dataset_id in datasets_db]
 
 @app.get("/datasets/{dataset_id}", response_model=Dataset)
 def get_dataset(dataset_id: str):
@@ -123,20 +251,104 @@ def update_dataset(dataset_id: str, dataset: Dataset):
         raise HTTPException(status_code=404, detail="Dataset not found")
     dataset.id = dataset_id
     dataset.updated_at = datetime.utcnow()
-    datasets_db[dataset_id] = dataset
+    with stats_lock:
+        # Size and sample counts follow the dataset's files
+        head = heads[dataset_id]
+        dataset.size_bytes = head.size_bytes
+        dataset.num_samples = head.count
+        datasets_db[dataset_id] = dataset
+        dataset_index.update(dataset)
+        lsn = storage.append({"op": "dataset.put", "dataset": dataset.model_dump(mode="json")})
+    storage.wait(lsn)
+    response_cache.invalidate("datasets")
     return dataset
 
 @app.delete("/datasets/{dataset_id}")
 def delete_dataset(dataset_id: str):
-    if dataset_id not in datasets_db:
-        raise HTTPException(status_code=404, detail="Dataset not found")
+    """
+    Detach the dataset and leave a tombstone. What it held is reclaimed
+    afterwards by the background collector.
+    """
+    with stats_lock:
+        if dataset_id not in datasets_db:
+            raise HTTPException(status_code=404, detail="Dataset not found")
+        tombstone = detach_dataset(dataset_id)
+        lsn = storage.append({"op": "dataset.delete", "dataset_id": dataset_id})
+    storage.wait(lsn)
+    for job in list(synthetic_jobs.jobs.values()):
+        if job.dataset_id == dataset_id:
+            synthetic_jobs.cancel(job.id)
+    collector.add(tombstone)
+    response_cache.invalidate("datasets")
+    return {"message": "Dataset deleted successfully"}
+
+def detach_dataset(dataset_id: str) -> Tombstone:
+    """
+    Remove a dataset from the catalog and return the tombstone that
+    reclaims the rest. Call with stats_lock held. Only the dataset's own
+    catalog entries are popped here; its exports, upload sessions, labels,
+    versions and files are listed by the collector when it reaches them,
+    so the time under the lock doesn't grow with the dataset or the catalog.
+    """
     del datasets_db[dataset_id]
-    del versions_db[dataset_id]
-    del labels_db[dataset_id]
+    dataset_index.remove(dataset_id)
+    del heads[dataset_id]
+    del unversioned_files[dataset_id]
     del metrics_db[dataset_id]
-    return {"message": "Dataset deleted successfully"}
+    latest_sketches.pop(dataset_id, None)
+    versions = versions_db.pop(dataset_id)
+    labels = labels_db.pop(dataset_id)
+    deleted_files[dataset_id] = files_db.pop(dataset_id)
+    
+    def reclaim_versions(version_ids: List[str]):
+        for version_id in version_ids:
+            del version_index[version_id]
+            del version_manifests[version_id]
+            version_statistics.pop(version_id, None)
+    
+    def abort_uploads(sessions: List[UploadSession]):
+        for session in sessions:
+            if session.status == "in_progress":
+                session.status = "aborted"
+                chunk_store.decref(session.chunk_hashes())
+    
+    tombstone = Tombstone(dataset_id)
+    tombstone.add_step("exports", lambda: [e.id for e in list(exports.exports.values()) if e.dataset_id == dataset_id],
+                       lambda export_ids: [exports.delete(export_id) for export_id in export_ids])
+    tombstone.add_step("uploads", lambda: [u for u in list(uploads_db.values()) if u.dataset_id == dataset_id],
+                       abort_uploads)
+    tombstone.add_step("labels", labels.ids, labels.remove_many)
+    tombstone.add_step("versions", lambda: [v.id for v in versions], reclaim_versions)
+    add_files_step(tombstone)
+    return tombstone
+
+def add_files_step(tombstone: Tombstone):
+    dataset_id = tombstone.dataset_id
+    if not deleted_files[dataset_id]:
+        del deleted_files[dataset_id]
+        return
+    
+    def release_files(file_ids: List[str]):
+        # Chunks shared with other datasets keep their references
+        with stats_lock:
+            files = deleted_files[dataset_id]
+            for file_id in file_ids:
+                chunk_store.decref(files.pop(file_id).chunks)
+            if not files:
+                del deleted_files[dataset_id]
+    
+    tombstone.add_step("files", lambda: list(deleted_files[dataset_id]), release_files)
 
 # Versioning
+def get_manifest(dataset_id: str, version_id: Optional[str]) -> Manifest:
+    """A version's manifest, or the dataset's head when version_id is None or "head"."""
+    if version_id is None or version_id == "head":
+        return heads[dataset_id]
+    version = version_index.get(version_id)
+    if version is None or version.dataset_id != dataset_id:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return version_manifests[version_id]
+
 @app.post("/datasets/{dataset_id}/versions", response_model=DatasetVersion)
 def create_version(dataset_id: str, version: DatasetVersion):
     if dataset_id not in datasets_db:
@@ -146,68 +358,323 @@ def create_version(dataset_id: str, version: DatasetVersion):
     version.dataset_id = dataset_id
     version.created_at = datetime.utcnow()
     
-    if dataset_id not in versions_db:
-        versions_db[dataset_id] = []
-    versions_db[dataset_id].append(version)
+    with stats_lock:
+        head, diff = commit_head(version)
+        lsn = storage.append({"op": "version.put", "version": version.model_dump(mode="json")})
+    storage.wait(lsn)
+    
+    if datasets_db[dataset_id].data_type == "tabular":
+        version_statistics[version.id] = {"status": "pending"}
+        sketch_executor.submit(build_version_sketch, version, head, diff)
     
     return version
 
+def commit_head(version: DatasetVersion):
+    """Make the dataset's head into `version`. Call with stats_lock held; returns (manifest, diff)."""
+    # Snapshotting is O(1): the version keeps the current head, which
+    # later edits copy-on-write instead of mutating
+    dataset_id = version.dataset_id
+    head = heads[dataset_id]
+    versions = versions_db[dataset_id]
+    parent = versions[-1] if len(versions) else None
+    parent_manifest = version_manifests[parent.id] if parent else Manifest()
+    diff = parent_manifest.diff(head)
+    
+    version.parent_id = parent.id if parent else None
+    version.commit_hash = head.digest
+    version.num_files = head.count
+    version.size_bytes = head.size_bytes
+    version.changes = {**version.changes, **{kind: len(paths) for kind, paths in diff.items()}}
+    
+    version_manifests[version.id] = head
+    version_index[version.id] = version
+    unversioned_files[dataset_id].clear()
+    versions.append(version)
+    return head, diff
+
+def sketch_file(path: str, dataset_file: DatasetFile) -> TableProfiler:
+    sketch = TableProfiler()
+    chunks = (chunk_store.read(chunk_hash) for chunk_hash in dataset_file.chunks)
+    for batch in read_batches(path, chunks, lambda n: None):
+        sketch.add_batch(batch)
+    return sketch
+
+def build_version_sketch(version: DatasetVersion, manifest: Manifest, diff: dict):
+    """
+    Build a version's column sketches from its parent's plus the sketches of
+    the files it added. Sketches can't subtract, so a version that removed
+    or modified files is rebuilt from all of its files instead.
+    """
+    dataset_id = version.dataset_id
+    try:
+        files = files_db[dataset_id]
+        latest = latest_sketches.pop(dataset_id, None)
+        if latest is not None and latest[0] == version.parent_id and not diff["removed"] and not diff["modified"]:
+            sketch, paths = latest[1], diff["added"]
+        else:
+            sketch, paths = TableProfiler(), [path for path, _ in manifest.items()]
+        for path in paths:
+            if is_tabular(path):
+                sketch.merge(sketch_file(path, files[manifest.get(path).file_id]))
+        sketch.compact()
+        statistics = {"status": "ready", **sketch.result()}
+    except Exception as e:
+        sketch, statistics = None, {"status": "failed", "error": str(e)}
+    if version.dataset_id in datasets_db and version.id in version_index:
+        if sketch is not None:
+            latest_sketches[dataset_id] = (version.id, sketch)
+        version_statistics[version.id] = statistics
+
 @app.get("/datasets/{dataset_id}/versions", response_model=List[DatasetVersion])
 def list_versions(dataset_id: str):
     if dataset_id not in datasets_db:
         raise HTTPException(status_code=404, detail="Dataset not found")
-    return versions_db.get(dataset_id, [])
+    if dataset_id not in versions_db:
+        return []
+    return versions_db[dataset_id].response()
 
 @app.get("/datasets/{dataset_id}/versions/{version_id}", response_model=DatasetVersion)
 def get_version(dataset_id: str, version_id: str):
     if dataset_id not in datasets_db:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
-    versions = versions_db.get(dataset_id, [])
-    for v in versions:
-        if v.id == version_id:
-            return v
+    version = version_index.get(version_id)
+    if version is None or version.dataset_id != dataset_id:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return version
+
+@app.get("/datasets/{dataset_id}/versions/{version_id}/files", response_model=List[DatasetFile])
+def list_version_files(dataset_id: str, version_id: str):
+    if dataset_id not in datasets_db:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    files = files_db[dataset_id]
+    return [files[entry.file_id] for _, entry in get_manifest(dataset_id, version_id).items()]
+
+@app.get("/datasets/{dataset_id}/diff")
+def diff_versions(dataset_id: str, base: Optional[str] = None, target: str = "head"):
+    """
+    Paths added, removed and modified from `base` to `target` (version ids or
+    "head"). `base` defaults to the latest version, so the default is the
+    uncommitted changes.
+    """
+    if dataset_id not in datasets_db:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    if base is None:
+        versions = versions_db[dataset_id]
+        base = versions[-1].id if len(versions) else None
+    base_manifest = get_manifest(dataset_id, base) if base else Manifest()
+    diff = base_manifest.diff(get_manifest(dataset_id, target))
+    return {"base": base, "target": target, **diff}
+
+# Exports: versions as tar shards with a byte-offset index, for trainers
+class ExportCreate(BaseModel):
+    shard_size_bytes: int = EXPORT_SHARD_SIZE
+    seed: Optional[int] = None
+
+@app.post("/datasets/{dataset_id}/versions/{version_id}/exports", response_model=Export, status_code=202)
+def create_export(dataset_id: str, version_id: str, request: ExportCreate):
+    """Start (or reuse) an export of a version; poll it until it completes."""
+    if dataset_id not in datasets_db:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    if version_id == "head":
+        raise HTTPException(status_code=400, detail="Only versions can be exported")
+    if request.shard_size_bytes <= 0:
+        raise HTTPException(status_code=400, detail="shard_size_bytes must be positive")
+    
+    export_id = ExportStore.export_id(version_id, request.shard_size_bytes, request.seed)
+    # Cheap early out; start() repeats the check atomically
+    existing = exports.exports.get(export_id)
+    if existing is not None and existing.status != "failed":
+        return existing
+    
+    with stats_lock:
+        manifest = get_manifest(dataset_id, version_id)
+        files = [(path, files_db[dataset_id][entry.file_id]) for path, entry in manifest.items()]
+    export = Export(
+        id=export_id,
+        dataset_id=dataset_id,
+        version_id=version_id,
+        shard_size_bytes=request.shard_size_bytes,
+        seed=request.seed,
+        bytes_total=manifest.size_bytes,
+        created_at=datetime.utcnow()
+    )
+    return exports.start(export, files)
+
+def get_export(dataset_id: str, version_id: str, export_id: str, completed: bool = False) -> Export:
+    export = exports.exports.get(export_id)
+    if export is None or export.dataset_id != dataset_id or export.version_id != version_id:
+        raise HTTPException(status_code=404, detail="Export not found")
+    if completed and export.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Export is {export.status}")
+    return export
+
+@app.get("/datasets/{dataset_id}/versions/{version_id}/exports/{export_id}", response_model=Export)
+def get_export_status(dataset_id: str, version_id: str, export_id: str):
+    return get_export(dataset_id, version_id, export_id)
+
+@app.get("/datasets/{dataset_id}/versions/{version_id}/exports/{export_id}/index")
+def get_export_index(dataset_id: str, version_id: str, export_id: str):
+    """Every record's shard, byte offset and size."""
+    export = get_export(dataset_id, version_id, export_id, completed=True)
+    return FileResponse(exports.index_path(export.id), media_type="application/json")
+
+@app.get("/datasets/{dataset_id}/versions/{version_id}/exports/{export_id}/shards/{shard}")
+def download_shard(dataset_id: str, version_id: str, export_id: str, shard: int, request: Request):
+    """A tar shard, or a byte range of it (single-range `Range: bytes=` requests)."""
+    export = get_export(dataset_id, version_id, export_id, completed=True)
+    if not 0 <= shard < len(export.shards):
+        raise HTTPException(status_code=404, detail="Shard not found")
     
-    raise HTTPException(status_code=404, detail="Version not found")
+    size = export.shards[shard].size_bytes
+    start, end = 0, size - 1
+    status_code = 200
+    headers = {"Accept-Ranges": "bytes", "ETag": f'"{export.id}-{shard}"'}
+    range_header = request.headers.get("range")
+    if range_header:
+        try:
+            requested = parse_range(range_header, size)
+        except ValueError:
+            raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+        if requested is not None:
+            start, end = requested
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    try:
+        shared = exports.open_shard(export, shard)
+    except FileNotFoundError:
+        # Deleted between the lookup and the open
+        raise HTTPException(status_code=404, detail="Export not found")
+    # The map stays open until this response is done with it, even if the export is deleted meanwhile
+    return StreamingResponse(iter_range(shared.data, start, end), status_code=status_code,
+                             media_type="application/x-tar", headers=headers,
+                             background=BackgroundTask(exports.release, shared))
 
 # Labeling
+def log_labels(dataset_id: str, labels: List[Label]) -> int:
+    return storage.append({
+        "op": "labels.put",
+        "dataset_id": dataset_id,
+        "labels": [label.model_dump(mode="json") for label in labels]
+    })
+
 @app.post("/datasets/{dataset_id}/labels", response_model=Label)
 def create_label(dataset_id: str, label: Label):
     if dataset_id not in datasets_db:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
-    label.id = hashlib.md5(f"{dataset_id}{label.file_path}{datetime.utcnow()}".encode()).hexdigest()
+    label.id = uuid.uuid4().hex
     label.dataset_id = dataset_id
     label.created_at = datetime.utcnow()
     
-    if dataset_id not in labels_db:
-        labels_db[dataset_id] = []
-    labels_db[dataset_id].append(label)
+    labels_db[dataset_id].add(label)
+    storage.wait(log_labels(dataset_id, [label]))
     
     return label
 
+def insert_label_lines(dataset_id: str, store: LabelStore, lines: List[Tuple[int, bytes]],
+                       errors: List[dict]) -> Tuple[int, int, int]:
+    """
+    Parse and insert a batch of NDJSON label lines, appending up to 100
+    errors in all to `errors`. Returns (inserted, rejected, lsn); lsn is 0
+    when nothing was logged.
+    """
+    batch: List[Label] = []
+    rejected = 0
+    for line_number, line in lines:
+        try:
+            payload = json.loads(line)
+            if not isinstance(payload, dict):
+                raise ValueError("Expected a JSON object")
+            payload["dataset_id"] = dataset_id
+            label = Label.model_validate(payload)
+        except ValueError as e:
+            rejected += 1
+            if len(errors) < 100:
+                errors.append({"line": line_number, "error": str(e)})
+            continue
+        label.id = uuid.uuid4().hex
+        label.created_at = datetime.utcnow()
+        batch.append(label)
+    if not batch:
+        return 0, rejected, 0
+    store.add_many(batch)
+    return len(batch), rejected, log_labels(dataset_id, batch)
+
+@app.post("/datasets/{dataset_id}/labels:batch")
+async def create_labels_batch(dataset_id: str, request: Request):
+    """
+    Bulk-create labels from an NDJSON body, one label per line. Lines that
+    fail validation are skipped and reported; the rest are inserted. A line
+    longer than MAX_NDJSON_LINE_BYTES ends the upload there: the labels
+    before it are kept, and the response is marked `truncated`.
+    """
+    if dataset_id not in datasets_db:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    
+    store = labels_db[dataset_id]
+    lines: List[Tuple[int, bytes]] = []
+    errors = []
+    inserted = 0
+    rejected = 0
+    lsn = 0
+    truncated = False
+    try:
+        async for line_number, line in ndjson_lines(request.stream()):
+            lines.append((line_number, line))
+            if len(lines) >= LABEL_BATCH_SIZE:
+                # Parsing, validation and logging are CPU-bound; keep them off the event loop
+                added, skipped, batch_lsn = await run_in_threadpool(insert_label_lines, dataset_id, store, lines, errors)
+                inserted += added
+                rejected += skipped
+                lsn = batch_lsn or lsn
+                lines = []
+    except LineTooLong as e:
+        # Full batches before it are already in; report rather than raise so the client knows
+        truncated = True
+        rejected += 1
+        errors.append({"line": e.line_number, "error": str(e)})
+    
+    if lines:
+        added, skipped, batch_lsn = await run_in_threadpool(insert_label_lines, dataset_id, store, lines, errors)
+        inserted += added
+        rejected += skipped
+        lsn = batch_lsn or lsn
+    # Batches were logged without waiting; they share the last one's commit
+    if lsn:
+        await run_in_threadpool(storage.wait, lsn)
+    
+    return {"inserted": inserted, "rejected": rejected, "errors": errors, "truncated": truncated}
+
 @app.get("/datasets/{dataset_id}/labels", response_model=List[Label])
-def list_labels(dataset_id: str, verified: Optional[bool] = None):
+def list_labels(dataset_id: str, verified: Optional[bool] = None, file_path: Optional[str] = None,
+                labeler_id: Optional[str] = None):
     if dataset_id not in datasets_db:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
-    labels = labels_db.get(dataset_id, [])
-    if verified is not None:
-        labels = [l for l in labels if l.verified == verified]
-    return labels
+    labels = labels_db[dataset_id].find(verified=verified, file_path=file_path, labeler_id=labeler_id)
+    return fast_json(labels)
+
+@app.get("/datasets/{dataset_id}/labels/{label_id}", response_model=Label)
+def get_label(dataset_id: str, label_id: str):
+    if dataset_id not in datasets_db:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    
+    label = labels_db[dataset_id].get(label_id)
+    if label is None:
+        raise HTTPException(status_code=404, detail="Label not found")
+    return label
 
 @app.put("/datasets/{dataset_id}/labels/{label_id}/verify")
 def verify_label(dataset_id: str, label_id: str):
     if dataset_id not in datasets_db:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
-    labels = labels_db.get(dataset_id, [])
-    for label in labels:
-        if label.id == label_id:
-            label.verified = True
-            return {"message": "Label verified successfully"}
-    
-    raise HTTPException(status_code=404, detail="Label not found")
+    if not labels_db[dataset_id].verify(label_id):
+        raise HTTPException(status_code=404, detail="Label not found")
+    storage.log({"op": "label.verify", "dataset_id": dataset_id, "label_id": label_id})
+    return {"message": "Label verified successfully"}
 
 # Quality Metrics
 @app.post("/datasets/{dataset_id}/metrics", response_model=QualityMetric)
@@ -222,6 +689,7 @@ def create_metric(dataset_id: str, metric: QualityMetric):
     if dataset_id not in metrics_db:
         metrics_db[dataset_id] = []
     metrics_db[dataset_id].append(metric)
+    storage.log({"op": "metric.put", "metric": metric.model_dump(mode="json")})
     
     return metric
 
@@ -235,98 +703,657 @@ def list_metrics(dataset_id: str, metric_name: Optional[str] = None):
         metrics = [m for m in metrics if m.metric_name == metric_name]
     return metrics
 
-@app.post("/datasets/{dataset_id}/analyze")
-def analyze_quality(dataset_id: str):
-    if dataset_id not in datasets_db:
-        raise HTTPException(status_code=404, detail="Dataset not found")
-    
-    # Simulate quality analysis
-    metrics = [
+def quality_metrics(job: AnalysisJob, profile: dict) -> List[QualityMetric]:
+    columns = profile["columns"]
+    total_values = profile["rows"] * len(columns)
+    missing_values = sum(c["nulls"] for c in columns.values())
+    present = {name: c for name, c in columns.items() if c["dominant_type"]}
+    source = {"job_id": job.id, "version_id": job.version_id}
+    return [
         QualityMetric(
-            dataset_id=dataset_id,
+            dataset_id=job.dataset_id,
             metric_name="completeness",
-            value=0.95,
-            details={"missing_values": 50, "total_values": 1000}
+            value=1 - missing_values / total_values if total_values else 1.0,
+            details={**source, "missing_values": missing_values, "total_values": total_values,
+                     "null_ratio": {name: c["null_ratio"] for name, c in columns.items()}}
         ),
         QualityMetric(
-            dataset_id=dataset_id,
+            dataset_id=job.dataset_id,
             metric_name="consistency",
-            value=0.98,
-            details={"inconsistent_records": 20}
+            value=sum(c["type_consistency"] for c in present.values()) / len(present) if present else 1.0,
+            details={**source, "malformed_rows": profile["malformed_rows"],
+                     "types": {name: c["dominant_type"] for name, c in present.items()},
+                     "type_consistency": {name: c["type_consistency"] for name, c in present.items()}}
         ),
         QualityMetric(
-            dataset_id=dataset_id,
-            metric_name="accuracy",
-            value=0.92,
-            details={"validation_errors": 80}
+            dataset_id=job.dataset_id,
+            metric_name="uniqueness",
+            value=1 - profile["duplicate_row_rate"],
+            details={**source, "rows": profile["rows"], "distinct_rows": profile["distinct_rows"],
+                     "exact": profile["distinct_rows_exact"]}
+        ),
+        QualityMetric(
+            dataset_id=job.dataset_id,
+            metric_name="profile",
+            value=profile["rows"],
+            details={**source, **profile}
         )
     ]
+
+def run_analysis(job: AnalysisJob, files: List[DatasetFile]):
+    job.status = "running"
+    job.started_at = datetime.utcnow()
+    
+    def on_bytes(n: int):
+        job.bytes_processed += n
+        job.progress = round(job.bytes_processed / job.bytes_total, 4)
+    
+    try:
+        profiler = TableProfiler()
+        for dataset_file in files:
+            chunks = (chunk_store.read(chunk_hash) for chunk_hash in dataset_file.chunks)
+            for batch in read_batches(dataset_file.filename, chunks, on_bytes):
+                profiler.add_batch(batch)
+                job.rows_processed = profiler.rows
+            job.files_profiled += 1
+        for metric in quality_metrics(job, profiler.result()):
+            create_metric(job.dataset_id, metric)
+        job.progress = 1.0
+        job.status = "completed"
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.completed_at = datetime.utcnow()
+
+@app.post("/datasets/{dataset_id}/analyze", response_model=AnalysisJob, status_code=202)
+def analyze_quality(dataset_id: str, version_id: Optional[str] = None):
+    """
+    Start profiling a tabular dataset's files (or a version's) in the
+    background. Poll the returned job; the results land in the dataset's
+    quality metrics.
+    """
+    if dataset_id not in datasets_db:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    if datasets_db[dataset_id].data_type != "tabular":
+        raise HTTPException(status_code=400, detail="Quality analysis supports tabular datasets only")
     
-    for metric in metrics:
-        create_metric(dataset_id, metric)
+    with stats_lock:
+        # Capture the file list now; later uploads don't change this job
+        entries = list(get_manifest(dataset_id, version_id).items())
+        files = [files_db[dataset_id][entry.file_id] for path, entry in entries if is_tabular(path)]
     
-    return {"message": "Quality analysis completed", "metrics": metrics}
+    job = AnalysisJob(
+        id=uuid.uuid4().hex,
+        dataset_id=dataset_id,
+        version_id=version_id,
+        files_total=len(files),
+        files_skipped=len(entries) - len(files),
+        bytes_total=sum(f.size_bytes for f in files),
+        created_at=datetime.utcnow()
+    )
+    analysis_jobs[job.id] = job
+    analysis_executor.submit(run_analysis, job, files)
+    return job
+
+@app.get("/datasets/{dataset_id}/analyze/{job_id}", response_model=AnalysisJob)
+def get_analysis(dataset_id: str, job_id: str):
+    job = analysis_jobs.get(job_id)
+    if job is None or job.dataset_id != dataset_id:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    return job
 
 # Synthetic Data Generation
-@app.post("/datasets/{dataset_id}/generate-synthetic")
-def generate_synthetic(dataset_id: str, request: SyntheticDataRequest):
+SYNTHETIC_SEED_ROWS = int(os.getenv("SYNTHETIC_SEED_ROWS", 10_000))
+
+def load_seed_rows(dataset_id: str) -> Dict[str, List[str]]:
+    """Up to SYNTHETIC_SEED_ROWS rows from the dataset's first tabular file, by column."""
+    with stats_lock:
+        entries = [(path, files_db[dataset_id][entry.file_id]) for path, entry in heads[dataset_id].items()
+                   if is_tabular(path) and not path.startswith("synthetic/")]
+    for path, dataset_file in sorted(entries, key=lambda item: item[0]):
+        chunks = (chunk_store.read(chunk_hash) for chunk_hash in dataset_file.chunks)
+        for batch in read_batches(path, chunks, lambda n: None, min(SYNTHETIC_SEED_ROWS, PROFILE_BATCH_ROWS)):
+            batch.pop(None, None)
+            if batch:
+                return batch
+    return {}
+
+def finish_synthetic(job: SyntheticJob, size: int, chunks: List[str]) -> DatasetFile:
+    return add_file(job.dataset_id, job.output_path, size, chunks)
+
+@app.post("/datasets/{dataset_id}/generate-synthetic", response_model=SyntheticJob, status_code=202)
+async def generate_synthetic(dataset_id: str, request: SyntheticDataRequest):
+    """
+    Start a generation job. Samples are written to synthetic/<job_id>.jsonl
+    in the dataset as they are generated; poll the job for progress.
+    """
     if dataset_id not in datasets_db:
         raise HTTPException(status_code=404, detail="Dataset not found")
+    if request.generation_method not in SYNTHETIC_METHODS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported generation method; available: {', '.join(SYNTHETIC_METHODS)}"
+        )
+    if request.num_samples <= 0:
+        raise HTTPException(status_code=400, detail="num_samples must be positive")
     
-    # Simulate synthetic data generation
-    return {
-        "message": "Synthetic data generation started",
-        "job_id": hashlib.md5(f"{dataset_id}{datetime.utcnow()}".encode()).hexdigest(),
-        "status": "processing",
-        "estimated_completion": "5 minutes",
-        "method": request.generation_method,
-        "num_samples": request.num_samples
-    }
+    job_id = uuid.uuid4().hex
+    job = SyntheticJob(
+        id=job_id,
+        dataset_id=dataset_id,
+        method=request.generation_method,
+        num_samples=request.num_samples,
+        parameters=request.parameters,
+        output_path=f"synthetic/{job_id}.jsonl",
+        created_at=datetime.utcnow()
+    )
+    synthetic_jobs.submit(job, lambda: load_seed_rows(dataset_id), finish_synthetic)
+    return job
+
+@app.get("/datasets/{dataset_id}/synthetic-jobs", response_model=List[SyntheticJob])
+def list_synthetic_jobs(dataset_id: str, status: Optional[str] = None):
+    if dataset_id not in datasets_db:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    return [
+        job for job in synthetic_jobs.jobs.values()
+        if job.dataset_id == dataset_id and (status is None or job.status == status)
+    ]
+
+def get_synthetic_job(dataset_id: str, job_id: str) -> SyntheticJob:
+    job = synthetic_jobs.jobs.get(job_id)
+    if job is None or job.dataset_id != dataset_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/datasets/{dataset_id}/synthetic-jobs/{job_id}", response_model=SyntheticJob)
+def get_synthetic(dataset_id: str, job_id: str):
+    return get_synthetic_job(dataset_id, job_id)
+
+@app.post("/datasets/{dataset_id}/synthetic-jobs/{job_id}/cancel", response_model=SyntheticJob)
+async def cancel_synthetic(dataset_id: str, job_id: str):
+    job = get_synthetic_job(dataset_id, job_id)
+    task = synthetic_jobs.cancel(job_id)
+    if task is None:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    # Wait for the job to release what it wrote so far
+    await asyncio.wait([task])
+    return job
+
+# Files
+def release_file(dataset_id: str, file_id: str):
+    """Drop a file that left the head, unless a version still holds it. Call with stats_lock held."""
+    unversioned = unversioned_files[dataset_id]
+    if file_id in unversioned:
+        unversioned.discard(file_id)
+        chunk_store.decref(files_db[dataset_id].pop(file_id).chunks)
+
+def update_head(dataset_id: str, path: str, dataset_file: Optional[DatasetFile]) -> bool:
+    """
+    Put a file at `path` in the dataset's head (or remove the path when
+    dataset_file is None), updating the dataset counters in the same step.
+    """
+    with stats_lock:
+        dataset = datasets_db.get(dataset_id)
+        if dataset is None:
+            return False
+        head = heads[dataset_id]
+        previous = head.get(path)
+        if dataset_file is not None:
+            files_db[dataset_id][dataset_file.id] = dataset_file
+            unversioned_files[dataset_id].add(dataset_file.id)
+            head = head.set(path, ManifestEntry(dataset_file.content_hash, dataset_file.size_bytes, dataset_file.id))
+        else:
+            head = head.remove(path)
+        heads[dataset_id] = head
+        if previous is not None:
+            release_file(dataset_id, previous.file_id)
+        dataset.size_bytes = head.size_bytes
+        dataset.num_samples = head.count
+        dataset.updated_at = datetime.utcnow()
+        lsn = storage.append({
+            "op": "file.put",
+            "dataset_id": dataset_id,
+            "path": path,
+            "file": dataset_file.model_dump(mode="json") if dataset_file else None,
+            "chunk_sizes": [chunk_store.size(h) for h in dataset_file.chunks] if dataset_file else None,
+            "updated_at": dataset.updated_at.isoformat()
+        })
+    storage.wait(lsn)
+    response_cache.invalidate("datasets")
+    return True
+
+def add_file(dataset_id: str, filename: str, size: int, chunks: List[str]) -> DatasetFile:
+    """Create a file from chunks the caller already holds references to."""
+    dataset_file = DatasetFile(
+        id=uuid.uuid4().hex,
+        dataset_id=dataset_id,
+        filename=filename,
+        size_bytes=size,
+        content_hash=merkle_root(chunks),
+        chunks=chunks,
+        created_at=datetime.utcnow()
+    )
+    if not update_head(dataset_id, filename, dataset_file):
+        chunk_store.decref(chunks)
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    return dataset_file
 
 @app.post("/datasets/{dataset_id}/upload")
 async def upload_data(dataset_id: str, file: UploadFile = File(...)):
     if dataset_id not in datasets_db:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
-    # Simulate file upload
-    contents = await file.read()
-    file_size = len(contents)
-    
-    dataset = datasets_db[dataset_id]
-    dataset.size_bytes += file_size
-    dataset.num_samples += 1
-    dataset.updated_at = datetime.utcnow()
+    size, chunks = await ingest(chunk_store, upload_file_chunks(file))
+    dataset_file = await run_in_threadpool(add_file, dataset_id, file.filename, size, chunks)
     
     return {
         "message": "File uploaded successfully",
         "filename": file.filename,
-        "size_bytes": file_size,
-        "dataset_id": dataset_id
+        "size_bytes": dataset_file.size_bytes,
+        "dataset_id": dataset_id,
+        "file_id": dataset_file.id,
+        "content_hash": dataset_file.content_hash
     }
 
+@app.put("/datasets/{dataset_id}/files/{path:path}", response_model=DatasetFile)
+async def put_file(dataset_id: str, path: str, request: Request):
+    """Upload a file as the raw request body, without multipart/form-data encoding."""
+    if dataset_id not in datasets_db:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    size, chunks = await ingest(chunk_store, request.stream())
+    return await run_in_threadpool(add_file, dataset_id, path, size, chunks)
+
+@app.delete("/datasets/{dataset_id}/files/{path:path}")
+def delete_file(dataset_id: str, path: str):
+    if dataset_id not in datasets_db:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    if heads[dataset_id].get(path) is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    update_head(dataset_id, path, None)
+    return {"message": "File deleted successfully"}
+
+@app.post("/datasets/{dataset_id}/files", response_model=DatasetFile)
+def create_file_from_chunks(dataset_id: str, file: FileCreate):
+    """Assemble a file from chunks that are already stored (see /storage/chunks)."""
+    if dataset_id not in datasets_db:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    try:
+        chunk_store.incref(file.chunks)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Unknown chunk: {e.args[0]}")
+    size = sum(chunk_store.size(h) for h in file.chunks)
+    return add_file(dataset_id, file.filename, size, file.chunks)
+
+@app.get("/datasets/{dataset_id}/files", response_model=List[DatasetFile])
+def list_files(dataset_id: str):
+    if dataset_id not in datasets_db:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    files = files_db[dataset_id]
+    return [files[entry.file_id] for _, entry in heads[dataset_id].items()]
+
+@app.get("/datasets/{dataset_id}/files/{file_id}/content")
+def download_file(dataset_id: str, file_id: str):
+    dataset_file = files_db.get(dataset_id, {}).get(file_id)
+    if dataset_file is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    def content():
+        for chunk_hash in dataset_file.chunks:
+            yield chunk_store.read(chunk_hash)
+    
+    return StreamingResponse(
+        content(),
+        media_type="application/octet-stream",
+        headers={"Content-Length": str(dataset_file.size_bytes), "ETag": f'"{dataset_file.content_hash}"'}
+    )
+
+# Resumable uploads: create a session, PUT numbered parts (re-sending any
+# that failed), then complete. Every part but the last must be a multiple
+# of chunk_size bytes.
+def get_session(dataset_id: str, upload_id: str) -> UploadSession:
+    session = uploads_db.get(upload_id)
+    if session is None or session.dataset_id != dataset_id:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if session.status != "in_progress":
+        raise HTTPException(status_code=409, detail=f"Upload is {session.status}")
+    return session
+
+@app.post("/datasets/{dataset_id}/uploads", response_model=UploadSession)
+def create_upload(dataset_id: str, upload: UploadCreate):
+    if dataset_id not in datasets_db:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        dataset_id=dataset_id,
+        filename=upload.filename,
+        part_size=PART_SIZE,
+        chunk_size=chunk_store.chunk_size,
+        created_at=datetime.utcnow()
+    )
+    uploads_db[session.id] = session
+    return session
+
+@app.get("/datasets/{dataset_id}/uploads/{upload_id}", response_model=UploadSession)
+def get_upload(dataset_id: str, upload_id: str):
+    session = uploads_db.get(upload_id)
+    if session is None or session.dataset_id != dataset_id:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+@app.put("/datasets/{dataset_id}/uploads/{upload_id}/parts/{part_number}", response_model=UploadPart)
+async def upload_part(dataset_id: str, upload_id: str, part_number: int, request: Request):
+    session = get_session(dataset_id, upload_id)
+    if not 1 <= part_number <= 10000:
+        raise HTTPException(status_code=400, detail="part_number must be between 1 and 10000")
+    
+    size, chunks = await ingest(chunk_store, request.stream())
+    if session.status != "in_progress":
+        chunk_store.decref(chunks)
+        raise HTTPException(status_code=409, detail=f"Upload is {session.status}")
+    
+    part = UploadPart(part_number=part_number, size_bytes=size, chunks=chunks)
+    previous = session.parts.get(part_number)
+    session.parts[part_number] = part
+    if previous is not None:
+        chunk_store.decref(previous.chunks)
+    return part
+
+@app.post("/datasets/{dataset_id}/uploads/{upload_id}/complete", response_model=DatasetFile)
+def complete_upload(dataset_id: str, upload_id: str):
+    session = get_session(dataset_id, upload_id)
+    if not session.parts:
+        raise HTTPException(status_code=400, detail="No parts uploaded")
+    missing = session.missing_parts()
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing parts: {missing}")
+    
+    part_numbers = sorted(session.parts)
+    misaligned = [n for n in part_numbers[:-1] if session.parts[n].size_bytes % session.chunk_size]
+    if misaligned:
+        raise HTTPException(status_code=400, detail=f"Parts not a multiple of chunk_size: {misaligned}")
+    
+    session.status = "completed"
+    session.completed_at = datetime.utcnow()
+    # The session's chunk references pass to the file
+    return add_file(
+        dataset_id,
+        session.filename,
+        sum(p.size_bytes for p in session.parts.values()),
+        session.chunk_hashes()
+    )
+
+@app.delete("/datasets/{dataset_id}/uploads/{upload_id}")
+def abort_upload(dataset_id: str, upload_id: str):
+    session = get_session(dataset_id, upload_id)
+    session.status = "aborted"
+    chunk_store.decref(session.chunk_hashes())
+    return {"message": "Upload aborted"}
+
+# Chunk storage
+@app.get("/storage/stats")
+def storage_stats():
+    return {**chunk_store.stats(), "collector": collector.stats()}
+
+@app.get("/storage/deletions")
+def pending_deletions():
+    """Deleted datasets the collector is still reclaiming."""
+    return collector.pending()
+
+@app.post("/storage/chunks/missing")
+def missing_chunks(query: ChunkQuery):
+    """Which of these chunks still need uploading. Clients skip the rest."""
+    return {"missing": chunk_store.missing(query.hashes)}
+
+@app.put("/storage/chunks/{chunk_hash}")
+async def put_chunk(chunk_hash: str, request: Request):
+    data = bytearray()
+    async for piece in request.stream():
+        data += piece
+        if len(data) > chunk_store.chunk_size:
+            raise HTTPException(status_code=413, detail=f"Chunks are at most {chunk_store.chunk_size} bytes")
+    if hashlib.sha256(data).hexdigest() != chunk_hash:
+        raise HTTPException(status_code=400, detail="Chunk content does not match its hash")
+    
+    # Unreferenced until a file uses it; kept for the orphan grace period
+    _, stored = await run_in_threadpool(chunk_store.put, bytes(data), False)
+    return {"chunk_hash": chunk_hash, "size_bytes": len(data), "stored": stored}
+
+@app.post("/storage/gc")
+def collect_garbage():
+    """
+    Delete up to GC_BATCH_SIZE orphaned chunks now. Each batch holds the
+    chunk lock, so a large backlog is left to the collector or to further calls.
+    """
+    collected = chunk_store.collect(limit=GC_BATCH_SIZE)
+    return {"collected_chunks": collected, "more": collected == GC_BATCH_SIZE}
+
 @app.get("/datasets/{dataset_id}/statistics")
-def get_statistics(dataset_id: str):
+def get_statistics(dataset_id: str, version_id: Optional[str] = None):
+    """
+    Dataset totals, plus approximate column statistics (from sketches) for
+    `version_id` or the latest version of a tabular dataset.
+    """
     if dataset_id not in datasets_db:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
     dataset = datasets_db[dataset_id]
-    labels = labels_db.get(dataset_id, [])
+    labels = labels_db[dataset_id]
     versions = versions_db.get(dataset_id, [])
     metrics = metrics_db.get(dataset_id, [])
     
+    if version_id is None and len(versions):
+        version_id = versions[-1].id
+    elif version_id is not None:
+        version = version_index.get(version_id)
+        if version is None or version.dataset_id != dataset_id:
+            raise HTTPException(status_code=404, detail="Version not found")
+    column_statistics = None
+    if version_id is not None and version_id in version_statistics:
+        column_statistics = {"version_id": version_id, **version_statistics[version_id]}
+    
     return {
         "dataset_id": dataset_id,
         "total_samples": dataset.num_samples,
         "total_size_bytes": dataset.size_bytes,
         "total_labels": len(labels),
-        "verified_labels": len([l for l in labels if l.verified]),
+        "verified_labels": labels.verified_count,
+        "unverified_labels": labels.unverified_count,
         "total_versions": len(versions),
         "quality_metrics": len(metrics),
         "data_type": dataset.data_type,
         "created_at": dataset.created_at,
-        "last_updated": dataset.updated_at
+        "last_updated": dataset.updated_at,
+        "column_statistics": column_statistics
     }
 
+# Persistence: snapshots of the catalog and replay of the log into it.
+# Version manifests are stored as changes from the previous version (and
+# the head as changes from the latest), so snapshots stay proportional to
+# what changed rather than versions x files.
+def manifest_changes(base: Manifest, target: Manifest) -> Dict[str, Optional[str]]:
+    """Path -> file id that turns `base` into `target`; None removes the path."""
+    diff = base.diff(target)
+    changes = {path: target.get(path).file_id for path in diff["added"] + diff["modified"]}
+    changes.update(dict.fromkeys(diff["removed"]))
+    return changes
+
+def apply_changes(manifest: Manifest, changes: Dict[str, Optional[str]], files: Dict[str, DatasetFile]) -> Manifest:
+    for path, file_id in changes.items():
+        if file_id is None:
+            manifest = manifest.remove(path)
+        else:
+            f = files[file_id]
+            manifest = manifest.set(path, ManifestEntry(f.content_hash, f.size_bytes, f.id))
+    return manifest
+
+def capture_state():
+    """The catalog as of the log's last record; see Storage.start."""
+    with stats_lock:
+        # Head, version and dataset records are appended under stats_lock,
+        # so this is exactly the state after record `lsn`. Label and metric
+        # records may run ahead of it; replaying those is idempotent.
+        lsn = storage.last_lsn
+        datasets = list(datasets_db.values())
+        # A delete removes the dataset under the lock and the rest after it
+        ids = list(datasets_db)
+        files = {dataset_id: list(files_db[dataset_id].values()) for dataset_id in ids}
+        chains = {dataset_id: [(v, version_manifests[v.id]) for v in versions_db[dataset_id]] for dataset_id in ids}
+        head_manifests = {dataset_id: heads[dataset_id] for dataset_id in ids}
+        unversioned = {dataset_id: list(unversioned_files[dataset_id]) for dataset_id in ids}
+        labels = {dataset_id: labels_db[dataset_id].all() for dataset_id in ids}
+        metrics = {dataset_id: list(metrics_db[dataset_id]) for dataset_id in ids}
+        # Chunk references still held by deleted datasets, for the collector to release after a restart
+        tombstones = {dataset_id: list(f.values()) for dataset_id, f in deleted_files.items()}
+    
+    def build() -> dict:
+        versions = {}
+        head_changes = {}
+        for dataset_id, chain in chains.items():
+            previous = Manifest()
+            versions[dataset_id] = []
+            for version, manifest in chain:
+                versions[dataset_id].append({"version": version.model_dump(mode="json"),
+                                             "files": manifest_changes(previous, manifest)})
+                previous = manifest
+            head_changes[dataset_id] = manifest_changes(previous, head_manifests[dataset_id])
+        chunk_sizes = {}
+        for dataset_files in [*files.values(), *tombstones.values()]:
+            for f in dataset_files:
+                for chunk_hash in f.chunks:
+                    chunk_sizes[chunk_hash] = chunk_store.size(chunk_hash) or 0
+        return {
+            "datasets": [d.model_dump(mode="json") for d in datasets],
+            "files": {dataset_id: [f.model_dump(mode="json") for f in fs] for dataset_id, fs in files.items()},
+            "chunk_sizes": chunk_sizes,
+            "versions": versions,
+            "heads": head_changes,
+            "unversioned": unversioned,
+            "labels": {dataset_id: [l.model_dump(mode="json") for l in ls] for dataset_id, ls in labels.items()},
+            "metrics": {dataset_id: [m.model_dump(mode="json") for m in ms] for dataset_id, ms in metrics.items()},
+            "tombstones": {dataset_id: [f.model_dump(mode="json") for f in fs] for dataset_id, fs in tombstones.items()}
+        }
+    
+    return lsn, build
+
+def load_state(state: dict, chunk_sizes: Dict[str, int]):
+    for data in state["datasets"]:
+        init_dataset(Dataset.model_validate(data))
+    for dataset_id, dataset_files in state["files"].items():
+        files_db[dataset_id] = {f.id: f for f in map(DatasetFile.model_validate, dataset_files)}
+    for dataset_id, entries in state["versions"].items():
+        manifest = Manifest()
+        for entry in entries:
+            version = DatasetVersion.model_validate(entry["version"])
+            manifest = apply_changes(manifest, entry["files"], files_db[dataset_id])
+            version_manifests[version.id] = manifest
+            version_index[version.id] = version
+            versions_db[dataset_id].append(version)
+        heads[dataset_id] = apply_changes(manifest, state["heads"][dataset_id], files_db[dataset_id])
+        unversioned_files[dataset_id] = set(state["unversioned"][dataset_id])
+    for dataset_id, labels in state["labels"].items():
+        labels_db[dataset_id].add_many(map(Label.model_validate, labels))
+    for dataset_id, metrics in state["metrics"].items():
+        metrics_db[dataset_id] = [QualityMetric.model_validate(m) for m in metrics]
+    for dataset_id, dataset_files in state.get("tombstones", {}).items():
+        deleted_files[dataset_id] = {f.id: f for f in map(DatasetFile.model_validate, dataset_files)}
+        tombstone = Tombstone(dataset_id)
+        add_files_step(tombstone)
+        collector.add(tombstone)
+    chunk_sizes.update(state["chunk_sizes"])
+
+def apply_record(record: dict, chunk_sizes: Dict[str, int], metric_ids: Dict[str, Set[str]]):
+    """
+    Replay one log record. Records the state already reflects are no-ops.
+    `metric_ids` holds each dataset's metric ids for the replay's duration.
+    """
+    op = record["op"]
+    if op == "dataset.put":
+        dataset = Dataset.model_validate(record["dataset"])
+        if dataset.id not in datasets_db:
+            init_dataset(dataset)
+            return
+        head = heads[dataset.id]
+        dataset.size_bytes = head.size_bytes
+        dataset.num_samples = head.count
+        datasets_db[dataset.id] = dataset
+        dataset_index.update(dataset)
+    elif op == "dataset.delete":
+        if record["dataset_id"] in datasets_db:
+            collector.add(detach_dataset(record["dataset_id"]))
+    elif op == "file.put":
+        dataset_id, path = record["dataset_id"], record["path"]
+        dataset = datasets_db.get(dataset_id)
+        if dataset is None:
+            return
+        head = heads[dataset_id]
+        previous = head.get(path)
+        if record["file"] is not None:
+            dataset_file = DatasetFile.model_validate(record["file"])
+            if previous is not None and previous.file_id == dataset_file.id:
+                return
+            files_db[dataset_id][dataset_file.id] = dataset_file
+            unversioned_files[dataset_id].add(dataset_file.id)
+            chunk_sizes.update(zip(dataset_file.chunks, record["chunk_sizes"]))
+            head = head.set(path, ManifestEntry(dataset_file.content_hash, dataset_file.size_bytes, dataset_file.id))
+        elif previous is None:
+            return
+        else:
+            head = head.remove(path)
+        heads[dataset_id] = head
+        if previous is not None:
+            # Chunk references are restored after replay, so this only drops the file
+            release_file(dataset_id, previous.file_id)
+        dataset.size_bytes = head.size_bytes
+        dataset.num_samples = head.count
+        dataset.updated_at = datetime.fromisoformat(record["updated_at"])
+    elif op == "version.put":
+        version = DatasetVersion.model_validate(record["version"])
+        if version.dataset_id in datasets_db and version.id not in version_index:
+            commit_head(version)
+    elif op == "labels.put":
+        store = labels_db.get(record["dataset_id"])
+        if store is not None:
+            labels = map(Label.model_validate, record["labels"])
+            store.add_many(label for label in labels if store.get(label.id) is None)
+    elif op == "label.verify":
+        store = labels_db.get(record["dataset_id"])
+        if store is not None:
+            store.verify(record["label_id"])
+    elif op == "metric.put":
+        metric = QualityMetric.model_validate(record["metric"])
+        metrics = metrics_db.get(metric.dataset_id)
+        if metrics is None:
+            return
+        ids = metric_ids.get(metric.dataset_id)
+        if ids is None:
+            ids = metric_ids[metric.dataset_id] = {m.id for m in metrics}
+        if metric.id not in ids:
+            ids.add(metric.id)
+            metrics.append(metric)
+
+def recover_catalog():
+    chunk_sizes: Dict[str, int] = {}
+    metric_ids: Dict[str, Set[str]] = {}
+    storage.recover(lambda state: load_state(state, chunk_sizes),
+                    lambda record: apply_record(record, chunk_sizes, metric_ids))
+    # The chunk store's index lives in memory; rebuild it from the files
+    for dataset_files in [*files_db.values(), *deleted_files.values()]:
+        for dataset_file in dataset_files.values():
+            chunk_store.restore(dataset_file.chunks, chunk_sizes)
+    # Chunks of unfinished uploads and pending orphans aren't in the log; find them in the blob store
+    chunk_store.reconcile()
+    for dataset_id, versions in versions_db.items():
+        if len(versions) and datasets_db[dataset_id].data_type == "tabular":
+            version = versions[-1]
+            version_statistics[version.id] = {"status": "pending"}
+            sketch_executor.submit(build_version_sketch, version, version_manifests[version.id], {})
+    storage.start(capture_state)
+    collector.start()
+
+recover_catalog()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
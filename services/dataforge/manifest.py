@@ -0,0 +1,209 @@
+"""
+Persistent dataset manifests (file path -> content) for DataForge versioning.
+
+A Manifest is an immutable hash trie keyed by sha256(path). Small subtrees
+are flat buckets of up to BUCKET_SIZE entries; larger ones branch 16 ways on
+the next hex digit of the path hash. Every node carries a Merkle digest of
+its contents, plus entry count and total size.
+
+- `set`/`remove` copy only the nodes on one root-to-bucket path and share
+  everything else with the previous manifest, so snapshotting a version
+  is just keeping a reference to the current root.
+- The trie shape depends only on the set of entries, so equal contents
+  give equal digests, and `diff` skips any pair of subtrees with the same
+  digest. The work done is proportional to the number of changed entries,
+  not the size of the dataset.
+- The root digest is the version's commit hash.
+"""
+
+import hashlib
+from collections import namedtuple
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from chunkstore import EMPTY_ROOT, file_leaf
+
+BUCKET_SIZE = 64
+FANOUT = 16
+MAX_DEPTH = 64  # hex digits in a sha256
+
+# content_hash and size describe the file; file_id points at its DatasetFile
+ManifestEntry = namedtuple("ManifestEntry", "content_hash size_bytes file_id")
+
+_EMPTY_DIGEST = bytes.fromhex(EMPTY_ROOT)
+
+
+def _path_hash(path: str) -> str:
+    return hashlib.sha256(path.encode()).hexdigest()
+
+
+def _leaf(path: str, entry: ManifestEntry) -> bytes:
+    return bytes.fromhex(file_leaf(path, entry.content_hash))
+
+
+class Bucket:
+    __slots__ = ("items", "count", "size", "_digest")
+
+    def __init__(self, items: Dict[str, Tuple[ManifestEntry, bytes]]):
+        self.items = items
+        self.count = len(items)
+        self.size = sum(entry.size_bytes for entry, _ in items.values())
+        self._digest = None
+
+    @property
+    def digest(self) -> bytes:
+        # Computed on first use, so bulk edits don't hash intermediate nodes
+        if self._digest is None:
+            digest = hashlib.sha256(b"\x00")
+            for path in sorted(self.items):
+                digest.update(self.items[path][1])
+            self._digest = digest.digest()
+        return self._digest
+
+
+class Branch:
+    __slots__ = ("children", "count", "size", "_digest")
+
+    def __init__(self, children: tuple):
+        self.children = children
+        self.count = sum(c.count for c in children if c is not None)
+        self.size = sum(c.size for c in children if c is not None)
+        self._digest = None
+
+    @property
+    def digest(self) -> bytes:
+        if self._digest is None:
+            digest = hashlib.sha256(b"\x02")
+            for child in self.children:
+                digest.update(child.digest if child is not None else _EMPTY_DIGEST)
+            self._digest = digest.digest()
+        return self._digest
+
+
+def _flatten(node, out: Dict[str, ManifestEntry]):
+    if node is None:
+        return
+    if isinstance(node, Bucket):
+        for path, (entry, _) in node.items.items():
+            out[path] = entry
+    else:
+        for child in node.children:
+            _flatten(child, out)
+
+
+def _build(items: Dict[str, Tuple[ManifestEntry, bytes]], depth: int):
+    if not items:
+        return None
+    if len(items) <= BUCKET_SIZE or depth >= MAX_DEPTH:
+        return Bucket(items)
+    groups: List[Dict[str, Tuple[ManifestEntry, bytes]]] = [{} for _ in range(FANOUT)]
+    for path, value in items.items():
+        groups[int(_path_hash(path)[depth], 16)][path] = value
+    return Branch(tuple(_build(group, depth + 1) for group in groups))
+
+
+def _set(node, path: str, hashed: str, value, depth: int):
+    if node is None:
+        return Bucket({path: value})
+    if isinstance(node, Bucket):
+        items = dict(node.items)
+        items[path] = value
+        return _build(items, depth)
+    slot = int(hashed[depth], 16)
+    children = list(node.children)
+    children[slot] = _set(children[slot], path, hashed, value, depth + 1)
+    return Branch(tuple(children))
+
+
+def _remove(node, path: str, hashed: str, depth: int):
+    if node is None:
+        return None
+    if isinstance(node, Bucket):
+        if path not in node.items:
+            return node
+        items = dict(node.items)
+        del items[path]
+        return Bucket(items) if items else None
+    slot = int(hashed[depth], 16)
+    child = _remove(node.children[slot], path, hashed, depth + 1)
+    if child is node.children[slot]:
+        return node
+    children = list(node.children)
+    children[slot] = child
+    branch = Branch(tuple(children))
+    if branch.count <= BUCKET_SIZE:
+        # Collapse so the shape (and digest) only depends on the contents
+        items: Dict[str, ManifestEntry] = {}
+        _flatten(branch, items)
+        return Bucket({p: (e, _leaf(p, e)) for p, e in items.items()}) if items else None
+    return branch
+
+
+def _diff(a, b, added: list, removed: list, modified: list):
+    if a is b or (a is not None and b is not None and a.digest == b.digest):
+        return
+    if isinstance(a, Branch) and isinstance(b, Branch):
+        for x, y in zip(a.children, b.children):
+            _diff(x, y, added, removed, modified)
+        return
+    # At least one side is small (a bucket) or empty; compare the entries
+    left: Dict[str, ManifestEntry] = {}
+    right: Dict[str, ManifestEntry] = {}
+    _flatten(a, left)
+    _flatten(b, right)
+    for path, entry in right.items():
+        if path not in left:
+            added.append(path)
+        elif left[path].content_hash != entry.content_hash:
+            modified.append(path)
+    removed.extend(path for path in left if path not in right)
+
+
+class Manifest:
+    __slots__ = ("root",)
+
+    def __init__(self, root=None):
+        self.root = root
+
+    @property
+    def count(self) -> int:
+        return self.root.count if self.root is not None else 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self.root.size if self.root is not None else 0
+
+    @property
+    def digest(self) -> str:
+        return self.root.digest.hex() if self.root is not None else EMPTY_ROOT
+
+    def get(self, path: str) -> Optional[ManifestEntry]:
+        node, hashed, depth = self.root, None, 0
+        while isinstance(node, Branch):
+            hashed = hashed or _path_hash(path)
+            node = node.children[int(hashed[depth], 16)]
+            depth += 1
+        if node is None or path not in node.items:
+            return None
+        return node.items[path][0]
+
+    def set(self, path: str, entry: ManifestEntry) -> "Manifest":
+        return Manifest(_set(self.root, path, _path_hash(path), (entry, _leaf(path, entry)), 0))
+
+    def remove(self, path: str) -> "Manifest":
+        return Manifest(_remove(self.root, path, _path_hash(path), 0))
+
+    def items(self) -> Iterator[Tuple[str, ManifestEntry]]:
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Bucket):
+                for path, (entry, _) in node.items.items():
+                    yield path, entry
+            else:
+                stack.extend(c for c in reversed(node.children) if c is not None)
+
+    def diff(self, other: "Manifest") -> dict:
+        """Paths added, removed and modified going from this manifest to `other`."""
+        added, removed, modified = [], [], []
+        _diff(self.root, other.root, added, removed, modified)
+        return {"added": sorted(added), "removed": sorted(removed), "modified": sorted(modified)}
@@ -0,0 +1,377 @@
+"""
+Single-pass, column-oriented quality profiler for tabular DataForge files.
+
+Files are streamed chunk by chunk from the chunk store and parsed into
+batches of PROFILE_BATCH_ROWS rows (fewer when they hold more than
+PROFILE_BATCH_CHARS characters), which are transposed into columns and
+profiled with NumPy. Memory is bounded by the batch size and the sketches,
+never by the size of the table. For each column the profiler keeps:
+
+- null count and per-type value counts (integer, float, boolean, string)
+- distinct count (exact while small, HyperLogLog beyond)
+- count, mean and variance of numeric values, plus a t-digest for
+  min, max and quantiles
+- the most frequent values (count-min sketch)
+
+Rows are hashed across all their columns to estimate the duplicate-row rate.
+All of it merges, so a table's profile can be assembled from its files'.
+
+Supported formats: CSV/TSV (with a header row) and JSON Lines.
+"""
+
+import codecs
+import csv
+import json
+import os
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from sketches import DistinctCounter, FrequentValues, TDigest, codepoints, combine_hashes, hash_strings
+
+PROFILE_BATCH_ROWS = int(os.getenv("PROFILE_BATCH_ROWS", 50_000))
+PROFILE_BATCH_CHARS = int(os.getenv("PROFILE_BATCH_CHARS", 64 * 1024 * 1024))
+# Null and type checks read at most this many code points of a cell;
+# longer cells are strings (or blank, checked cell by cell)
+CLASSIFY_WIDTH = 64
+
+TABULAR_EXTENSIONS = {".csv": ",", ".tsv": "\t", ".jsonl": None, ".ndjson": None}
+NULL_TOKENS = ["", "na", "n/a", "nan", "null", "none"]
+TYPES = ("integer", "float", "boolean", "string")
+QUANTILES = (0.01, 0.25, 0.5, 0.75, 0.99)
+
+
+def is_tabular(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in TABULAR_EXTENSIONS
+
+
+def _lines(chunks: Iterable[bytes], on_bytes: Callable[[int], None]) -> Iterator[str]:
+    """Decode a stream of byte chunks into text lines (keeping line endings)."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    for chunk in chunks:
+        on_bytes(len(chunk))
+        text = pending + decoder.decode(chunk)
+        lines = text.splitlines(keepends=True)
+        # The last piece may be a partial line; carry it into the next chunk
+        pending = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        yield from lines
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def _json_cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+def _take(items: Iterator, read: List[int], batch_rows: int, batch_chars: int) -> list:
+    """Up to `batch_rows` items, stopping early once `read[0]` grows by `batch_chars`."""
+    batch, start = [], read[0]
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_rows or read[0] - start >= batch_chars:
+            break
+    return batch
+
+
+def read_batches(path: str, chunks: Iterable[bytes], on_bytes: Callable[[int], None],
+                 batch_rows: int = PROFILE_BATCH_ROWS,
+                 batch_chars: int = PROFILE_BATCH_CHARS) -> Iterator[Dict[str, List[str]]]:
+    """
+    Yield {column: [cell, ...]} batches from a tabular file; missing cells
+    are ''. The None key holds one entry per malformed row in the batch.
+    A batch ends after `batch_rows` rows or `batch_chars` characters of
+    lines, so wide rows can't make it arbitrarily large.
+    """
+    delimiter = TABULAR_EXTENSIONS[os.path.splitext(path)[1].lower()]
+    read = [0]
+
+    def counted(lines: Iterator[str]) -> Iterator[str]:
+        for line in lines:
+            read[0] += len(line)
+            yield line
+
+    lines = counted(_lines(chunks, on_bytes))
+
+    if delimiter is None:
+        while True:
+            rows = []
+            for line in _take(lines, read, batch_rows, batch_chars):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                rows.append(record if isinstance(record, dict) else None)
+            if not rows:
+                return
+            columns: Dict[str, List[str]] = {}
+            for i, record in enumerate(rows):
+                for name, value in (record or {}).items():
+                    column = columns.get(name)
+                    if column is None:
+                        column = columns[name] = [""] * len(rows)
+                    column[i] = _json_cell(value)
+            # Lines that aren't JSON objects are reported as malformed rows
+            columns[None] = [""] * sum(record is None for record in rows)
+            yield columns
+
+    reader = csv.reader(lines, delimiter=delimiter)
+    header = next(reader, None)
+    if not header:
+        return
+    width = len(header)
+    while True:
+        rows = _take(reader, read, batch_rows, batch_chars)
+        if not rows:
+            return
+        malformed = 0
+        for i, row in enumerate(rows):
+            if len(row) != width:
+                malformed += 1
+                rows[i] = (row + [""] * width)[:width]
+        columns = dict(zip(header, map(list, zip(*rows))))
+        columns[None] = [""] * malformed
+        yield columns
+
+
+def _short_keys(codes: np.ndarray) -> np.ndarray:
+    """
+    Pack values of up to 5 characters into an int64, lower-cased, for
+    vectorized comparison against short tokens; longer values get -1.
+    """
+    head = np.zeros((len(codes), 6), dtype=np.int64)
+    width = min(codes.shape[1], 6)
+    head[:, :width] = codes[:, :width]
+    upper = (head >= 65) & (head <= 90)
+    head[upper] += 32
+    np.minimum(head, 255, out=head)
+    keys = (head[:, :5] << np.arange(0, 40, 8)).sum(axis=1)
+    keys[head[:, 5] != 0] = -1
+    return keys
+
+
+def _token_keys(tokens) -> np.ndarray:
+    return _short_keys(codepoints(tokens))
+
+
+_NULL_KEYS = _token_keys(NULL_TOKENS)
+_BOOL_KEYS = _token_keys(["true", "false"])
+_BLANK = [0, 9, 10, 13, 32]
+_BLANK_CHARS = "".join(map(chr, _BLANK))
+_NUMBER_CHARS = [ord(c) for c in "0123456789+-.eE \t"] + [0]
+# Characters that make a number a float rather than an integer
+_FLOAT_MARKS = [ord(c) for c in ".eE"]
+
+
+def _parse_numbers(values: np.ndarray):
+    try:
+        return values.astype(np.float64), np.ones(len(values), dtype=bool)
+    except ValueError:
+        pass
+    # Mixed column; parse cell by cell
+    numbers = np.full(len(values), np.nan)
+    numeric = np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values.tolist()):
+        try:
+            numbers[i] = float(value)
+            numeric[i] = True
+        except ValueError:
+            pass
+    return numbers, numeric
+
+
+def _blank(values: np.ndarray, codes: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    blank = np.isin(codes, _BLANK).all(axis=1)
+    # Only a cell's first CLASSIFY_WIDTH code points are in `codes`
+    for i in np.flatnonzero(blank & (lengths > codes.shape[1])).tolist():
+        blank[i] = not values[i].strip(_BLANK_CHARS)
+    return blank
+
+
+def _classify(values: np.ndarray, codes: np.ndarray, lengths: np.ndarray, keys: np.ndarray):
+    """Split non-null cells into type masks and parse the numeric ones."""
+    numbers = np.full(len(values), np.nan)
+    numeric = np.zeros(len(values), dtype=bool)
+    # Only cells made of number characters can parse as numbers (this also
+    # keeps "nan" and "inf" strings out of the numeric statistics)
+    candidates = np.flatnonzero(np.isin(codes, _NUMBER_CHARS).all(axis=1) & (lengths <= codes.shape[1]))
+    if len(candidates):
+        numbers[candidates], numeric[candidates] = _parse_numbers(values[candidates])
+    integer = numeric & ~np.isin(codes, _FLOAT_MARKS).any(axis=1)
+    boolean = ~numeric & np.isin(keys, _BOOL_KEYS)
+    return {
+        "integer": integer,
+        "float": numeric & ~integer,
+        "boolean": boolean,
+        "string": ~numeric & ~boolean,
+    }, numbers, numeric
+
+
+class ColumnProfile:
+    def __init__(self):
+        self.rows = 0
+        self.nulls = 0
+        self.types = dict.fromkeys(TYPES, 0)
+        self.distinct = DistinctCounter()
+        self.frequent = FrequentValues()
+        self.digest = TDigest()
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, values: np.ndarray, codes: np.ndarray, lengths: np.ndarray, hashes: np.ndarray):
+        """
+        Add a batch of cells: `values` as an object array of str, `codes`
+        their leading code points (see `codepoints`), `lengths` their
+        lengths in code points and `hashes` their hashes.
+        """
+        self.rows += len(values)
+        keys = _short_keys(codes)
+        present = ~(np.isin(keys, _NULL_KEYS) | _blank(values, codes, lengths))
+        self.nulls += int(len(values) - np.count_nonzero(present))
+        values, codes, lengths, keys, hashes = (values[present], codes[present], lengths[present], keys[present],
+                                                hashes[present])
+        if not len(values):
+            return
+        masks, numbers, numeric = _classify(values, codes, lengths, keys)
+        for name, mask in masks.items():
+            self.types[name] += int(np.count_nonzero(mask))
+        self.distinct.add_hashes(hashes)
+        self.frequent.add(values, hashes)
+        numbers = numbers[numeric]
+        if len(numbers):
+            mean = float(numbers.mean())
+            self._add_moments(len(numbers), mean, float(((numbers - mean) ** 2).sum()))
+            self.digest.add(numbers)
+
+    def _add_moments(self, n: int, mean: float, m2: float):
+        # Chan et al. parallel update of count, mean and sum of squared deviations
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    def merge(self, other: "ColumnProfile"):
+        self.rows += other.rows
+        self.nulls += other.nulls
+        for name, count in other.types.items():
+            self.types[name] += count
+        self.distinct.merge(other.distinct)
+        self.frequent.merge(other.frequent)
+        self.digest.merge(other.digest)
+        if other.count:
+            self._add_moments(other.count, other.mean, other.m2)
+
+    def result(self) -> dict:
+        present = self.rows - self.nulls
+        dominant = max(self.types, key=self.types.get)
+        profile = {
+            "nulls": self.nulls,
+            "null_ratio": round(self.nulls / self.rows, 6) if self.rows else 0.0,
+            "dominant_type": dominant if present else None,
+            "type_consistency": round(self.types[dominant] / present, 6) if present else 1.0,
+            "type_counts": self.types,
+            "cardinality": self.distinct.count(),
+            "cardinality_exact": self.distinct.is_exact,
+            "top_values": [{"value": v, "count": c} for v, c in self.frequent.top()],
+        }
+        if self.count:
+            profile["numeric"] = {
+                "count": self.count,
+                "mean": self.mean,
+                "std": (self.m2 / self.count) ** 0.5,
+                "min": self.digest.min,
+                "max": self.digest.max,
+                "quantiles": dict(zip((f"p{int(q * 100)}" for q in QUANTILES), self.digest.quantiles(QUANTILES))),
+            }
+        return profile
+
+
+class TableProfiler:
+    """
+    Profile of a table, built from row batches or by merging the profiles
+    of its parts (e.g. one per file). Merging never re-reads data.
+    """
+
+    def __init__(self):
+        self.columns: Dict[str, ColumnProfile] = {}
+        self.rows = 0
+        self.malformed_rows = 0
+        self.distinct_rows = DistinctCounter(exact_limit=1_000_000)
+
+    def add_batch(self, columns: Dict[Optional[str], List[str]]):
+        self.malformed_rows += len(columns.pop(None, ()))
+        if not columns:
+            return
+        n = len(next(iter(columns.values())))
+        hashes = []
+        for name in sorted(columns):
+            cells = columns[name]
+            # Object arrays, not fixed-width ones: one long cell mustn't widen every row
+            values = np.empty(n, dtype=object)
+            values[:] = cells
+            lengths = np.fromiter(map(len, cells), dtype=np.int64, count=n)
+            column_hashes = hash_strings(cells)
+            # Bind the column name so equal values in different columns differ
+            hashes.append(column_hashes ^ hash_strings([name])[0])
+            self._column(name).add(values, codepoints(cells, CLASSIFY_WIDTH), lengths, column_hashes)
+        self._pad_missing(columns, n)
+        self.rows += n
+        self.distinct_rows.add_hashes(combine_hashes(hashes))
+
+    def merge(self, other: "TableProfiler"):
+        for name, profile in other.columns.items():
+            self._column(name).merge(profile)
+        self._pad_missing(other.columns, other.rows)
+        self.rows += other.rows
+        self.malformed_rows += other.malformed_rows
+        self.distinct_rows.merge(other.distinct_rows)
+
+    @classmethod
+    def merged(cls, profiles: Iterable["TableProfiler"]) -> "TableProfiler":
+        result = cls()
+        for profile in profiles:
+            result.merge(profile)
+        return result
+
+    def _column(self, name: str) -> ColumnProfile:
+        profile = self.columns.get(name)
+        if profile is None:
+            profile = self.columns[name] = ColumnProfile()
+            # Rows seen before this column appeared count as nulls
+            profile.rows = profile.nulls = self.rows
+        return profile
+
+    def _pad_missing(self, present, n: int):
+        for name, profile in self.columns.items():
+            if name not in present:
+                profile.rows += n
+                profile.nulls += n
+
+    def compact(self, exact_limit: int = 1000):
+        """Shrink exact distinct-value sets before keeping the profile around."""
+        self.distinct_rows.compact(exact_limit)
+        for profile in self.columns.values():
+            profile.distinct.compact(exact_limit)
+
+    def result(self) -> dict:
+        distinct = min(self.distinct_rows.count(), self.rows)
+        return {
+            "rows": self.rows,
+            "malformed_rows": self.malformed_rows,
+            "distinct_rows": distinct,
+            "distinct_rows_exact": self.distinct_rows.is_exact,
+            "duplicate_row_rate": round(1 - distinct / self.rows, 6) if self.rows else 0.0,
+            "columns": {name: profile.result() for name, profile in sorted(self.columns.items())},
+        }
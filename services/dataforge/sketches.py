@@ -0,0 +1,279 @@
+"""
+Vectorized hashing and mergeable sketches for dataset profiling:
+HyperLogLog for cardinality, t-digest for quantiles and count-min for
+heavy hitters. Sketches of two parts of a dataset merge into the sketch
+of the whole, which is how version statistics are built incrementally.
+
+Values are hashed a whole column batch at a time with NumPy: strings are
+UTF-8 encoded back to back, each padded to whole 8-byte words, and folded
+one word per step through a splitmix64 mixer. Memory and time are linear
+in the batch's total length, however long its longest value. The hash of
+a value is the same across processes and runs (unlike Python's built-in
+hash), so sketches built at different times can be merged.
+"""
+
+import math
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MUL1 = np.uint64(0xBF58476D1CE4E5B9)
+_MUL2 = np.uint64(0x94D049BB133111EB)
+
+
+def mix64(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer over a uint64 array."""
+    with np.errstate(over="ignore"):
+        x = x + _GOLDEN
+        x = (x ^ (x >> np.uint64(30))) * _MUL1
+        x = (x ^ (x >> np.uint64(27))) * _MUL2
+        return x ^ (x >> np.uint64(31))
+
+
+def codepoints(values, max_width: Optional[int] = None) -> np.ndarray:
+    """
+    Strings as an (n, width) matrix of UTF-32 code points, zero padded;
+    with `max_width`, only each string's first `max_width` code points.
+    This is a view of NumPy's own string storage, so it costs no copy.
+    """
+    if max_width is not None:
+        # Bounds the matrix, which is as wide as its longest row
+        values = [value[:max_width] for value in values]
+    array = np.asarray(values, dtype=str)
+    width = max(array.dtype.itemsize // 4, 1)
+    if array.dtype.itemsize == 0:
+        array = array.astype("U1")
+    return array.view(np.uint32).reshape(len(array), width)
+
+
+def hash_strings(values: Sequence[str]) -> np.ndarray:
+    """64-bit hashes of a sequence of strings."""
+    encoded = "".join(values).encode("utf-8", "surrogatepass")
+    lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+    if len(encoded) != lengths.sum():
+        # Not all ASCII, so byte lengths differ from string lengths
+        lengths = np.fromiter((len(value.encode("utf-8", "surrogatepass")) for value in values),
+                              dtype=np.int64, count=len(values))
+    words = -(-lengths // 8)
+    # Scatter each value's bytes to the start of its own words
+    shift = np.repeat(np.cumsum(words * 8 - lengths) - (words * 8 - lengths), lengths)
+    padded = np.zeros(int(words.sum()) * 8, dtype=np.uint8)
+    padded[np.arange(len(encoded)) + shift] = np.frombuffer(encoded, dtype=np.uint8)
+    packed = padded.view("<u8")
+    h = mix64(lengths.astype(np.uint64))
+    if not len(packed):
+        return h
+    # Longest first, so the values that still have a word i are a prefix
+    order = np.argsort(-words, kind="stable")
+    remaining = -words[order]
+    starts = (np.cumsum(words) - words)[order]
+    folded = h[order]
+    for i in range(int(-remaining[0])):
+        active = int(np.searchsorted(remaining, -i, side="left"))
+        folded[:active] = mix64(folded[:active] ^ packed[starts[:active] + i])
+    h[order] = folded
+    return h
+
+
+def combine_hashes(hashes: Iterable[np.ndarray]) -> np.ndarray:
+    """Order-sensitive combination of equal-length hash arrays (e.g. a row's columns)."""
+    result = None
+    for h in hashes:
+        result = h.copy() if result is None else mix64(result ^ h)
+    return result
+
+
+class HyperLogLog:
+    """Cardinality estimate in 2**p bytes; ~1.04 / sqrt(2**p) relative error."""
+
+    def __init__(self, p: int = 14):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray):
+        if not len(hashes):
+            return
+        p = np.uint64(self.p)
+        index = (hashes >> (np.uint64(64) - p)).astype(np.intp)
+        # Rank = leading zeros of the remaining bits + 1; the sentinel bit
+        # caps it at 64 - p + 1 when the remaining bits are all zero
+        rest = (hashes << p) | (np.uint64(1) << (p - np.uint64(1)))
+        _, exponent = np.frexp(rest.astype(np.float64))
+        rank = (65 - exponent).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog"):
+        if other.p != self.p:
+            raise ValueError("Cannot merge HyperLogLogs of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate at small cardinalities
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+
+class DistinctCounter:
+    """Exact distinct count up to `exact_limit` values, HyperLogLog beyond."""
+
+    def __init__(self, exact_limit: int = 100_000, p: int = 14):
+        self.exact_limit = exact_limit
+        self.exact = set()
+        self.hll = HyperLogLog(p)
+
+    @property
+    def is_exact(self) -> bool:
+        return self.exact is not None
+
+    def add_hashes(self, hashes: np.ndarray):
+        self.hll.add_hashes(hashes)
+        if self.exact is not None:
+            self.exact.update(hashes.tolist())
+            if len(self.exact) > self.exact_limit:
+                self.exact = None
+
+    def merge(self, other: "DistinctCounter"):
+        self.hll.merge(other.hll)
+        if self.exact is not None and other.exact is not None:
+            self.exact |= other.exact
+            if len(self.exact) > self.exact_limit:
+                self.exact = None
+        else:
+            self.exact = None
+
+    def compact(self, exact_limit: int):
+        """Lower the exact limit, e.g. before keeping the counter long term."""
+        self.exact_limit = min(self.exact_limit, exact_limit)
+        if self.exact is not None and len(self.exact) > self.exact_limit:
+            self.exact = None
+
+    def count(self) -> int:
+        return len(self.exact) if self.exact is not None else self.hll.estimate()
+
+
+class TDigest:
+    """
+    Mergeable quantile sketch: weighted centroids that are small near the
+    tails and larger in the middle, so extreme quantiles stay accurate.
+    Compression is vectorized: points are binned by the arcsine scale
+    function of their cumulative weight and each bin becomes one centroid.
+    """
+
+    def __init__(self, delta: int = 200):
+        self.delta = delta
+        self.means = np.empty(0, dtype=np.float64)
+        self.weights = np.empty(0, dtype=np.float64)
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def add(self, values: np.ndarray):
+        if not len(values):
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(np.concatenate([self.means, values]),
+                       np.concatenate([self.weights, np.ones(len(values))]))
+
+    def merge(self, other: "TDigest"):
+        if not len(other.means):
+            return
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(np.concatenate([self.means, other.means]),
+                       np.concatenate([self.weights, other.weights]))
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray):
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        left = (cumulative - weights) / cumulative[-1]
+        k = self.delta / (2 * math.pi) * np.arcsin(2 * left - 1)
+        bins = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantiles(self, qs) -> list:
+        if not len(self.means):
+            return [None] * len(qs)
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        xs = np.concatenate([[0.0], centers, [total]])
+        ys = np.concatenate([[self.min], self.means, [self.max]])
+        return [float(v) for v in np.interp(np.asarray(qs) * total, xs, ys)]
+
+
+class CountMinSketch:
+    """Frequency estimates for hashed values; never under-counts."""
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def _indexes(self, hashes: np.ndarray):
+        for row in range(len(self.table)):
+            yield row, (mix64(hashes ^ np.uint64(row + 1)) % np.uint64(self.width)).astype(np.intp)
+
+    def add(self, hashes: np.ndarray, counts: np.ndarray):
+        for row, index in self._indexes(hashes):
+            self.table[row] += np.bincount(index, weights=counts, minlength=self.width).astype(np.int64)
+
+    def estimate(self, hashes: np.ndarray) -> np.ndarray:
+        return np.min([self.table[row, index] for row, index in self._indexes(hashes)], axis=0)
+
+    def merge(self, other: "CountMinSketch"):
+        self.table += other.table
+
+
+class FrequentValues:
+    """Heavy hitters: a count-min sketch plus the k values it ranks highest."""
+
+    def __init__(self, k: int = 20):
+        self.k = k
+        self.counts = CountMinSketch()
+        self.candidates = {}  # value -> hash
+
+    def add(self, values: np.ndarray, hashes: np.ndarray):
+        if not len(values):
+            return
+        uniques, first, counts = np.unique(hashes, return_index=True, return_counts=True)
+        self.counts.add(uniques, counts)
+        # Only the batch's own top k can newly enter the overall top k
+        if len(uniques) > self.k:
+            top = np.argpartition(counts, len(counts) - self.k)[-self.k:]
+            uniques, first = uniques[top], first[top]
+        self.candidates.update(zip(values[first].tolist(), uniques.tolist()))
+        self._prune()
+
+    def merge(self, other: "FrequentValues"):
+        self.counts.merge(other.counts)
+        self.candidates.update(other.candidates)
+        self._prune()
+
+    def _prune(self):
+        if len(self.candidates) > self.k:
+            self.candidates = dict(self.top(self.k, with_hashes=True))
+
+    def top(self, n: int = 10, with_hashes: bool = False) -> list:
+        if not self.candidates:
+            return []
+        values = list(self.candidates)
+        hashes = np.fromiter(self.candidates.values(), dtype=np.uint64, count=len(values))
+        estimates = self.counts.estimate(hashes)
+        order = np.argsort(-estimates, kind="stable")[:n]
+        if with_hashes:
+            return [(values[i], int(hashes[i])) for i in order]
+        # Estimates within the sketch's error bound (e/width of the total)
+        # can't be told apart from noise
+        noise = self.counts.table[0].sum() * math.e / self.counts.width
+        return [(values[i], int(estimates[i])) for i in order if estimates[i] > noise]
@@ -0,0 +1,285 @@
+"""
+Durable catalog storage for DataForge: a write-ahead log plus snapshots.
+
+The in-memory dicts in main.py stay the hot copy of the catalog; every
+change to them is also appended to the log as a JSON record, and the
+request that made it returns only once its record is on disk. Writers
+don't fsync themselves: a single log thread writes whatever records
+have queued up since its last flush and fsyncs once for all of them
+(group commit), waiting up to WAL_GROUP_COMMIT_MS for more to arrive
+first. A burst of label inserts costs a handful of fsyncs, not one each.
+
+Every SNAPSHOT_EVERY_RECORDS records the whole catalog is written to
+snapshot.json, tagged with the last log record it includes, and log
+segments entirely before it are deleted. Startup loads the snapshot and
+replays only the log after it. A record torn by a crash mid-write fails
+its checksum and ends the replay there.
+
+The state directory is locked by one process. Run a single DataForge
+worker per directory; a second one fails at startup rather than writing
+a divergent log.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Callable, Iterator, List, Optional, Tuple
+
+WAL_GROUP_COMMIT_MS = float(os.getenv("WAL_GROUP_COMMIT_MS", 2))
+WAL_SEGMENT_BYTES = int(os.getenv("WAL_SEGMENT_BYTES", 64 * 1024 * 1024))
+SNAPSHOT_EVERY_RECORDS = int(os.getenv("SNAPSHOT_EVERY_RECORDS", 100_000))
+
+
+class StorageLockedError(RuntimeError):
+    pass
+
+
+def _payload(record: dict) -> Tuple[bytes, int]:
+    payload = json.dumps(record, separators=(",", ":")).encode()
+    return payload, zlib.crc32(payload)
+
+
+def _line(lsn: int, payload: bytes, checksum: int) -> bytes:
+    return b"%d\t%08x\t%s\n" % (lsn, checksum, payload)
+
+
+def _decode(line: bytes) -> Optional[Tuple[int, dict]]:
+    """(lsn, record), or None for a line that is torn or corrupt."""
+    try:
+        lsn, checksum, payload = line.rstrip(b"\n").split(b"\t", 2)
+        if not line.endswith(b"\n") or int(checksum, 16) != zlib.crc32(payload):
+            return None
+        return int(lsn), json.loads(payload)
+    except ValueError:
+        return None
+
+
+class WriteAheadLog:
+    """Append-only log in numbered segment files (wal-<first lsn>.log)."""
+
+    def __init__(self, directory: str, group_commit_ms: float = WAL_GROUP_COMMIT_MS,
+                 segment_bytes: int = WAL_SEGMENT_BYTES, fsync: bool = True):
+        self.directory = directory
+        self.group_commit = group_commit_ms / 1000
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.last_lsn = 0  # last record appended
+        self.durable_lsn = 0  # last record on disk
+        self.commits = 0
+        self._pending: List[bytes] = []
+        self._segment = None
+        self._rotate = False
+        self._closed = False
+        self._lock = threading.Lock()
+        self._queued = threading.Condition(self._lock)
+        self._flushed = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+
+    def segments(self) -> List[Tuple[int, str]]:
+        names = [n for n in os.listdir(self.directory) if n.startswith("wal-") and n.endswith(".log")]
+        return sorted((int(n[4:-4]), os.path.join(self.directory, n)) for n in names)
+
+    def replay(self, after_lsn: int) -> Iterator[Tuple[int, dict]]:
+        """Records after `after_lsn`, in order, stopping at a torn tail."""
+        segments = self.segments()
+        for i, (_, path) in enumerate(segments):
+            offset = 0
+            with open(path, "rb") as f:
+                for line in f:
+                    decoded = _decode(line)
+                    if decoded is None:
+                        if i != len(segments) - 1:
+                            raise ValueError(f"Corrupt record in {path} at byte {offset}")
+                        # A write the crash cut short; drop it so the log stays well formed
+                        f.close()
+                        os.truncate(path, offset)
+                        break
+                    offset += len(line)
+                    lsn, record = decoded
+                    self.last_lsn = self.durable_lsn = lsn
+                    if lsn > after_lsn:
+                        yield lsn, record
+        self.last_lsn = self.durable_lsn = max(self.last_lsn, after_lsn)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="wal-writer", daemon=True)
+        self._thread.start()
+
+    def append(self, record: dict) -> int:
+        """Queue a record; returns its lsn. Call `wait` before acknowledging the change."""
+        # Encode before taking the lock; only numbering is serialized
+        payload, checksum = _payload(record)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Write-ahead log is closed")
+            self.last_lsn += 1
+            self._pending.append(_line(self.last_lsn, payload, checksum))
+            self._queued.notify()
+            return self.last_lsn
+
+    def wait(self, lsn: int):
+        with self._lock:
+            while self.durable_lsn < lsn:
+                if self._closed and not self._pending:
+                    raise RuntimeError("Write-ahead log closed before the record was written")
+                self._flushed.wait()
+
+    def rotate(self):
+        """Start a new segment with the next record, so older ones can be dropped."""
+        with self._lock:
+            self._rotate = True
+
+    def drop_before(self, lsn: int):
+        """Delete segments holding only records at or before `lsn`."""
+        segments = self.segments()
+        for (_, path), (next_first, _) in zip(segments, segments[1:]):
+            if next_first <= lsn + 1:
+                os.remove(path)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._queued.notify()
+        if self._thread is not None:
+            self._thread.join()
+        if self._segment is not None:
+            self._segment.close()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._queued.wait()
+                if not self._pending:
+                    return
+            if self.group_commit:
+                # Let writers that are about to append join this commit
+                time.sleep(self.group_commit)
+            with self._lock:
+                batch, self._pending = self._pending, []
+                lsn = self.last_lsn
+                rotate, self._rotate = self._rotate, False
+            self._write(batch, lsn - len(batch) + 1, rotate)
+            with self._lock:
+                self.durable_lsn = lsn
+                self.commits += 1
+                self._flushed.notify_all()
+
+    def _write(self, batch: List[bytes], first_lsn: int, rotate: bool):
+        if self._segment is None or rotate or self._segment.tell() >= self.segment_bytes:
+            if self._segment is not None:
+                self._segment.close()
+            self._segment = open(os.path.join(self.directory, f"wal-{first_lsn:020d}.log"), "ab")
+        self._segment.write(b"".join(batch))
+        self._segment.flush()
+        if self.fsync:
+            os.fsync(self._segment.fileno())
+
+
+class Storage:
+    """A state directory: its lock, its log and its latest snapshot."""
+
+    def __init__(self, directory: str, group_commit_ms: float = WAL_GROUP_COMMIT_MS,
+                 snapshot_every: int = SNAPSHOT_EVERY_RECORDS, fsync: bool = True):
+        self.directory = os.path.abspath(directory)
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = open(os.path.join(self.directory, "LOCK"), "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise StorageLockedError(f"{self.directory} is in use by another DataForge process")
+        self.wal = WriteAheadLog(self.directory, group_commit_ms, fsync=fsync)
+        self.snapshot_lsn = 0
+        self._capture: Optional[Callable[[], Tuple[int, Callable[[], dict]]]] = None
+        self._snapshotting = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "Storage":
+        return cls(
+            os.getenv("DATAFORGE_STATE_DIR", "./data/dataforge"),
+            group_commit_ms=WAL_GROUP_COMMIT_MS,
+            snapshot_every=SNAPSHOT_EVERY_RECORDS,
+            fsync=os.getenv("WAL_FSYNC", "true").lower() != "false",
+        )
+
+    @property
+    def last_lsn(self) -> int:
+        return self.wal.last_lsn
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.directory, "snapshot.json")
+
+    def recover(self, load: Callable[[dict], None], apply: Callable[[dict], None]) -> int:
+        """Load the snapshot and replay the log after it; returns the records replayed."""
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+            self.snapshot_lsn = snapshot["lsn"]
+            load(snapshot["state"])
+        replayed = 0
+        for _, record in self.wal.replay(self.snapshot_lsn):
+            apply(record)
+            replayed += 1
+        return replayed
+
+    def start(self, capture: Callable[[], Tuple[int, Callable[[], dict]]]):
+        """
+        Start logging. `capture()` is called to take a snapshot: it returns
+        the lsn the state reflects (read while changes are held off) and a
+        function producing the state, which runs without the caller's locks.
+        """
+        self._capture = capture
+        self.wal.start()
+
+    def append(self, record: dict) -> int:
+        lsn = self.wal.append(record)
+        if lsn - self.snapshot_lsn >= self.snapshot_every and not self._snapshotting.locked():
+            threading.Thread(target=self.snapshot, name="snapshot", daemon=True).start()
+        return lsn
+
+    def wait(self, lsn: int):
+        self.wal.wait(lsn)
+
+    def log(self, record: dict):
+        """Append a record and wait until it is durable."""
+        self.wait(self.append(record))
+
+    def snapshot(self):
+        if self._capture is None or not self._snapshotting.acquire(blocking=False):
+            return
+        try:
+            self.wal.rotate()
+            lsn, build = self._capture()
+            if lsn <= self.snapshot_lsn:
+                return
+            # Everything the snapshot covers must be durable before the log
+            # segments holding it are dropped
+            self.wal.wait(lsn)
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"lsn": lsn, "state": build()}, f, separators=(",", ":"))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            self.snapshot_lsn = lsn
+            self.wal.drop_before(lsn)
+        finally:
+            self._snapshotting.release()
+
+    def close(self, snapshot: bool = True):
+        if snapshot:
+            self.snapshot()
+        self.wal.close()
+        if self.wal.last_lsn <= self.snapshot_lsn:
+            # The snapshot covers the whole log; start the next run from it alone
+            for _, path in self.wal.segments():
+                os.remove(path)
+        self._lock_file.close()
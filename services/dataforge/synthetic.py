@@ -0,0 +1,244 @@
+"""
+Synthetic data generation jobs.
+
+Jobs run on the API's event loop, at most SYNTHETIC_MAX_JOBS at a time;
+extra jobs wait in the queued state. Each job generates samples in batches
+of SYNTHETIC_BATCH_SIZE and streams every batch, as JSON Lines, straight
+into the chunk store. Only one batch is in memory at a time however many
+samples are requested. When the last batch is written the output becomes
+a file in the dataset (synthetic/<job_id>.jsonl).
+
+Methods:
+- augmentation: CPU-bound. Resamples rows of the dataset's tabular files
+  and jitters numeric columns. Batches run in a process pool of
+  SYNTHETIC_WORKERS processes.
+- llm: I/O-bound. One completion per sample against the local LLM stub,
+  with at most SYNTHETIC_LLM_CONCURRENCY requests in flight across all
+  jobs.
+
+Job records are written to SYNTHETIC_JOB_DIR (from the threadpool, never
+on the event loop) on every state change and reloaded at startup; jobs
+that were still queued or running when the service stopped come back as
+"interrupted". Once a job's output is complete and being added to the
+dataset it can no longer be cancelled.
+"""
+
+import asyncio
+import json
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import numpy as np
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from chunkstore import ChunkStore
+from uploads import ingest
+
+METHODS = ("augmentation", "llm")
+FINISHED = ("completed", "failed", "cancelled", "interrupted")
+
+LLM_STUB_LATENCY = float(os.getenv("LLM_STUB_LATENCY_SECONDS", 0.05))
+
+
+class SyntheticJob(BaseModel):
+    id: str
+    dataset_id: str
+    method: str
+    num_samples: int
+    parameters: Dict[str, Any] = {}
+    status: str = "queued"  # queued, running, completed, failed, cancelled, interrupted
+    samples_generated: int = 0
+    bytes_written: int = 0
+    progress: float = 0.0
+    output_path: Optional[str] = None
+    file_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+
+def augment_batch(columns: Dict[str, List[str]], n: int, noise: float, seed: int) -> bytes:
+    """
+    Draw `n` rows (with replacement) from the source columns and add
+    Gaussian noise of `noise` standard deviations to the numeric ones.
+    Returns the rows as JSON Lines. Runs in a worker process.
+    """
+    rng = np.random.default_rng(seed)
+    size = len(next(iter(columns.values())))
+    rows = rng.integers(0, size, n)
+    generated = {}
+    for name, values in columns.items():
+        array = np.asarray(values, dtype=str)
+        try:
+            numbers = array.astype(np.float64)
+        except ValueError:
+            generated[name] = array[rows].tolist()
+            continue
+        jittered = numbers[rows] + rng.normal(0.0, noise * numbers.std(), n)
+        if np.array_equal(numbers, np.round(numbers)):
+            generated[name] = np.round(jittered).astype(np.int64).tolist()
+        else:
+            generated[name] = np.round(jittered, 6).tolist()
+    names = list(generated)
+    lines = (json.dumps(dict(zip(names, row))) for row in zip(*generated.values()))
+    return ("\n".join(lines) + "\n").encode()
+
+
+async def stub_complete(prompt: str, index: int) -> str:
+    """Local stand-in for an LLM completion call."""
+    await asyncio.sleep(LLM_STUB_LATENCY)
+    return f"Synthetic sample {index} for: {prompt}"
+
+
+class SyntheticJobRunner:
+    def __init__(self, store: ChunkStore, state_dir: str, max_jobs: int = 2, workers: int = 2,
+                 llm_concurrency: int = 32, batch_size: int = 1000):
+        self.store = store
+        self.state_dir = state_dir
+        self.workers = workers
+        self.batch_size = batch_size
+        self.jobs: Dict[str, SyntheticJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._slots = asyncio.Semaphore(max_jobs)
+        self._llm_slots = asyncio.Semaphore(llm_concurrency)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        os.makedirs(state_dir, exist_ok=True)
+        self._load()
+
+    @classmethod
+    def from_env(cls, store: ChunkStore) -> "SyntheticJobRunner":
+        return cls(
+            store,
+            state_dir=os.getenv("SYNTHETIC_JOB_DIR", "./data/jobs"),
+            max_jobs=int(os.getenv("SYNTHETIC_MAX_JOBS", 2)),
+            workers=int(os.getenv("SYNTHETIC_WORKERS", 2)),
+            llm_concurrency=int(os.getenv("SYNTHETIC_LLM_CONCURRENCY", 32)),
+            batch_size=int(os.getenv("SYNTHETIC_BATCH_SIZE", 1000)),
+        )
+
+    def _load(self):
+        for name in os.listdir(self.state_dir):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(self.state_dir, name)) as f:
+                job = SyntheticJob.model_validate_json(f.read())
+            if job.status not in FINISHED:
+                job.status = "interrupted"
+                self._write(job.id, job.model_dump_json())
+            self.jobs[job.id] = job
+
+    def _write(self, job_id: str, record: str):
+        path = os.path.join(self.state_dir, f"{job_id}.json")
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(record)
+        os.replace(tmp_path, path)
+
+    async def _save(self, job: SyntheticJob):
+        # Serialize on the loop, where the job is updated; write in a thread
+        await run_in_threadpool(self._write, job.id, job.model_dump_json())
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def submit(self, job: SyntheticJob, load_source: Callable[[], Dict[str, List[str]]],
+               finish: Callable[[SyntheticJob, int, List[str]], Any]):
+        """
+        Start a job on the running event loop. `load_source` returns the seed
+        columns for augmentation (called in a thread when the job starts);
+        `finish(job, size, chunks)` turns the written chunks into a dataset
+        file and returns it.
+        """
+        self._loop = asyncio.get_running_loop()
+        self.jobs[job.id] = job
+        self._tasks[job.id] = self._loop.create_task(self._run(job, load_source, finish))
+
+    def cancel(self, job_id: str) -> Optional[asyncio.Task]:
+        """
+        Cancel a queued or running job; returns its task, or None if it
+        already finished or is adding its output to the dataset. Safe to
+        call from any thread.
+        """
+        task = self._tasks.get(job_id)
+        if task is not None:
+            self._loop.call_soon_threadsafe(task.cancel)
+        return task
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    async def _run(self, job: SyntheticJob, load_source, finish):
+        try:
+            await self._save(job)
+            async with self._slots:
+                job.status = "running"
+                job.started_at = datetime.utcnow()
+                await self._save(job)
+                size, chunks = await ingest(self.store, self._generate(job, load_source))
+                # The output is complete; from here on the job finishes rather than cancels
+                self._tasks.pop(job.id, None)
+                finishing = asyncio.ensure_future(run_in_threadpool(finish, job, size, chunks))
+                try:
+                    dataset_file = await asyncio.shield(finishing)
+                except asyncio.CancelledError:
+                    # A cancel that raced the line above; the file is being added regardless
+                    asyncio.current_task().uncancel()
+                    dataset_file = await finishing
+                job.file_id = dataset_file.id
+                job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(getattr(e, "detail", None) or e)
+        finally:
+            job.completed_at = datetime.utcnow()
+            self._tasks.pop(job.id, None)
+            await self._save(job)
+
+    async def _generate(self, job: SyntheticJob, load_source) -> AsyncIterator[bytes]:
+        if job.method == "augmentation":
+            batches = self._augment(job, await run_in_threadpool(load_source))
+        else:
+            batches = self._complete(job)
+        async for data, count in batches:
+            job.samples_generated += count
+            job.bytes_written += len(data)
+            job.progress = round(job.samples_generated / job.num_samples, 4)
+            await self._save(job)
+            yield data
+
+    def _batches(self, job: SyntheticJob):
+        for start in range(0, job.num_samples, self.batch_size):
+            yield start, min(self.batch_size, job.num_samples - start)
+
+    async def _augment(self, job: SyntheticJob, columns: Dict[str, List[str]]):
+        if not columns:
+            raise ValueError("Augmentation needs a CSV/TSV/JSON Lines file in the dataset to draw from")
+        noise = float(job.parameters.get("noise", 0.05))
+        seed = int(job.parameters.get("seed", 0))
+        loop = asyncio.get_running_loop()
+        for start, n in self._batches(job):
+            data = await loop.run_in_executor(self._process_pool(), augment_batch, columns, n, noise, seed + start)
+            yield data, n
+
+    async def _complete(self, job: SyntheticJob):
+        prompt = job.parameters.get("prompt", f"a sample for dataset {job.dataset_id}")
+
+        async def one(index: int) -> bytes:
+            async with self._llm_slots:
+                text = await stub_complete(prompt, index)
+            return json.dumps({"prompt": prompt, "text": text}).encode() + b"\n"
+
+        for start, n in self._batches(job):
+            lines = await asyncio.gather(*(one(i) for i in range(start, start + n)))
+            yield b"".join(lines), n
@@ -0,0 +1,22 @@
+"""Chunk store recovery: chunks the catalog never logged are found and reclaimed."""
+
+from blobstore import LocalBlobStore
+from chunkstore import ChunkStore
+
+
+def test_reconcile_registers_unknown_blobs_as_orphans(tmp_path):
+    blobs = LocalBlobStore(str(tmp_path))
+    before = ChunkStore(blobs)
+    kept, _ = before.put(b"referenced by a file")
+    pending, _ = before.put(b"uploaded, never committed", ref=False)
+
+    # A restart: only the file's chunks are restored from the catalog
+    after = ChunkStore(blobs)
+    after.restore([kept], {kept: 20})
+    assert after.reconcile() == 1
+    assert after.stats()["orphaned_chunks"] == 1
+    # Found orphans get a fresh grace period
+    assert after.collect() == 0
+    assert after.collect(grace=0) == 1
+    assert [key for key, _ in blobs.list("chunks/")] == [ChunkStore.key(kept)]
+    assert after.missing([pending]) == [pending]
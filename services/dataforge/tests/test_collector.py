@@ -0,0 +1,31 @@
+"""Tombstone steps listed lazily by the collector, and failed batches logged and skipped."""
+
+import logging
+
+from collector import Collector, Tombstone
+
+
+def test_lazy_steps_are_listed_when_collected_and_failures_logged(caplog):
+    listed, reclaimed = [], []
+
+    def list_labels():
+        listed.append("labels")
+        return ["l1", "l2", "l3"]
+
+    def reclaim_versions(batch):
+        raise RuntimeError("manifest gone")
+
+    tombstone = Tombstone("ds-1")
+    tombstone.add_step("labels", list_labels, reclaimed.extend)
+    tombstone.add_step("versions", ["v1"], reclaim_versions)
+    assert not listed
+    assert tombstone.status()["remaining"] == {"labels": None, "versions": 1}
+
+    collector = Collector(chunks=None, batch_size=2, items_per_second=1e9)
+    with caplog.at_level(logging.ERROR, logger="collector"):
+        collector._collect(tombstone)
+    assert listed == ["labels"]
+    assert sorted(reclaimed) == ["l1", "l2", "l3"]
+    assert tombstone.remaining == 0 and tombstone.reclaimed == 4
+    assert collector.errors == 1
+    assert "Failed to reclaim 1 versions of dataset ds-1" in caplog.text
@@ -0,0 +1,46 @@
+"""Column profiling and value hashing."""
+
+import resource
+
+from profiler import TableProfiler, read_batches
+from sketches import hash_strings
+
+
+def test_hashes_depend_on_content_and_length_only():
+    values = ["", "a", "a\x00", "abcdefgh", "abcdefghi", "é" * 5000, "a"]
+    hashes = hash_strings(values)
+    assert len(set(hashes.tolist())) == 6
+    assert hashes[1] == hashes[6]
+    # A value hashes the same whatever else is in its batch
+    assert [hash_strings([v])[0] for v in values] == hashes.tolist()
+
+
+def test_long_cell_does_not_widen_the_batch():
+    n = 50_000
+    text = ["x"] * n
+    text[7] = "y" * 20_000
+    blank = ["NA"] * n
+    blank[5] = " " * 200
+    numbers = [str(i * 0.5) for i in range(n)]
+    numbers[9] = "1" * 100
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    profiler = TableProfiler()
+    profiler.add_batch({"text": text, "blank": blank, "number": numbers})
+    # Padding every row to the 20,000-character cell would take ~4 GB
+    assert resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before < 500 * 1024
+
+    columns = profiler.result()["columns"]
+    assert columns["text"]["cardinality"] == 2
+    assert columns["text"]["type_counts"]["string"] == n
+    assert columns["blank"]["nulls"] == n
+    # Too long to be classified as a number
+    assert columns["number"]["type_counts"] == {"integer": 0, "float": n - 1, "boolean": 0, "string": 1}
+
+
+def test_wide_rows_end_batches_early():
+    data = b"id,text\n" + b"".join(b"%d,%s\n" % (i, b"x" * 10_000) for i in range(100))
+    chunks = [data[i:i + 4096] for i in range(0, len(data), 4096)]
+    batches = list(read_batches("table.csv", chunks, lambda n: None, batch_rows=1000, batch_chars=50_000))
+    assert sum(len(batch["id"]) for batch in batches) == 100
+    assert max(len(batch["id"]) for batch in batches) == 5
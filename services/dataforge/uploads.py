@@ -0,0 +1,85 @@
+"""
+Streaming ingest into the chunk store.
+
+Request bodies are consumed one CAS chunk at a time: each chunk is hashed
+and stored (or found to be stored already) before the next one is read, so
+memory per upload is bounded by the chunk size no matter how large the
+file is.
+"""
+
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from chunkstore import ChunkStore
+
+# Recommended part size for resumable uploads; must be a multiple of the
+# chunk size so parts split into the same chunks as a single upload would
+PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE", 8 * 1024 * 1024))
+
+
+class UploadPart(BaseModel):
+    part_number: int
+    size_bytes: int
+    chunks: List[str]
+
+
+class UploadSession(BaseModel):
+    id: str
+    dataset_id: str
+    filename: str
+    part_size: int
+    chunk_size: int
+    parts: Dict[int, UploadPart] = {}
+    status: str = "in_progress"  # in_progress, completing, completed, aborted
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+
+    def missing_parts(self) -> list:
+        if not self.parts:
+            return []
+        return [n for n in range(1, max(self.parts) + 1) if n not in self.parts]
+
+    def chunk_hashes(self) -> List[str]:
+        return [h for n in sorted(self.parts) for h in self.parts[n].chunks]
+
+
+async def rechunk(source: AsyncIterator[bytes], chunk_size: int) -> AsyncIterator[bytes]:
+    """Re-slice an arbitrary byte stream into `chunk_size` chunks."""
+    buffer = bytearray()
+    async for data in source:
+        buffer += data
+        while len(buffer) >= chunk_size:
+            yield bytes(buffer[:chunk_size])
+            del buffer[:chunk_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+async def upload_file_chunks(file, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def ingest(store: ChunkStore, source: AsyncIterator[bytes]) -> Tuple[int, List[str]]:
+    """
+    Stream `source` into the chunk store, holding a reference to every
+    chunk. Returns (size_bytes, chunk_hashes).
+    """
+    hashes = []
+    size = 0
+    try:
+        async for chunk in rechunk(source, store.chunk_size):
+            chunk_hash, _ = await run_in_threadpool(store.put, chunk)
+            hashes.append(chunk_hash)
+            size += len(chunk)
+    except BaseException:
+        store.decref(hashes)
+        raise
+    return size, hashes
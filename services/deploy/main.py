@@ -6,7 +6,15 @@ from datetime import datetime
 import uuid
 import requests
 
-app = FastAPI(title="AI-DOS Deploy Service", version="1.0.0")
+from aidos_common.cache import ResponseCache, ResponseCacheMiddleware
+from aidos_common.metrics import MetricsMiddleware
+from aidos_common.responses import default_response_class
+
+app = FastAPI(title="AI-DOS Deploy Service", version="1.0.0", default_response_class=default_response_class())
+
+# Deployment list is cached until a deployment is created or stopped
+response_cache = ResponseCache()
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache, routes={"/deploy/list": "deployments"})
 
 # CORS
 app.add_middleware(
@@ -17,6 +25,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware, service="deploy")
+
 # In-memory storage
 deployments = {}
 deployment_metrics = {}
@@ -84,6 +94,7 @@ def create_deployment(request: DeployRequest):
     }
     
     deployments[deployment_id] = deployment
+    response_cache.invalidate("deployments")
     
     # Initialize metrics
     deployment_metrics[deployment_id] = {
@@ -127,6 +138,7 @@ def delete_deployment(deployment_id: str):
     deployment = deployments[deployment_id]
     deployment["status"] = "stopped"
     deployment["stopped_at"] = datetime.utcnow().isoformat()
+    response_cache.invalidate("deployments")
     
     return {
         "message": "Deployment stopped successfully",
@@ -6,7 +6,10 @@ import httpx
 import json
 from datetime import datetime
 
-app = FastAPI(title="Magic Mode", description="AI that builds ML pipelines from natural language")
+from aidos_common.metrics import MetricsMiddleware
+from aidos_common.responses import default_response_class
+
+app = FastAPI(title="Magic Mode", description="AI that builds ML pipelines from natural language", default_response_class=default_response_class())
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,6 +19,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware, service="magic")
+
 class MagicRequest(BaseModel):
     prompt: str
     user_id: str
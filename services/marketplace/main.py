@@ -5,7 +5,15 @@ from typing import List, Optional
 from datetime import datetime
 import hashlib
 
-app = FastAPI(title="AI-DOS Marketplace", description="Buy and sell trained ML models")
+from aidos_common.cache import ResponseCache, ResponseCacheMiddleware
+from aidos_common.metrics import MetricsMiddleware
+from aidos_common.responses import default_response_class
+
+app = FastAPI(title="AI-DOS Marketplace", description="Buy and sell trained ML models", default_response_class=default_response_class())
+
+# Browse results are cached until a listing or its sales count changes
+response_cache = ResponseCache()
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache, routes={"/marketplace/models": "marketplace_models"})
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,6 +23,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware, service="marketplace")
+
 # In-memory storage (replace with database in production)
 models_db = {}
 purchases_db = {}
@@ -76,6 +86,7 @@ async def list_model(listing: ModelListing):
     }
     
     models_db[model_id] = model_data
+    response_cache.invalidate("marketplace_models")
     
     return ModelListingResponse(**model_data)
 
@@ -141,6 +152,7 @@ async def purchase_model(purchase: PurchaseRequest):
     
     # Update sales count
     models_db[purchase.model_id]["sales_count"] += 1
+    response_cache.invalidate("marketplace_models")
     
     return PurchaseResponse(
         purchase_id=purchase_id,
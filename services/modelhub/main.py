@@ -1,13 +1,34 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from enum import Enum
+import asyncio
 import hashlib
 import json
 
-app = FastAPI(title="ModelHub", version="1.0.0")
+from aidos_common.cache import ResponseCache, ResponseCacheMiddleware
+from aidos_common.metrics import MetricsMiddleware
+from aidos_common.responses import default_response_class, fast_json
+
+from metric_ingest import METRIC_BATCH_MAX_BYTES, MetricBuffer, parse_ndjson
+from metric_store import DOWNSAMPLE_METHODS, MetricStore, to_micros
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    flusher = asyncio.create_task(metric_buffer.run())
+    yield
+    flusher.cancel()
+    metric_buffer.flush()
+
+app = FastAPI(title="ModelHub", version="1.0.0", lifespan=lifespan, default_response_class=default_response_class())
+
+# Experiment and model listings are cached until the next write
+response_cache = ResponseCache()
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache, routes={"/experiments": "experiments", "/models": "models"})
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,6 +38,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware, service="modelhub")
+
 # Enums
 class ExperimentStatus(str, Enum):
     CREATED = "created"
@@ -92,10 +115,22 @@ class MetricLog(BaseModel):
 
 # In-memory storage
 experiments_db: Dict[str, Experiment] = {}
-runs_db: Dict[str, List[Run]] = {}
+runs_db: Dict[str, List[Run]] = {}  # experiment id -> runs, in creation order
+runs_index: Dict[str, Run] = {}  # run id -> run
 models_db: Dict[str, Model] = {}
 hyperparameter_jobs_db: Dict[str, HyperparameterJob] = {}
-metric_logs_db: Dict[str, List[MetricLog]] = {}
+# Per-run metric time series, one compressed column per metric name
+metric_store = MetricStore()
+
+def update_latest_metrics(latest: Dict[str, Dict[str, float]]):
+    for run_id, metrics in latest.items():
+        run = runs_index.get(run_id)
+        if run is not None:
+            run.metrics.update(metrics)
+
+# Batched metric logs wait here until the next flush; points for runs that
+# don't exist (or whose experiment was deleted meanwhile) are dropped then
+metric_buffer = MetricBuffer(metric_store, update_latest_metrics, accept=runs_index.__contains__)
 
 # Endpoints
 
@@ -126,6 +161,7 @@ def create_experiment(experiment: Experiment):
     experiment.updated_at = datetime.utcnow()
     experiments_db[experiment.id] = experiment
     runs_db[experiment.id] = []
+    response_cache.invalidate("experiments")
     return experiment
 
 @app.get("/experiments", response_model=List[Experiment])
@@ -150,6 +186,7 @@ def update_experiment(experiment_id: str, experiment: Experiment):
     experiment.id = experiment_id
     experiment.updated_at = datetime.utcnow()
     experiments_db[experiment_id] = experiment
+    response_cache.invalidate("experiments")
     return experiment
 
 @app.delete("/experiments/{experiment_id}")
@@ -157,7 +194,14 @@ def delete_experiment(experiment_id: str):
     if experiment_id not in experiments_db:
         raise HTTPException(status_code=404, detail="Experiment not found")
     del experiments_db[experiment_id]
-    del runs_db[experiment_id]
+    runs = runs_db.pop(experiment_id, [])
+    for run in runs:
+        runs_index.pop(run.id, None)
+    # Waits out a flush that may have accepted these runs, and drops their queued points
+    metric_buffer.flush()
+    for run in runs:
+        metric_store.delete(run.id)
+    response_cache.invalidate("experiments")
     return {"message": "Experiment deleted successfully"}
 
 # Runs
@@ -174,6 +218,7 @@ def create_run(experiment_id: str, run: Run):
     if experiment_id not in runs_db:
         runs_db[experiment_id] = []
     runs_db[experiment_id].append(run)
+    runs_index[run.id] = run
     
     return run
 
@@ -181,51 +226,86 @@ def create_run(experiment_id: str, run: Run):
 def list_runs(experiment_id: str):
     if experiment_id not in experiments_db:
         raise HTTPException(status_code=404, detail="Experiment not found")
-    return runs_db.get(experiment_id, [])
+    metric_buffer.flush()
+    # Runs are validated on creation; skip re-validating the whole list
+    return fast_json(runs_db.get(experiment_id, []))
 
 @app.get("/runs/{run_id}", response_model=Run)
 def get_run(run_id: str):
-    for runs in runs_db.values():
-        for run in runs:
-            if run.id == run_id:
-                return run
-    raise HTTPException(status_code=404, detail="Run not found")
+    metric_buffer.flush()
+    run = runs_index.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return run
 
 @app.put("/runs/{run_id}/complete")
 def complete_run(run_id: str, final_metrics: Dict[str, float]):
-    for runs in runs_db.values():
-        for run in runs:
-            if run.id == run_id:
-                run.status = ExperimentStatus.COMPLETED
-                run.end_time = datetime.utcnow()
-                run.duration_seconds = (run.end_time - run.start_time).total_seconds()
-                run.metrics.update(final_metrics)
-                return run
-    raise HTTPException(status_code=404, detail="Run not found")
+    # Final metrics win over any batched ones still waiting
+    metric_buffer.flush()
+    run = runs_index.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    run.status = ExperimentStatus.COMPLETED
+    run.end_time = datetime.utcnow()
+    run.duration_seconds = (run.end_time - run.start_time).total_seconds()
+    run.metrics.update(final_metrics)
+    return run
 
 @app.post("/runs/{run_id}/log-metrics")
 def log_metrics(run_id: str, metric_log: MetricLog):
+    if run_id not in runs_index:
+        raise HTTPException(status_code=404, detail="Run not found")
     metric_log.run_id = run_id
-    metric_log.timestamp = datetime.utcnow()
+    metric_log.timestamp = datetime.now(timezone.utc)
     
-    if run_id not in metric_logs_db:
-        metric_logs_db[run_id] = []
-    metric_logs_db[run_id].append(metric_log)
-    
-    # Update run metrics
-    for runs in runs_db.values():
-        for run in runs:
-            if run.id == run_id:
-                run.metrics.update(metric_log.metrics)
-                break
+    # Queued with batched logs so both reach the store and the run in log order
+    if metric_buffer.add([(run_id, metric_log.step, to_micros(metric_log.timestamp), metric_log.metrics)]):
+        metric_buffer.flush()
     
     return {"message": "Metrics logged successfully"}
 
+@app.post("/runs/log-metrics", status_code=202)
+async def log_metrics_batch(request: Request):
+    """
+    Log many steps, for any number of runs, in one request: an NDJSON body
+    of {"run_id", "step", "metrics", "timestamp"?} lines. Points are
+    queued and written on the next flush, which drops lines for runs that
+    don't exist; a batch with any invalid line is rejected whole.
+    """
+    too_large = HTTPException(status_code=413, detail=f"Batch exceeds {METRIC_BATCH_MAX_BYTES} bytes")
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > METRIC_BATCH_MAX_BYTES:
+        raise too_large
+    body = bytearray()
+    async for piece in request.stream():
+        body += piece
+        if len(body) > METRIC_BATCH_MAX_BYTES:
+            raise too_large
+    rows, errors = await run_in_threadpool(parse_ndjson, body, datetime.now(timezone.utc))
+    if errors:
+        raise HTTPException(status_code=400, detail={"message": "Invalid metric lines", "errors": errors})
+    if metric_buffer.add(rows):
+        # The flusher is behind; make writers wait rather than let the buffer grow
+        await run_in_threadpool(metric_buffer.flush)
+    return {"accepted": len(rows)}
+
 @app.get("/runs/{run_id}/metrics")
-def get_run_metrics(run_id: str):
-    if run_id not in metric_logs_db:
-        return []
-    return metric_logs_db[run_id]
+def get_run_metrics(run_id: str, names: Optional[List[str]] = Query(None), start_step: Optional[int] = None,
+                    end_step: Optional[int] = None, max_points: Optional[int] = Query(None, ge=3),
+                    downsample: str = "lttb"):
+    """
+    The run's metric series as columns (steps, timestamps in epoch seconds,
+    values), optionally limited to `names` and a step range. With
+    `max_points`, each series is downsampled to at most that many points
+    with LTTB or min/max buckets.
+    """
+    if downsample not in DOWNSAMPLE_METHODS:
+        raise HTTPException(status_code=400, detail=f"downsample must be one of: {', '.join(DOWNSAMPLE_METHODS)}")
+    metric_buffer.flush()
+    return {
+        "run_id": run_id,
+        "metrics": metric_store.query(run_id, names, start_step, end_step, max_points, downsample)
+    }
 
 # Models
 @app.post("/models", response_model=Model)
@@ -233,6 +313,7 @@ def register_model(model: Model):
     model.id = hashlib.md5(f"{model.name}{model.version}{datetime.utcnow()}".encode()).hexdigest()
     model.created_at = datetime.utcnow()
     models_db[model.id] = model
+    response_cache.invalidate("models")
     return model
 
 @app.get("/models", response_model=List[Model])
@@ -264,6 +345,7 @@ def delete_model(model_id: str):
     if model_id not in models_db:
         raise HTTPException(status_code=404, detail="Model not found")
     del models_db[model_id]
+    response_cache.invalidate("models")
     return {"message": "Model deleted successfully"}
 
 # Hyperparameter Optimization
@@ -301,19 +383,18 @@ def complete_hyperparameter_job(job_id: str, best_params: Dict[str, Any], best_s
 # Comparison
 @app.post("/compare-runs")
 def compare_runs(run_ids: List[str]):
-    comparison = []
-    for run_id in run_ids:
-        for runs in runs_db.values():
-            for run in runs:
-                if run.id == run_id:
-                    comparison.append({
-                        "run_id": run.id,
-                        "name": run.name,
-                        "parameters": run.parameters,
-                        "metrics": run.metrics,
-                        "duration_seconds": run.duration_seconds
-                    })
-                    break
+    metric_buffer.flush()
+    runs = [runs_index.get(run_id) for run_id in run_ids]
+    comparison = [
+        {
+            "run_id": run.id,
+            "name": run.name,
+            "parameters": run.parameters,
+            "metrics": run.metrics,
+            "duration_seconds": run.duration_seconds
+        }
+        for run in runs if run is not None
+    ]
     
     if not comparison:
         raise HTTPException(status_code=404, detail="No runs found")
@@ -346,6 +427,7 @@ def get_experiment_summary(experiment_id: str):
         raise HTTPException(status_code=404, detail="Experiment not found")
     
     experiment = experiments_db[experiment_id]
+    metric_buffer.flush()
     runs = runs_db.get(experiment_id, [])
     
     return {
@@ -0,0 +1,172 @@
+"""
+Batched metric logging.
+
+Logging a training step through POST /runs/{run_id}/log-metrics costs
+the training loop a full HTTP round trip per step. POST /runs/log-metrics
+takes any number of steps, for any number of runs, as NDJSON: one object
+per line,
+
+    {"run_id": "...", "step": 12, "metrics": {"loss": 0.31}, "timestamp": 1718000000.5}
+
+(`timestamp` is optional: epoch seconds or ISO 8601, UTC unless it has
+an offset, defaulting to when the batch arrived). The request only
+parses and queues the lines. The MetricBuffer writes them to the metric
+store from a background task, every METRIC_FLUSH_INTERVAL_MS or as soon
+as METRIC_FLUSH_ROWS lines are waiting, gathering each series' points
+into one columnar append and each run's latest values into one update. Past METRIC_BUFFER_MAX_ROWS queued
+lines, requests flush before they return rather than grow the buffer.
+Single steps logged through POST /runs/{run_id}/log-metrics are queued
+the same way, so both paths reach a run in the order they were logged.
+
+Reads flush first, so they see every point acknowledged before them.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import orjson
+
+from metric_store import MetricStore, to_micros
+
+METRIC_FLUSH_ROWS = int(os.getenv("METRIC_FLUSH_ROWS", 10_000))
+METRIC_FLUSH_INTERVAL_MS = float(os.getenv("METRIC_FLUSH_INTERVAL_MS", 200))
+METRIC_BUFFER_MAX_ROWS = int(os.getenv("METRIC_BUFFER_MAX_ROWS", 1_000_000))
+METRIC_BATCH_MAX_BYTES = int(os.getenv("METRIC_BATCH_MAX_BYTES", 16 * 1024 * 1024))
+
+# (run_id, step, timestamp in microseconds, {name: value})
+Row = Tuple[str, int, int, Dict[str, float]]
+
+logger = logging.getLogger(__name__)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _micros(timestamp, default: int) -> int:
+    if timestamp is None:
+        return default
+    if _is_number(timestamp):
+        micros = int(timestamp * 1_000_000)
+        # The store keeps timestamps as int64 microseconds
+        if not -2 ** 63 <= micros < 2 ** 63:
+            raise ValueError("timestamp is out of range")
+        return micros
+    if isinstance(timestamp, str):
+        # Strings without an offset are UTC, like the server's own timestamps
+        return to_micros(datetime.fromisoformat(timestamp))
+    raise ValueError("timestamp must be epoch seconds or an ISO 8601 string")
+
+
+def _row(entry, received_us: int) -> Row:
+    if not isinstance(entry, dict):
+        raise ValueError("expected a JSON object")
+    run_id, step, metrics = entry.get("run_id"), entry.get("step"), entry.get("metrics")
+    if not isinstance(run_id, str) or not run_id:
+        raise ValueError("run_id must be a non-empty string")
+    if not isinstance(step, int) or isinstance(step, bool) or not -2 ** 63 <= step < 2 ** 63:
+        raise ValueError("step must be a 64-bit integer")
+    if not isinstance(metrics, dict) or not all(_is_number(v) for v in metrics.values()):
+        raise ValueError("metrics must be an object of numbers")
+    return run_id, step, _micros(entry.get("timestamp"), received_us), {k: float(v) for k, v in metrics.items()}
+
+
+def parse_ndjson(body: bytes, received_at: datetime, max_errors: int = 20) -> Tuple[List[Row], List[dict]]:
+    """Rows from an NDJSON batch, and up to `max_errors` {line, error} for lines that don't parse."""
+    received_us = to_micros(received_at)
+    rows, errors = [], []
+    for number, line in enumerate(body.split(b"\n"), 1):
+        if not line.strip():
+            continue
+        try:
+            rows.append(_row(orjson.loads(line), received_us))
+        except (ValueError, OverflowError) as e:
+            if len(errors) < max_errors:
+                errors.append({"line": number, "error": str(e)})
+    return rows, errors
+
+
+class MetricBuffer:
+    def __init__(self, store: MetricStore, on_flush: Callable[[Dict[str, Dict[str, float]]], None],
+                 accept: Callable[[str], bool] = lambda run_id: True, flush_rows: int = METRIC_FLUSH_ROWS,
+                 flush_interval_ms: float = METRIC_FLUSH_INTERVAL_MS, max_rows: int = METRIC_BUFFER_MAX_ROWS):
+        self.store = store
+        # Called with each flushed run's latest values, {run_id: {name: value}}
+        self.on_flush = on_flush
+        # Checked once per run per flush; rejected runs' points are dropped
+        self.accept = accept
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_rows = max_rows
+        self._rows: List[Row] = []
+        self._lock = threading.Lock()
+        self._flushing = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, rows: List[Row]) -> bool:
+        """Queue rows; returns True when the buffer is full and the caller should flush."""
+        with self._lock:
+            self._rows.extend(rows)
+            pending = len(self._rows)
+        if pending >= self.flush_rows and self._wakeup is not None:
+            # Callers may be on worker threads; the event belongs to the loop
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return pending >= self.max_rows
+
+    def flush(self):
+        # One flush at a time, so a series' points reach the store in log order
+        with self._flushing:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return
+            columns: Dict[str, Dict[str, Tuple[list, list, list]]] = {}
+            latest: Dict[str, Dict[str, float]] = {}
+            rejected = set()
+            for run_id, step, micros, metrics in rows:
+                run = columns.get(run_id)
+                if run is None:
+                    if run_id in rejected or not self.accept(run_id):
+                        rejected.add(run_id)
+                        continue
+                    run = columns[run_id] = {}
+                    latest[run_id] = {}
+                for name, value in metrics.items():
+                    series = run.get(name)
+                    if series is None:
+                        series = run[name] = ([], [], [])
+                    series[0].append(step)
+                    series[1].append(micros)
+                    series[2].append(value)
+                latest[run_id].update(metrics)
+            for run_id, run in list(columns.items()):
+                try:
+                    self.store.extend(run_id, run)
+                except Exception:
+                    # One run's failure must not cost the other runs their acknowledged points
+                    logger.exception("Dropped %d metric series of run %s", len(run), run_id)
+                    del latest[run_id]
+            self.on_flush(latest)
+
+    async def run(self):
+        """Flush on an interval, or early when enough rows are queued; run as a task."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self._loop.run_in_executor(None, self.flush)
+            except Exception:
+                logger.exception("Metric flush failed")
@@ -0,0 +1,268 @@
+"""
+Columnar time-series storage for run metrics.
+
+Each (run, metric name) series is three typed columns: step (int64),
+timestamp (int64 microseconds) and value (float64). New points go into a
+hot buffer that grows up to METRIC_CHUNK_POINTS points; a full buffer is
+sealed into a compressed chunk:
+
+- steps and timestamps are delta-encoded, values XORed with the previous
+  value's bits (consecutive training metrics share sign, exponent and
+  leading mantissa bits, so most of each XOR is zero)
+- each column is then byte-shuffled (all first bytes, then all second
+  bytes, ...) and zlib-compressed
+
+Chunks keep their step range, so range queries only decompress chunks
+that overlap the range. Queries can downsample server-side to at most
+`max_points` points per metric, either with Largest-Triangle-Three-Buckets
+(keeps the visual shape of a curve) or min/max per bucket (keeps every
+spike).
+"""
+
+import os
+import threading
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+METRIC_CHUNK_POINTS = int(os.getenv("METRIC_CHUNK_POINTS", 4096))
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+
+def _shuffle(words: np.ndarray) -> bytes:
+    return zlib.compress(np.ascontiguousarray(words.view(np.uint8).reshape(-1, 8).T).tobytes(), 1)
+
+
+def _unshuffle(data: bytes, n: int) -> np.ndarray:
+    planes = np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(8, n)
+    return np.ascontiguousarray(planes.T).view(np.uint64).ravel()
+
+
+def encode_ints(values: np.ndarray) -> bytes:
+    deltas = np.diff(values, prepend=np.int64(0))
+    return _shuffle(deltas.view(np.uint64))
+
+
+def decode_ints(data: bytes, n: int) -> np.ndarray:
+    return np.cumsum(_unshuffle(data, n).view(np.int64))
+
+
+def encode_floats(values: np.ndarray) -> bytes:
+    bits = values.view(np.uint64)
+    return _shuffle(bits ^ np.concatenate([np.zeros(1, dtype=np.uint64), bits[:-1]]))
+
+
+def decode_floats(data: bytes, n: int) -> np.ndarray:
+    return np.bitwise_xor.accumulate(_unshuffle(data, n)).view(np.float64)
+
+
+class Chunk:
+    """A sealed, compressed run of points from one series."""
+
+    __slots__ = ("count", "min_step", "max_step", "steps", "timestamps", "values")
+
+    def __init__(self, steps: np.ndarray, timestamps: np.ndarray, values: np.ndarray):
+        self.count = len(steps)
+        self.min_step = int(steps.min())
+        self.max_step = int(steps.max())
+        self.steps = encode_ints(steps)
+        self.timestamps = encode_ints(timestamps)
+        self.values = encode_floats(values)
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return (decode_ints(self.steps, self.count), decode_ints(self.timestamps, self.count),
+                decode_floats(self.values, self.count))
+
+
+class MetricSeries:
+    def __init__(self, chunk_points: int = METRIC_CHUNK_POINTS):
+        self.chunk_points = chunk_points
+        self.chunks: List[Chunk] = []
+        # Short series (most of them) shouldn't pay for a whole chunk up front
+        capacity = min(64, chunk_points)
+        self._steps = np.empty(capacity, dtype=np.int64)
+        self._timestamps = np.empty(capacity, dtype=np.int64)
+        self._values = np.empty(capacity, dtype=np.float64)
+        self._hot = 0
+
+    def _reserve(self, n: int):
+        capacity = len(self._steps)
+        if self._hot + n <= capacity:
+            return
+        while capacity < self._hot + n and capacity < self.chunk_points:
+            capacity *= 2
+        capacity = min(capacity, self.chunk_points)
+        for name in ("_steps", "_timestamps", "_values"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._hot] = old[:self._hot]
+            setattr(self, name, new)
+
+    def extend(self, steps: np.ndarray, timestamps: np.ndarray, values: np.ndarray):
+        start = 0
+        while start < len(steps):
+            n = min(self.chunk_points - self._hot, len(steps) - start)
+            self._reserve(n)
+            hot = slice(self._hot, self._hot + n)
+            self._steps[hot] = steps[start:start + n]
+            self._timestamps[hot] = timestamps[start:start + n]
+            self._values[hot] = values[start:start + n]
+            self._hot += n
+            start += n
+            if self._hot == self.chunk_points:
+                self._seal()
+
+    def _seal(self):
+        self.chunks.append(Chunk(self._steps, self._timestamps, self._values))
+        self._hot = 0
+
+    def range(self, start_step: Optional[int] = None,
+              end_step: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Points with start_step <= step <= end_step, ordered by step."""
+        low = -np.inf if start_step is None else start_step
+        high = np.inf if end_step is None else end_step
+        parts = [chunk.arrays() for chunk in self.chunks if chunk.max_step >= low and chunk.min_step <= high]
+        if self._hot:
+            hot = slice(0, self._hot)
+            parts.append((self._steps[hot].copy(), self._timestamps[hot].copy(), self._values[hot].copy()))
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        steps, timestamps, values = (np.concatenate(column) for column in zip(*parts))
+        if start_step is not None or end_step is not None:
+            mask = (steps >= low) & (steps <= high)
+            steps, timestamps, values = steps[mask], timestamps[mask], values[mask]
+        if len(steps) > 1 and np.any(steps[1:] < steps[:-1]):
+            # Steps logged out of order (e.g. a resumed run); stable keeps log order per step
+            order = np.argsort(steps, kind="stable")
+            steps, timestamps, values = steps[order], timestamps[order], values[order]
+        return steps, timestamps, values
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Indices of `n` points chosen by Largest-Triangle-Three-Buckets."""
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size)
+    x = x.astype(np.float64)
+    # The first and last points are kept; the rest fall into n - 2 buckets
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[:size - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:size - 1], edges[:-1]) / counts
+    selected = np.empty(n, dtype=np.int64)
+    selected[0], selected[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        start, end = edges[i], edges[i + 1]
+        # The third corner is the next bucket's average (the last point for the last bucket)
+        cx, cy = (mean_x[i + 1], mean_y[i + 1]) if i + 1 < n - 2 else (x[-1], y[-1])
+        area = np.abs((x[a] - cx) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (cy - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(y: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the minimum and maximum of each of n / 2 equal buckets, in order."""
+    size = len(y)
+    if n >= size:
+        return np.arange(size)
+    buckets = max(n // 2, 1)
+    width = -(-size // buckets)
+    padded = np.full(buckets * width, np.inf)
+    padded[:size] = y
+    rows = np.arange(buckets) * width
+    lows = rows + padded.reshape(buckets, width).argmin(axis=1)
+    padded[size:] = -np.inf
+    highs = rows + padded.reshape(buckets, width).argmax(axis=1)
+    return np.unique(np.concatenate([lows, highs]))
+
+
+class RunMetrics:
+    def __init__(self, chunk_points: int):
+        self.chunk_points = chunk_points
+        self.series: Dict[str, MetricSeries] = {}
+        self.lock = threading.Lock()
+
+    def get(self, name: str) -> MetricSeries:
+        series = self.series.get(name)
+        if series is None:
+            series = self.series[name] = MetricSeries(self.chunk_points)
+        return series
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_micros(timestamp: datetime) -> int:
+    """Epoch microseconds; naive datetimes are taken as UTC, never local time."""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return (timestamp - EPOCH) // timedelta(microseconds=1)
+
+
+class MetricStore:
+    def __init__(self, chunk_points: int = METRIC_CHUNK_POINTS):
+        self.chunk_points = chunk_points
+        self._runs: Dict[str, RunMetrics] = {}
+        self._lock = threading.Lock()
+
+    def _run(self, run_id: str) -> RunMetrics:
+        run = self._runs.get(run_id)
+        if run is None:
+            with self._lock:
+                run = self._runs.setdefault(run_id, RunMetrics(self.chunk_points))
+        return run
+
+    def extend(self, run_id: str, columns: Dict[str, Tuple[list, list, list]]):
+        """Append {name: (steps, timestamps in microseconds, values)} to a run's series."""
+        # Convert every column before appending any, so a bad column leaves the run untouched
+        arrays = {name: (np.asarray(steps, dtype=np.int64), np.asarray(timestamps, dtype=np.int64),
+                         np.asarray(values, dtype=np.float64))
+                  for name, (steps, timestamps, values) in columns.items()}
+        run = self._run(run_id)
+        with run.lock:
+            for name, (steps, timestamps, values) in arrays.items():
+                run.get(name).extend(steps, timestamps, values)
+
+    def names(self, run_id: str) -> List[str]:
+        run = self._runs.get(run_id)
+        return sorted(run.series) if run else []
+
+    def query(self, run_id: str, names: Optional[Iterable[str]] = None, start_step: Optional[int] = None,
+              end_step: Optional[int] = None, max_points: Optional[int] = None,
+              method: str = "lttb") -> Dict[str, dict]:
+        """
+        {name: {steps, timestamps, values, count, downsampled}} for the
+        run's metrics (or just `names`). Timestamps are epoch seconds;
+        `count` is the number of points in the range before downsampling.
+        """
+        run = self._runs.get(run_id)
+        if run is None:
+            return {}
+        result = {}
+        for name in (sorted(run.series) if names is None else names):
+            with run.lock:
+                series = run.series.get(name)
+                if series is None:
+                    continue
+                steps, timestamps, values = series.range(start_step, end_step)
+            count = len(steps)
+            downsampled = max_points is not None and count > max_points
+            if downsampled:
+                keep = lttb(steps, values, max_points) if method == "lttb" else minmax(values, max_points)
+                steps, timestamps, values = steps[keep], timestamps[keep], values[keep]
+            result[name] = {
+                "steps": steps.tolist(),
+                "timestamps": (timestamps / 1_000_000).tolist(),
+                "values": values.tolist(),
+                "count": count,
+                "downsampled": downsampled,
+            }
+        return result
+
+    def delete(self, run_id: str):
+        with self._lock:
+            self._runs.pop(run_id, None)
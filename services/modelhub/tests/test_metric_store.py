@@ -0,0 +1,73 @@
+"""Columnar metric storage: chunk codecs, series ordering and downsampling."""
+
+import numpy as np
+
+from metric_store import Chunk, MetricSeries, decode_floats, decode_ints, encode_floats, encode_ints, lttb, minmax
+
+
+def test_int_codec_round_trips_extremes():
+    values = np.array([0, 5, 3, -7, 2 ** 63 - 1, -2 ** 63, 1_700_000_000_000_000], dtype=np.int64)
+    assert np.array_equal(decode_ints(encode_ints(values), len(values)), values)
+
+
+def test_float_codec_round_trips_bit_for_bit():
+    values = np.array([0.5, -0.0, 0.0, np.nan, np.inf, -np.inf, 1e-310, 3.14159, 3.14159], dtype=np.float64)
+    decoded = decode_floats(encode_floats(values), len(values))
+    # Bit patterns, so NaN and the sign of zero are checked too
+    assert np.array_equal(decoded.view(np.uint64), values.view(np.uint64))
+
+
+def test_chunk_round_trips_and_keeps_its_step_range():
+    rng = np.random.default_rng(0)
+    steps = rng.permutation(100).astype(np.int64)
+    timestamps = 1_700_000_000_000_000 + steps * 1000
+    values = rng.normal(size=100)
+    chunk = Chunk(steps, timestamps, values)
+    assert (chunk.min_step, chunk.max_step) == (0, 99)
+    for decoded, original in zip(chunk.arrays(), (steps, timestamps, values)):
+        assert np.array_equal(decoded, original)
+
+
+def test_series_orders_out_of_order_steps_across_chunks():
+    series = MetricSeries(chunk_points=4)
+    steps = np.array([5, 6, 7, 8, 0, 1, 2, 9, 3, 4], dtype=np.int64)
+    series.extend(steps, steps * 10, steps.astype(np.float64))
+    assert len(series.chunks) == 2
+
+    out_steps, out_timestamps, out_values = series.range()
+    assert out_steps.tolist() == list(range(10))
+    assert np.array_equal(out_timestamps, out_steps * 10)
+    assert np.array_equal(out_values, out_steps.astype(np.float64))
+    assert series.range(3, 6)[0].tolist() == [3, 4, 5, 6]
+
+
+def test_series_keeps_log_order_for_repeated_steps():
+    series = MetricSeries(chunk_points=2)
+    series.extend(np.array([1, 0, 1], dtype=np.int64), np.array([10, 20, 30], dtype=np.int64),
+                  np.array([-0.0, np.nan, 2.0]))
+    steps, timestamps, values = series.range()
+    assert steps.tolist() == [0, 1, 1]
+    assert timestamps.tolist() == [20, 10, 30]
+    assert np.isnan(values[0]) and np.signbit(values[1]) and values[2] == 2.0
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x = np.arange(1000)
+    y = np.zeros(1000)
+    y[500] = 100.0
+    keep = lttb(x, y, 20)
+    assert len(keep) == 20
+    assert keep[0] == 0 and keep[-1] == 999
+    assert np.all(np.diff(keep) > 0)
+    assert 500 in keep
+    assert lttb(x[:10], y[:10], 20).tolist() == list(range(10))
+
+
+def test_minmax_keeps_every_bucket_extreme():
+    y = np.sin(np.linspace(0, 20, 1000))
+    y[123], y[877] = 5.0, -5.0
+    keep = minmax(y, 50)
+    assert len(keep) <= 50
+    assert np.all(np.diff(keep) > 0)
+    assert 123 in keep and 877 in keep
+    assert y[keep].max() == y.max() and y[keep].min() == y.min()
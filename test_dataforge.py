@@ -0,0 +1,80 @@
+import json
+import os
+import requests
+
+BASE_URL = "http://localhost:8001"
+
+print("=== DATAFORGE TEST ===\n")
+
+# 1. Create dataset
+print("1. Creating dataset...")
+dataset = requests.post(f"{BASE_URL}/datasets", json={
+    "name": "Upload Test Dataset",
+    "description": "Streaming upload smoke test",
+    "owner_id": "dataforge_user",
+    "data_type": "text"
+}).json()
+print(f"Dataset ID: {dataset['id']}")
+
+# 2. Form upload
+print("\n2. Uploading file (multipart/form-data)...")
+data = os.urandom(3 * 1024 * 1024)
+upload = requests.post(
+    f"{BASE_URL}/datasets/{dataset['id']}/upload",
+    files={"file": ("sample.bin", data)}
+).json()
+print(f"Uploaded: {upload['size_bytes']} bytes")
+
+# 3. Raw body upload of the same content
+print("\n3. Uploading the same file (raw body)...")
+f = requests.put(f"{BASE_URL}/datasets/{dataset['id']}/files/raw.bin", data=data).json()
+print(f"Same content hash: {f['content_hash'] == upload['content_hash']}")
+stats = requests.get(f"{BASE_URL}/storage/stats").json()
+print(f"Stored: {stats['stored_bytes']} bytes, referenced: {stats['referenced_bytes']} bytes")
+
+# 4. Resumable upload
+print("\n4. Resumable upload...")
+session = requests.post(f"{BASE_URL}/datasets/{dataset['id']}/uploads", json={"filename": "big.bin"}).json()
+part_size = session['part_size']
+big = os.urandom(part_size + 1024)
+requests.put(f"{BASE_URL}/datasets/{dataset['id']}/uploads/{session['id']}/parts/2", data=big[part_size:])
+status = requests.get(f"{BASE_URL}/datasets/{dataset['id']}/uploads/{session['id']}").json()
+print(f"Parts received before resume: {sorted(status['parts'])}")
+requests.put(f"{BASE_URL}/datasets/{dataset['id']}/uploads/{session['id']}/parts/1", data=big[:part_size])
+f = requests.post(f"{BASE_URL}/datasets/{dataset['id']}/uploads/{session['id']}/complete").json()
+print(f"Completed: {f['filename']} ({f['size_bytes']} bytes)")
+
+# 5. Dataset counters
+print("\n5. Dataset totals...")
+dataset = requests.get(f"{BASE_URL}/datasets/{dataset['id']}").json()
+files = requests.get(f"{BASE_URL}/datasets/{dataset['id']}/files").json()
+print(f"Size: {dataset['size_bytes']} bytes, samples: {dataset['num_samples']}, files: {len(files)}")
+
+# 6. Versions and diffs
+print("\n6. Versioning...")
+version = {"dataset_id": dataset['id'], "commit_message": "Initial upload", "created_by": "dataforge_user"}
+v1 = requests.post(f"{BASE_URL}/datasets/{dataset['id']}/versions", json={**version, "version": "1.0"}).json()
+print(f"v1: {v1['num_files']} files, changes: {v1['changes']}")
+requests.put(f"{BASE_URL}/datasets/{dataset['id']}/files/raw.bin", data=b"replaced")
+requests.delete(f"{BASE_URL}/datasets/{dataset['id']}/files/sample.bin")
+diff = requests.get(f"{BASE_URL}/datasets/{dataset['id']}/diff").json()
+print(f"Uncommitted: modified {diff['modified']}, removed {diff['removed']}")
+v2 = requests.post(f"{BASE_URL}/datasets/{dataset['id']}/versions", json={**version, "version": "1.1"}).json()
+print(f"v2 parent is v1: {v2['parent_id'] == v1['id']}, changes: {v2['changes']}")
+
+# 7. Bulk labels
+print("\n7. Bulk labeling (NDJSON)...")
+lines = [json.dumps({"file_path": "raw.bin", "annotations": {"class": i % 3}, "labeler_id": "labeler_1"}) for i in range(1000)]
+result = requests.post(f"{BASE_URL}/datasets/{dataset['id']}/labels:batch", data="\n".join(lines)).json()
+print(f"Inserted: {result['inserted']}, rejected: {result['rejected']}")
+labels = requests.get(f"{BASE_URL}/datasets/{dataset['id']}/labels", params={"labeler_id": "labeler_1"}).json()
+requests.put(f"{BASE_URL}/datasets/{dataset['id']}/labels/{labels[0]['id']}/verify")
+stats = requests.get(f"{BASE_URL}/datasets/{dataset['id']}/statistics").json()
+print(f"Labels: {stats['total_labels']}, verified: {stats['verified_labels']}")
+
+# 8. Filtered, paginated listing
+print("\n8. Listing datasets...")
+page = requests.get(f"{BASE_URL}/datasets", params={"owner_id": "dataforge_user", "data_type": "text", "limit": 1})
+print(f"First page: {len(page.json())} dataset(s), next cursor: {page.headers.get('X-Next-Cursor')}")
+
+print("\n=== DATAFORGE TEST COMPLETE ===")
@@ -0,0 +1,86 @@
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+print("=== API GATEWAY TEST ===\n")
+
+# 1. Gateway routes
+print("1. Gateway Routes...")
+response = requests.get(f"{BASE_URL}/")
+info = response.json()
+for route in info['routes']:
+    print(f"  {route}")
+
+# 2. Live service status
+print("\n2. Service Status...")
+status = requests.get(f"{BASE_URL}/services/status").json()
+print(f"Healthy: {status['healthy']}/{status['total']}")
+for service in status['services']:
+    print(f"  {service['name']}: {service['status']} ({service['latency_ms']} ms)")
+
+# 3. Proxy to DataForge
+print("\n3. Creating dataset through the gateway...")
+response = requests.post(f"{BASE_URL}/dataforge/datasets", json={
+    "name": "Gateway Test Dataset",
+    "description": "Created via the API gateway",
+    "owner_id": "gateway_user",
+    "data_type": "text"
+})
+dataset = response.json()
+print(f"Dataset ID: {dataset['id']}")
+
+response = requests.get(f"{BASE_URL}/dataforge/datasets", params={"owner_id": "gateway_user"})
+print(f"Datasets for gateway_user: {len(response.json())}")
+
+# 4. Streamed upload through the gateway
+print("\n4. Uploading file through the gateway...")
+response = requests.post(
+    f"{BASE_URL}/dataforge/datasets/{dataset['id']}/upload",
+    files={"file": ("sample.txt", b"hello world\n" * 1000)}
+)
+upload = response.json()
+print(f"Uploaded: {upload['filename']} ({upload['size_bytes']} bytes)")
+
+# 5. Proxy to ModelHub
+print("\n5. Listing experiments through the gateway...")
+response = requests.get(f"{BASE_URL}/modelhub/experiments")
+print(f"Status: {response.status_code}, experiments: {len(response.json())}")
+
+# 6. Proxy to Deploy
+print("\n6. Listing deployments through the gateway...")
+response = requests.get(f"{BASE_URL}/deploy/list")
+print(f"Total deployments: {response.json()['total']}")
+
+# 7. Authentication with token cache
+print("\n7. Authenticating...")
+requests.post(f"{BASE_URL}/auth/register", json={
+    "username": "gateway_tester",
+    "email": "gateway@example.com",
+    "password": "secret",
+    "full_name": "Gateway Tester"
+})
+response = requests.post(f"{BASE_URL}/auth/login", json={"username": "gateway_tester", "password": "secret"})
+token = response.json()['access_token']
+headers = {"Authorization": f"Bearer {token}"}
+for _ in range(5):
+    requests.get(f"{BASE_URL}/auth/me", headers=headers)
+cache = requests.get(f"{BASE_URL}/stats").json()['token_cache']
+print(f"Token cache hits: {cache['hits']}, misses: {cache['misses']}")
+
+# 8. Live rate limit usage
+print("\n8. Rate limits...")
+limits = requests.get(f"{BASE_URL}/rate-limits", headers=headers).json()
+print(f"Limit: {limits['requests_per_minute']}/min, used this minute: {limits['current_usage']['minute']}")
+
+# 9. Coalesced concurrent reads
+print("\n9. Concurrent identical reads...")
+from concurrent.futures import ThreadPoolExecutor
+with ThreadPoolExecutor(max_workers=20) as pool:
+    statuses = list(pool.map(
+        lambda _: requests.get(f"{BASE_URL}/dataforge/datasets/{dataset['id']}").status_code, range(20)
+    ))
+coalescing = requests.get(f"{BASE_URL}/stats").json()['request_coalescing']
+print(f"Responses: {statuses.count(200)}/20 OK")
+print(f"Upstream calls: {coalescing['upstream_calls']}, coalesced: {coalescing['coalesced_requests']}")
+
+print("\n=== API GATEWAY TEST COMPLETE ===")